@@ -14,37 +14,52 @@
 import re
 import sys
 import os
-import socket
-import yaml
+import time
+import threading
 
-from omsapi import OMSAPI
+import OMSClient
+import OMSCache
+import LumiSections
+import L1Seeds
+import RateColumns
+from QueryContext import QueryContext
 
 PAGE_LIMIT = 10000
 
-#initiate connection to endpoints and authenticate
-hostname = socket.gethostname()
-
-#This option uses a DB authentication only available on lxplus
-if "lxplus" in hostname:
-    omsapi = OMSAPI("https://cmsoms.cern.ch/agg/api", "v1", cert_verify=False, verbose=False)
-    omsapi.auth_krb()
-#This option uses a token setup for the API VMs
-elif "ruber" in hostname or "ater" in hostname or "caer" in hostname:
-    stream = open(str('OMSConfig.yaml'), 'r')
-    cfg  = yaml.safe_load(stream)
-    my_app_id = cfg['token_info']['token_name']
-    my_app_secret = cfg['token_info']['token_secret']
-    omsapi = OMSAPI("https://cmsoms.cern.ch/agg/api", "v1", cert_verify=False, verbose=False)
-    omsapi.auth_oidc(my_app_id, my_app_secret, audience="cmsoms-prod")
-#This option is for P5, no authentication necessary
-else:
-    omsapi = OMSAPI("http://cmsoms.cms:8080/api", verbose=False)
+# The fields of the l1triggerrates which we use, see getL1TriggerRatesQuery
+L1_TRIGGER_RATES = ["l1a_total","l1a_physics","trigger_physics_lost","total_before_deadtime","l1a_calibration","l1a_random"]
+
+# The subsystems which must all be ready for a LS to be good for physics (see getLumiInfo)
+READY_FLAGS = ["ebp_ready","ebm_ready","eep_ready","eem_ready","hbhea_ready","hbheb_ready","hbhec_ready","hf_ready",
+               "ho_ready","rpc_ready","dt0_ready","dtp_ready","dtm_ready","cscp_ready","cscm_ready","tob_ready",
+               "tibtid_ready","tecp_ready","tecm_ready","bpix_ready","fpix_ready","esp_ready","esm_ready"]
+
+# The OMS client is only created (and authenticated) when the first query is made, see OMSClient.py to configure it
+omsapi = OMSClient.LazyOMSClient()
 
 # Key version stripper
 def stripVersion(name):
     if re.match('.*_v[0-9]+',name): name = name[:name.rfind('_')]
     return name
 
+# The information about a run which doesn't change while the run goes on (except for the bunches, which belong to the fill)
+class RunMetadata:
+    def __init__(self, runNumber):
+        self.run_number   = runNumber
+        self.trigger_mode = None
+        self.fill_number  = None
+        self.fill_type    = None
+        self.bunches      = [0,0]               # [bunches_colliding, bunches_target]
+        self.keys         = ("","","","","")    # (L1_HLT, HLT, GTRS, TSC, GT), see getRunKeys()
+        self.ended        = False               # Once the run has ended, none of the above can change anymore
+        self.complete     = True                # False if some of the queries failed
+        self.fetch_time   = 0
+
+RUN_METADATA_TTL = 60   # Seconds after which we fetch the metadata of a run which hasn't ended again
+
+run_metadata = {}       # {run_number: RunMetadata}, shared by all the DBParser objects
+run_metadata_lock = threading.Lock()
+
 # A class that interacts with OMS and fetches information that we need
 class DBParser:
     def __init__(self) :
@@ -63,18 +78,161 @@ class DBParser:
         self.L1IndexNameMap = {}
         self.L1NameIndexMap = {}
         self.PSColumnByLS = {}
+        self.HLT_name_map = {}
+        self.path_prescales = {}    # {'trigger': ([L1*HLT prescale by column], prescale of the other columns)}, see getPathPrescales
+        self.PDLastLS = {}          # {run_number: LS}, the last LS returned by the incremental getPrimaryDatasets
+        self.PDNames = {}           # {run_number: ['dataset']}, the datasets of each run, see getDatasetNames
+
+        self.use_bulk_hlt = True        # Fetch the rates of all the HLT paths of a run together, instead of path by path
+        self.bulk_hlt_min_paths = 10    # Below this number of paths the per-path queries are cheaper than the bulk one
+        self.bulk_hlt_min_fraction = 0.5    # ... or below this fraction of the paths of the menu, the bulk query fetches the rows of every path
+
+        self.executor = omsapi.executor # Runs the independent queries (one per path, dataset, ...) concurrently
+        self.cache = None               # OMSCache of the OMS responses (e.g. OMSCache.getCache()), None to always query OMS
+        self.run_end_checks = {}        # {run_number: time}, when we last asked OMS whether a run has ended
+        self.prefetch_pages = True      # Fetch the next page of a long query while the current one is being parsed
+        self.query_context = None       # QueryContext, identical queries made between beginCycle() and endCycle() are only sent once
+
+    # Returns: A new DBParser with the same settings, e.g. to get the data of another run from another thread
+    def copyParser(self):
+
+        parser = DBParser()
+        parser.use_bulk_hlt = self.use_bulk_hlt
+        parser.bulk_hlt_min_paths = self.bulk_hlt_min_paths
+        parser.bulk_hlt_min_fraction = self.bulk_hlt_min_fraction
+        parser.executor = self.executor
+        parser.cache = self.cache
+        parser.prefetch_pages = self.prefetch_pages
+        parser.query_context = self.query_context
+        return parser
+
+    # Use: Runs a query against OMS, unless an identical query was already made in the current cycle (see beginCycle)
+    # Returns: The json content of the response
+    def fetch(self, q):
+
+        context = self.query_context
+        if context is not None:
+            return context.fetch(q.data_query(), lambda: self.fetchQuery(q))
+
+        return self.fetchQuery(q)
+
+    # Use: Runs a query against OMS, or gets its response from the cache
+    # Note: Only queries restricted to a single run are cached, anything else (latest runs, fills, LHC status) can change at any time
+    # Returns: The json content of the response
+    def fetchQuery(self, q):
+
+        if self.cache is None or self.executor.archive is not None:
+            # When recording, every response must go through the archive, and a replay must not end up in the cache
+            return self.executor.fetch(q)
+        url = q.data_query()
+        runNumber = OMSCache.getRunNumber(url)
+        if runNumber is None:
+            return self.executor.fetch(q)
+        response = self.cache.get(url)
+        if response is not None:
+            return response
+        # Check before fetching the data, so that we never cache data which was fetched before the run ended as immutable
+        self.checkRunEnded(runNumber)
+        response = self.executor.fetch(q)
+        if 'data' in response:
+            self.cache.put(url,response,runNumber)
+
+        return response
+
+    # Use: Asks OMS whether a run has ended (at most once every cache.ongoing_ttl seconds per run), and tells the cache if it has
+    def checkRunEnded(self, runNumber):
+
+        if self.cache.isRunEnded(runNumber):
+            return
+        now = time.time()
+        if now - self.run_end_checks.get(runNumber,0) < self.cache.ongoing_ttl:
+            return
+        self.run_end_checks[runNumber] = now
+        q = omsapi.query("runs")
+        q.per_page = 1
+        q.filter("run_number", runNumber)
+        q.custom("fields", "end_time")
+        try:
+            data = self.executor.fetch(q)['data']
+            if data and data[0]['attributes']['end_time'] is not None:
+                self.cache.setRunEnded(runNumber)
+        except:
+            print("Unable to get the end time of run %s" % runNumber)
+
+    # Use: Starts a new cycle (e.g. one ShiftMonitor update): until endCycle() identical queries are only sent once, even if they are made concurrently
+    # Returns: The QueryContext of the cycle
+    def beginCycle(self, name=""):
+
+        self.query_context = QueryContext(name)
+        return self.query_context
+
+    # Use: Ends the current cycle, the responses fetched during it are dropped
+    # Returns: The QueryContext of the cycle (with the number of queries deduplicated), or None if there wasn't one
+    def endCycle(self):
+
+        context = self.query_context
+        self.query_context = None
+        return context
+
+    # Use: Runs many independent queries against OMS concurrently, on the executor worker pool
+    # Returns: The json content of each response, in the same order as the queries
+    def fetchAll(self, queries):
+
+        return self.executor.gather(queries,self.fetch)
+
+    # Use: Streams the rows of a query, PAGE_LIMIT rows at a time, until a page comes back short
+    # Parameters:
+    # -- prefetch: fetch the next page on the executor while the rows of the current one are consumed, defaults to self.prefetch_pages
+    # -- first_page: the 'data' of the first page, if it was already fetched (e.g. with fetchAll)
+    # Note: The first page is fetched right away, so that a failed query raises here and not while iterating
+    # Note: Don't prefetch from a task which is itself running on the executor, it could end up waiting for its own worker
+    # Returns: generator of the 'data' items of the query, only one or two pages are held in memory at a time
+    def iterPages(self, q, prefetch=None, first_page=None):
+
+        if prefetch is None:
+            prefetch = self.prefetch_pages
+        q.paginate(1, PAGE_LIMIT)
+        if first_page is None:
+            first_page = self.fetch(q)['data']
+
+        return self.streamPages(q, first_page, prefetch)
+
+    # Use: The generator behind iterPages
+    def streamPages(self, q, rows, prefetch):
+
+        page = 1
+        while True:
+            last_page = len(rows) < PAGE_LIMIT
+            pending = None
+            if not last_page:
+                page += 1
+                q.paginate(page, PAGE_LIMIT)
+                if prefetch:
+                    pending = self.executor.submit(q, self.fetch)
+            for item in rows:
+                yield item
+            if last_page:
+                return
+            if pending is not None:
+                rows = pending.result()['data']
+            else:
+                rows = self.fetch(q)['data']
+
+    # Returns: list of all the 'data' items of the query, from every page
+    def getAllPages(self, q):
+
+        return list(self.iterPages(q))
 
     #returns the lumisection number with prescale index
     def getLSInfo(self, runNumber):
 
         ls_info = []
         q = omsapi.query("l1algorithmtriggers")
-        q.per_page = PAGE_LIMIT
         q.filter("run_number", runNumber)
         q.filter("bit", 0)
         q.custom("fields", "first_lumisection_number,initial_prescale")
         try:
-            data = q.data().json()['data']
+            data = self.iterPages(q)
         except:
             print("Unable to get LS list for run %s" % runNumber)
             return []
@@ -83,105 +241,173 @@ class DBParser:
 
         return ls_info
 
-    # Returns the various keys used for the specified run as a 5-tuple
-    def getRunKeys(self,runNumber):
+    # Use: Gets the trigger mode, fill, bunches and keys of a run, memoised for all the DBParser objects
+    # Note: The metadata of a run which has ended is never fetched again, for an ongoing run it is fetched again after RUN_METADATA_TTL seconds
+    # Returns: RunMetadata, or None if the run doesn't exist (probably)
+    def getRunMetadata(self, runNumber):
+
+        with run_metadata_lock:
+            meta = run_metadata.get(runNumber)
+        if meta is not None and (meta.ended or time.time() - meta.fetch_time < RUN_METADATA_TTL):
+            return meta
+
+        meta = self.fetchRunMetadata(runNumber)
+        if meta is not None and meta.complete:
+            with run_metadata_lock:
+                run_metadata[runNumber] = meta
+
+        return meta
 
-        L1_HLT,HLT,GTRS,TSC,GT = "","","","",""
-        q = omsapi.query("l1configurationkeys")
-        q.per_page=1
+    # Use: Queries OMS for the metadata of a run, the run, keys and HLT config queries run concurrently and then the fill one
+    # Returns: RunMetadata, or None if the run doesn't exist (probably)
+    def fetchRunMetadata(self, runNumber):
+
+        meta = RunMetadata(runNumber)
+        meta.fetch_time = time.time()
+        q = omsapi.query("runs")
+        q.per_page = 1
         q.filter("run_number", runNumber)
-        q.custom("fields", "l1_hlt_mode_stripped,run_settings_key,l1_key,gt_key")
-        q2 = omsapi.query("hltconfig")
-        q2.set_validation(False)
-        q2.per_page=1
+        q.custom("fields", "trigger_mode,fill_number,end_time")
+        q2 = omsapi.query("l1configurationkeys")
+        q2.per_page = 1
         q2.filter("run_number", runNumber)
-        q2.custom("fields", "config_name")
+        q2.custom("fields", "l1_hlt_mode_stripped,run_settings_key,l1_key,gt_key")
+        q3 = omsapi.query("hltconfig")
+        q3.set_validation(False)
+        q3.per_page = 1
+        q3.filter("run_number", runNumber)
+        q3.custom("fields", "config_name")
+        try:
+            run_data, keys_data, hlt_data = self.fetchAll([q, q2, q3])
+            item = run_data['data'][0]['attributes']
+        except:
+            print("Failed to get run info for run %s" % runNumber)
+            return None
+        meta.trigger_mode = item['trigger_mode']
+        meta.fill_number = item['fill_number']
+        meta.ended = item['end_time'] is not None
+
         try:
-            item = q.data().json()['data'][0]['attributes']
-            L1_HLT = item['l1_hlt_mode_stripped']
-            GTRS = item['run_settings_key']
-            TSC = item['l1_key']
-            GT = item['gt_key']
-            item2 = q2.data().json()['data'][0]['attributes']
-            HLT = item2['config_name']
+            item = keys_data['data'][0]['attributes']
+            item2 = hlt_data['data'][0]['attributes']
+            meta.keys = (item['l1_hlt_mode_stripped'], item2['config_name'], item['run_settings_key'], item['l1_key'], item['gt_key'])
         except:
             print("[ERROR] Unable to get keys for this run, %d" % (runNumber))
-        
-        return L1_HLT,HLT,GTRS,TSC,GT
+            meta.complete = False
+
+        if meta.fill_number is not None:
+            q4 = omsapi.query("fills")
+            q4.per_page = 1
+            q4.filter("fill_number", meta.fill_number)
+            q4.custom("fields", "bunches_colliding,bunches_target,fill_type_runtime")
+            try:
+                item = self.fetch(q4)['data'][0]['attributes']
+                meta.bunches = [item['bunches_colliding'], item['bunches_target']]
+                meta.fill_type = item['fill_type_runtime']
+            except:
+                print("Failed to get fill info for fill %s" % meta.fill_number)
+                meta.complete = False
+            if meta.bunches[0] == None:
+                meta.bunches[0] = 0
+            if meta.bunches[1] == None:
+                meta.bunches[1] = 0
+
+        if meta.ended and self.cache is not None:
+            self.cache.setRunEnded(runNumber)
+
+        return meta
+
+    # Returns the various keys used for the specified run as a 5-tuple
+    def getRunKeys(self,runNumber):
+
+        meta = self.getRunMetadata(runNumber)
+        if meta is None:
+            print("[ERROR] Unable to get keys for this run, %d" % (runNumber))
+            return "","","","",""
+
+        return meta.keys
 
     # Returns: True if we succeded, false if the run doesn't exist (probably)
     # Populates self.PSColumnByLS (which prescale column is used in the LS)
     # Populates self.L1_HLT_Key, self.HLT_Key, self.GTRS_Key, self.TSC_Key, self.GT_Key via getRunKeys()
     def getRunInfo(self, runNumber):
 
+        if not self.updatePSColumnByLS(runNumber):
+            return False
+        
+        self.L1_HLT_Key, self.HLT_Key, self.GTRS_Key, self.TSC_Key, self.GT_Key = self.getRunKeys(runNumber)
+        if self.HLT_Key == "":
+            # The key query failed
+            return False
+        else:
+            return True
+
+    # Use: Adds the prescale column used in each LS from minLS on to self.PSColumnByLS
+    # Returns: True if we succeded, False if the query failed
+    def updatePSColumnByLS(self, runNumber, minLS=-1):
+
         q = omsapi.query("l1algorithmtriggers")
-        q.per_page = PAGE_LIMIT
         q.filter("run_number", runNumber)
         q.filter("bit",0)
+        if minLS > 0:
+            q.filter("first_lumisection_number", minLS, "GE")
         q.custom("fields", "first_lumisection_number,initial_prescale")
         try:
-            data = q.data().json()['data']
+            data = self.iterPages(q)
         except:
             print("Trouble getting PS column by LS")
             return False
         for item in data:
             self.PSColumnByLS[item['attributes']['first_lumisection_number']] = item['attributes']['initial_prescale']['prescale_index']
-        
-        self.L1_HLT_Key, self.HLT_Key, self.GTRS_Key, self.TSC_Key, self.GT_Key = self.getRunKeys(runNumber)
-        if self.HLT_Key == "":
-            # The key query failed
-            return False
-        else:
-            return True
 
-    # Returns: A list of of information for each LS: ( { LS, instLumi, physics } )                                                                                                                    
+        return True
+
+    # Returns: LumiSections.LumiInfo, the information of each LS: ( LS, instLumi, psi, physics, all_subSys_good, pileup )
     def getLumiInfo(self,runNumber,minLS=-1,maxLS=9999999):
 
-        _list = []
+        _list = LumiSections.LumiInfo()
         q = omsapi.query("lumisections")
         q.filter("run_number", runNumber)
         q.filter("lumisection_number", minLS, operator="GE")
-        q.filter("lumiseciton_number", maxLS, operator="LE")
+        q.filter("lumisection_number", maxLS, operator="LE")
+        # Only the columns we use, plus the meta information for the units of init_lumi
+        q.custom("fields", ",".join(["lumisection_number","init_lumi","physics_flag","beam1_present","pileup"] + READY_FLAGS))
         q.custom("include", "meta")
-        q.per_page = PAGE_LIMIT
-        response = q.data().json()
-        if response['data'][0]['meta']['row']['init_lumi']['units']=="10^{33}cm^{-2}s^{-1}":
-            adjust = 1000
-        elif response['data'][0]['meta']['row']['init_lumi']['units']=="10^{34}cm^{-2}s^{-1}":
-            adjust = 10000
-        else:
-            adjust = 1
         q2 = omsapi.query("prescalechanges")
         q2.filter("run_number", runNumber)
         q2.custom("fields", "lumisection_number,new_prescale_index")
-        q2.per_page = PAGE_LIMIT
-        response2 = q2.data().json()
-        for item in response['data']:
+        ps_index = LumiSections.PrescaleColumnIndex([(item['attributes']['lumisection_number'], item['attributes']['new_prescale_index']) for item in self.iterPages(q2)])
+        adjust = None
+        for item in self.iterPages(q):
+            if adjust is None:
+                if item['meta']['row']['init_lumi']['units']=="10^{33}cm^{-2}s^{-1}":
+                    adjust = 1000
+                elif item['meta']['row']['init_lumi']['units']=="10^{34}cm^{-2}s^{-1}":
+                    adjust = 10000
+                else:
+                    adjust = 1
             thing = item['attributes']
-            for ps_index in response2['data']:
-                if thing['lumisection_number'] >= ps_index['attributes']['lumisection_number']:
-                    ps = ps_index['attributes']['new_prescale_index'] 
+            ps = ps_index.getColumn(thing['lumisection_number'])
             adjusted_lumi = adjust*thing['init_lumi']
-            _list.append([thing['lumisection_number'], adjusted_lumi, ps, thing['physics_flag']*thing['beam1_present'],
-                          thing['physics_flag']*thing['beam1_present']*thing['ebp_ready']*thing['ebm_ready']*
-                          thing['eep_ready']*thing['eem_ready']*thing['hbhea_ready']*thing['hbheb_ready']*
-                          thing['hbhec_ready']*thing['hf_ready']*thing['ho_ready']*thing['rpc_ready']*thing['dt0_ready']*
-                          thing['dtp_ready']*thing['dtm_ready']*thing['cscp_ready']*thing['cscm_ready']*thing['tob_ready']*
-                          thing['tibtid_ready']*thing['tecp_ready']*thing['tecm_ready']*thing['bpix_ready']*
-                          thing['fpix_ready']*thing['esp_ready']*thing['esm_ready'],thing['pileup']])
+            physics = thing['physics_flag']*thing['beam1_present']
+            all_subSys_good = physics
+            for flag in READY_FLAGS:
+                all_subSys_good *= thing[flag]
+            _list.append((thing['lumisection_number'], adjusted_lumi, ps, physics, all_subSys_good, thing['pileup']))
             if thing['lumisection_number'] == maxLS:
                 break
         return _list
 
-    # Use: Gets the HLT rates in a run
-    # Parameters: runNumer: the number of tbe run, trigger_list, triggers to get the rate of, minLS, maxLS: LS range
-    # Returns: dictionary [tirgger_name][LS] <rate><prescale>
-    def getHLTRates(self, runNumber, trigger_list=[],minLS=-1, maxLS=9999999):
+    # Use: Loads the HLT menu of a run: the prescale column by LS, the L1 and HLT prescales, the HLT seeds and the HLT name map
+    # Returns: True if we succeded, false if the run doesn't exist (probably)
+    def loadHLTMenu(self, runNumber):
 
+        self.HLT_name_map = {}
+        self.path_prescales = {}
         # First we need the HLT and L1 prescale rates and the HLT seed info                                                                                                                                
         if not self.getRunInfo(runNumber):
             print("Failed to get run info ")
-            return {} # The run probably doesn't exist
+            return False # The run probably doesn't exist
         # Get L1 info                                                                                                                                                                                     
         self.getL1Info(runNumber)
         # Get HLT info
@@ -189,6 +415,21 @@ class DBParser:
         self.getHLTPrescales(runNumber)
         self.HLT_name_map = self.getHLTNameMap(runNumber)
 
+        return True
+
+    # Use: Gets the HLT rates in a run
+    # Parameters: runNumer: the number of tbe run, trigger_list, triggers to get the rate of, minLS, maxLS: LS range
+    # -- load_menu: if False, reuse the menu loaded by a previous call for the same run and only fetch the prescale columns from minLS on
+    # -- columns: return the rates of each trigger as RateColumns, rather than a dictionary
+    # Returns: dictionary [tirgger_name][LS] <rate><prescale>
+    def getHLTRates(self, runNumber, trigger_list=[],minLS=-1, maxLS=9999999, load_menu=True, columns=False):
+
+        if load_menu:
+            if not self.loadHLTMenu(runNumber):
+                return {} # The run probably doesn't exist
+        else:
+            self.updatePSColumnByLS(runNumber,minLS)
+
         trigger_list_version = []
 
         # If no list is given --> get rates for all HLT triggers
@@ -199,19 +440,82 @@ class DBParser:
                 if stripVersion(trigger) in trigger_list:
                     trigger_list_version.append(trigger)
 
+        if self.useBulkHLTRates(len(trigger_list_version)):
+            return self.getBulkHLTRates(runNumber,trigger_list_version,minLS,maxLS,columns)
+
+        unprescale = self.unprescaleHLTRates if columns else self.applyHLTPrescales
+
         trigger_rates = {}
+        # Ignore triggers which don't appear in this run
+        if not self.HLT_name_map:
+            return trigger_rates
+        trigger_list_version = list(trigger_list_version)
+        queries = [self.getHLTRateQuery(runNumber,name,minLS,maxLS) for name in trigger_list_version]
+        for name, q, response in zip(trigger_list_version, queries, self.fetchAll(queries)):
+            # Only paths with more than PAGE_LIMIT LS need more pages
+            rows = self.getHLTRateRows(self.iterPages(q, first_page=response['data']))
+            trigger_rates[stripVersion(name)] = unprescale(name,rows)
+
+        return trigger_rates
+
+    # Returns: Whether to get the rates of n_paths paths of the menu with the bulk query rather than one query per path
+    # Note: The bulk query pages through the rows of every path of the menu, it only pays off when we want most of them
+    def useBulkHLTRates(self, n_paths):
+
+        if not self.use_bulk_hlt or n_paths < self.bulk_hlt_min_paths:
+            return False
+        return n_paths >= self.bulk_hlt_min_fraction*len(self.HLT_name_map)
+
+    # Use: Gets the HLT rates of many triggers at once, paging through the rates of all the paths in the run
+    # Note: Like getSingleHLTRate, this depends on the self variables populated in getHLTRates
+    # Returns: dictionary [trigger_name][LS] <rate><prescale>, or [trigger_name] RateColumns with columns
+    def getBulkHLTRates(self, runNumber, trigger_list_version, minLS=-1, maxLS=9999999, columns=False):
+
+        q = omsapi.query("hltpathrates")
+        q.filter("run_number", runNumber)
+        q.filter("first_lumisection_number", minLS, "GE")
+        q.filter("last_lumisection_number", maxLS, "LE")
+        q.custom("fields", "path_name,first_lumisection_number,rate")
+        # The rows are paged by offset, they must come in the same order in every page. Not q.sort(), which doesn't keep the order of the keys
+        q.custom("sort", "path_name,first_lumisection_number")
+        data = self.iterPages(q)
+
+        # Demultiplex the rows by path, keeping only the paths we asked for
+        path_rows = {}
         for name in trigger_list_version:
-            # Ignore triggers which don't appear in this run
-            if not self.HLT_name_map:
+            path_rows[name] = []
+        for item in data:
+            name = item['attributes']['path_name']
+            if name not in path_rows:
                 continue
-            trigger_rates[stripVersion(name)] = self.getSingleHLTRate(runNumber,name,minLS,maxLS)
+            path_rows[name].append((item['attributes']['first_lumisection_number'], item['attributes']['rate']))
+
+        unprescale = self.unprescaleHLTRates if columns else self.applyHLTPrescales
+        trigger_rates = {}
+        for name in trigger_list_version:
+            trigger_rates[stripVersion(name)] = unprescale(name,path_rows[name])
 
         return trigger_rates
 
     # Use: Gets the HLT rates of a single trigger
     # Note: This is only designed to be called within getHLTRates, since it depends on many self variables being populated before calling
+    # Returns: dictionary [LS] <rate><prescale>
     def getSingleHLTRate(self, runNumber, name, minLS=-1, maxLS=9999999):
 
+        return self.getHLTRateColumns(runNumber,name,minLS,maxLS).toDict()
+
+    # Use: Gets the HLT rates of a single trigger, like getSingleHLTRate, but stored by column
+    # Returns: RateColumns
+    def getHLTRateColumns(self, runNumber, name, minLS=-1, maxLS=9999999):
+
+        q = self.getHLTRateQuery(runNumber,name,minLS,maxLS)
+        data = self.iterPages(q)
+
+        return self.unprescaleHLTRates(name,self.getHLTRateRows(data))
+
+    # Returns: The query for the rates of a single HLT path
+    def getHLTRateQuery(self, runNumber, name, minLS=-1, maxLS=9999999):
+
         q = omsapi.query("hltpathrates")
         q.filter("run_number", runNumber)
         q.filter("path_name", name)
@@ -219,64 +523,82 @@ class DBParser:
         q.filter("last_lumisection_number", maxLS, "LE")
         q.custom("fields", "first_lumisection_number,rate")
         q.per_page = PAGE_LIMIT
-        data = q.data().json()['data']
-        trigger_rates = {}
+
+        return q
+
+    # Returns: list of (LS, rate) of the 'data' items of an hltpathrates query
+    def getHLTRateRows(self, data):
+
+        rows = []
         for item in data:
-            LS = item['attributes']['first_lumisection_number']
-            rate = item['attributes']['rate']
-            hltps = 0 # HLT Prescale                                                                                                                                                                       
+            rows.append((item['attributes']['first_lumisection_number'], item['attributes']['rate']))
+
+        return rows
+
+    # Use: Un-prescales the (LS, rate) rows of a single HLT path, using the L1 and HLT prescales of the run
+    # Returns: dictionary [LS] <rate><prescale>
+    def applyHLTPrescales(self, name, rows):
+
+        return self.unprescaleHLTRates(name,rows).toDict()
+
+    # Use: Un-prescales the (LS, rate) rows of a single HLT path, a whole column at a time (see RateColumns.py)
+    # Returns: RateColumns
+    def unprescaleHLTRates(self, name, rows):
+
+        prescales, default = self.getPathPrescales(name)
+        if not rows:
+            return RateColumns.RateColumns()
+        ls, rates = zip(*rows)
+
+        return RateColumns.unprescale(ls,rates,self.PSColumnByLS,prescales,default)
 
-            # TODO: We can probably come up with a better solution then a try, except here                                                                                                                 
+    # Use: Combines the effective L1 prescale of the seed and the HLT prescale of a path, in each prescale column
+    # Note: The L1 seed expression is only compiled once per L1 menu (see L1Seeds.py), the result is kept until the next menu is loaded
+    # Returns: ([prescale], default), the total prescale indexed by the prescale column, and the prescale of any other column
+    def getPathPrescales(self, name):
+
+        if name in self.path_prescales:
+            return self.path_prescales[name]
+
+        seed = None
+        if name in self.HLTSeed:
             try:
-                psi = self.PSColumnByLS[LS] # Get the prescale index                                                                                                                                       
-            except:
-                psi = 0
-            if psi is None:
-                psi = 0
+                seed = L1Seeds.seed_cache.get(self.getL1MenuKey(),self.HLTSeed[name],self.L1Prescales,self.L1IndexNameMap)
+            except ValueError as e:
+                print("Unable to parse the L1 seed of %s: %s" % (name,e))
+        hlt_prescales = self.HLTPrescales.get(name,[])
+
+        n_columns = len(hlt_prescales)
+        if seed is not None and not seed.constant:
+            n_columns = max(n_columns,len(seed.vector))
+        prescales = []
+        for psi in range(n_columns + 1):
             try:
-                hltps = self.HLTPrescales[name][psi]
-            except:
+                hltps = float(hlt_prescales[psi]) # HLT Prescale
+            except IndexError:
                 hltps = 1.
-            hltps = float(hltps)
-            try:
-                if self.HLTSeed[name] in self.L1IndexNameMap:
-                    l1ps = self.L1Prescales[self.L1IndexNameMap[self.HLTSeed[name]]][psi]
-                else:
-                    l1ps = self.UnwindORSeed(self.HLTSeed[name],self.L1Prescales,psi)
-            except:
+            if seed is not None:
+                l1ps = seed.get(psi,1)
+            else:
                 l1ps = 1
-            ps = l1ps*hltps
-            trigger_rates[LS] = [ps*rate, ps]
+            prescales.append(l1ps*hltps)
+        # The last entry is for the columns after all the known ones
+        default = prescales.pop()
 
-        return trigger_rates
+        self.path_prescales[name] = (prescales, default)
+        return self.path_prescales[name]
 
-    # Returns: The minimum prescale value                                                                                                                                                                  
-    def UnwindORSeed(self,expression,L1Prescales,psi):
+    # Returns: The key of the L1 menu and prescale table of the current run, or None if we don't know them
+    def getL1MenuKey(self):
 
-        """                                                                                                                                                                                                
-        Figures out the effective prescale for the OR of several seeds                                                                                                                                     
-        we take this to be the *LOWEST* prescale of the included seeds                                                                                                                                     
-        """
-        if expression.find(" AND ") != -1:
-            return 1
-        seedList = []
-        # This 'if' might be redundent                                                                                                                                                                     
-        if expression.find(" OR ") != -1:
-            for elem in expression.split(" OR "):
-                # Strip all whitespace from the split strings                                                                                                                                              
-                seedList.append(elem.replace(" ",""))
-        else:
-            expression = expression.replace(" ","")
-            seedList.append(expression)
-        minPS = 99999999999
-        for seed in seedList:
-            if seed not in self.L1IndexNameMap:
-                continue
-            ps = L1Prescales[self.L1IndexNameMap[seed]][psi]
-            if ps: minPS = min(ps,minPS)
+        if self.GT_Key == "" or self.GTRS_Key == "":
+            return None
+        return (self.GT_Key, self.GTRS_Key)
+
+    # Returns: The effective prescale of an L1 seed expression in the prescale column psi (see L1Seeds.py)
+    def UnwindORSeed(self,expression,L1Prescales,psi):
 
-        if minPS == 99999999999: return 0
-        else: return minPS
+        return L1Seeds.compilePrescales(expression,L1Prescales,self.L1IndexNameMap).get(psi,1)
 
     # Generates a dictionary that maps HLT path names to the corresponding path_id
     def getHLTNameMap(self,runNumber):
@@ -285,8 +607,7 @@ class DBParser:
         q.set_validation(False)
         q.filter("run_number", runNumber)
         q.custom("fields", "path_name,path_id")
-        q.per_page = PAGE_LIMIT
-        data = q.data().json()['data']
+        data = self.iterPages(q)
         name_map = {}
         for item in data:
             name_map[item['attributes']['path_name']] = item['attributes']['path_id']
@@ -303,8 +624,7 @@ class DBParser:
         q.set_validation(False)
         q.filter("run_number", runNumber)
         q.custom("fields", "path_name,l1_prerequisite")
-        q.per_page = PAGE_LIMIT
-        data = q.data().json()['data']
+        data = self.iterPages(q)
         for item in data:
             if item['attributes']['l1_prerequisite'] != None:
                 self.HLTSeed[item['attributes']['path_name']] = item['attributes']['l1_prerequisite'].lstrip('"').rstrip('"')
@@ -315,8 +635,8 @@ class DBParser:
         q = omsapi.query("hltprescalesets")
         q.set_validation(False)
         q.filter("run_number", runNumber)
-        q.per_page = PAGE_LIMIT
-        data = q.data().json()['data']
+        q.custom("fields", "path_name,prescales")
+        data = self.iterPages(q)
         for item in data:
             row = []
             for a in item['attributes']['prescales']:
@@ -327,47 +647,20 @@ class DBParser:
     # Returns: list [bunches_colliding, bunches_target]
     def getNumberCollidingBunches(self, runNumber):
         
-        q = omsapi.query("runs")
-        q.filter("run_number", runNumber)
-        q.custom("fields", "fill_number")
-        q.per_page = 1
-        data = q.data().json()
-        q2 = omsapi.query("fills")
-        q2.filter("fill_number", data['data'][0]['attributes']['fill_number'])
-        q2.custom("fields", "bunches_colliding,bunches_target")
-        q2.per_page = 1
-        data2 = q2.data().json()
-        try:
-            bunches = [data2['data'][0]['attributes']['bunches_colliding'], data2['data'][0]['attributes']['bunches_target']]
-        except:
+        meta = self.getRunMetadata(runNumber)
+        if meta is None:
             print("Failed to get run info")
             return [0,0]
 
-        if bunches[0] == None:
-            bunches[0] = 0
-        if bunches[1] == None:
-            bunches[1] = 0
-
-        return bunches
+        return list(meta.bunches)
     
     def getFillType(self, runNumber):
         
-        q = omsapi.query("runs")
-        q.filter("run_number", runNumber)
-        q.custom("fields", "fill_number")
-        q.per_page = 1
-        data = q.data().json()
-        q2 = omsapi.query("fills")
-        q2.filter("fill_number", data['data'][0]['attributes']['fill_number'])
-        q2.custom("fields", "fill_type_runtime")
-        q2.per_page = 1
-        data2 = q2.data().json()
-        try:
-            fill_type = data2['data'][0]['attributes']['fill_type_runtime']
-        except:
+        meta = self.getRunMetadata(runNumber)
+        if meta is None or meta.fill_type is None:
             print("Failed to get fill type info")
             return None 
-        return fill_type
+        return meta.fill_type
 
     # Use: Get the latest LHC Satus
     # Returns: string
@@ -376,7 +669,8 @@ class DBParser:
         q = omsapi.query("diplogger")
         q.filter("source_dir", "dip/acc/LHC/RunControl/BeamMode")
         q.filter("dip_time", "last")
-        data = q.data().json()
+        q.custom("fields", "value")
+        data = self.fetch(q)
         return data['data'][0]['attributes']['value']
         
     # Use: Gets the dead time as a function of lumisection
@@ -384,30 +678,38 @@ class DBParser:
     def getDeadTime(self,runNumber,minLS=-1,maxLS=9999999):
 
         q = omsapi.query("deadtimes")
-        q.per_page = PAGE_LIMIT
         q.custom("group[granularity]", "lumisection")
         q.filter("run_number", runNumber)
         q.filter("first_lumisection_number", minLS, "GE")
         q.filter("last_lumisection_number", maxLS, "LE")
         q.custom("fields", "first_lumisection_number,beamactive_total_deadtime")
-        data = q.data().json()['data']
+        data = self.iterPages(q)
         deadTime = {}
         for item in data:
             deadTime[item['attributes']['first_lumisection_number']] = item['attributes']['beamactive_total_deadtime']['percent']
             
         return deadTime
 
-    # Use: Gets the L1A physics lost rate as a function of lumisection
-    # Returns: A dictionary: [ LS ] <rate>
-    def getL1APhysicsLost(self,runNumber,minLS=-1,maxLS=9999999):
+    # Returns: The query for the total L1 rates of a run, by lumisection
+    # Note: All the getters of the l1triggerrates ask for the same fields, so that they send the very same query, which is
+    #       only sent once per cycle (see beginCycle) and cached only once
+    def getL1TriggerRatesQuery(self, runNumber, minLS=-1, maxLS=9999999):
 
         q = omsapi.query("l1triggerrates")
         q.custom("group[granularity]", "lumisection")
         q.filter("run_number", runNumber)
         q.filter("first_lumisection_number", minLS, "GE")
         q.filter("last_lumisection_number", maxLS, "LE")
-        q.custom("fields", "first_lumisection_number,trigger_physics_lost")
-        data = q.data().json()['data']
+        q.custom("fields", ",".join(["first_lumisection_number"] + L1_TRIGGER_RATES))
+
+        return q
+
+    # Use: Gets the L1A physics lost rate as a function of lumisection
+    # Returns: A dictionary: [ LS ] <rate>
+    def getL1APhysicsLost(self,runNumber,minLS=-1,maxLS=9999999):
+
+        q = self.getL1TriggerRatesQuery(runNumber,minLS,maxLS)
+        data = self.iterPages(q)
         l1rate = {}
         for item in data:
             l1rate[item['attributes']["first_lumisection_number"]] = item['attributes']["trigger_physics_lost"]["rate"]
@@ -417,15 +719,9 @@ class DBParser:
     # Use: Gets the total L1A physics rate as a function of lumisection
     # Returns: A dictionary: [ LS ] <rate>
     def getL1APhysics(self, runNumber,minLS=-1,maxLS=9999999):
-        
-        q = omsapi.query("l1triggerrates")
-        q.custom("group[granularity]", "lumisection")
-        q.filter("run_number", runNumber)
-        q.filter("first_lumisection_number", minLS, "GE")
-        q.filter("last_lumisection_number", maxLS, "LE")
-        q.custom("fields", "first_lumisection_number,l1a_physics")
-        q.per_page=PAGE_LIMIT
-        data = q.data().json()['data']
+
+        q = self.getL1TriggerRatesQuery(runNumber,minLS,maxLS)
+        data = self.iterPages(q)
         l1rate = {}
         for item in data:
             l1rate[item['attributes']["first_lumisection_number"]] = item['attributes']["l1a_physics"]["rate"]
@@ -436,14 +732,8 @@ class DBParser:
     # Returns: A dictionary: [ LS ] <rate>
     def getL1TotalPreDT(self, runNumber,minLS=-1,maxLS=9999999):
 
-        q = omsapi.query("l1triggerrates")
-        q.custom("group[granularity]", "lumisection")
-        q.filter("run_number", runNumber)
-        q.filter("first_lumisection_number", minLS, "GE")
-        q.filter("last_lumisection_number", maxLS, "LE")
-        q.custom("fields", "first_lumisection_number,total_before_deadtime")
-        q.per_page=PAGE_LIMIT
-        data = q.data().json()['data']
+        q = self.getL1TriggerRatesQuery(runNumber,minLS,maxLS)
+        data = self.iterPages(q)
         l1rate = {}
         for item in data:
             l1rate[item['attributes']["first_lumisection_number"]] = item['attributes']["total_before_deadtime"]["rate"]
@@ -453,15 +743,9 @@ class DBParser:
     # Use: Gets the total L1A calibration rate as a function of lumisection
     # Returns: A dictionary: [ LS ] <rate>
     def getL1ACalib(self, runNumber,minLS=-1,maxLS=9999999):
-        
-        q = omsapi.query("l1triggerrates")
-        q.custom("group[granularity]", "lumisection")
-        q.filter("first_lumisection_number", minLS, "GE")
-        q.filter("last_lumisection_number", maxLS, "LE")
-        q.filter("run_number", runNumber)
-        q.custom("fields", "first_lumisection_number,l1a_calibration")
-        q.per_page=PAGE_LIMIT
-        data = q.data().json()['data']
+
+        q = self.getL1TriggerRatesQuery(runNumber,minLS,maxLS)
+        data = self.iterPages(q)
         l1rate = {}
         for item in data:
             l1rate[item['attributes']["first_lumisection_number"]] = item['attributes']["l1a_calibration"]["rate"]
@@ -471,15 +755,9 @@ class DBParser:
     # Use: Gets the total L1ARand rate as a function of lumisection
     # Returns: A dictionary: [ LS ] <rate>
     def getL1ARand(self, runNumber,minLS=-1,maxLS=9999999):
-        
-        q = omsapi.query("l1triggerrates")
-        q.custom("group[granularity]", "lumisection")
-        q.filter("run_number", runNumber)
-        q.filter("first_lumisection_number", minLS, "GE")
-        q.filter("last_lumisection_number", maxLS, "LE")
-        q.custom("fields", "first_lumisection_number,l1a_random")
-        q.per_page=PAGE_LIMIT
-        data = q.data().json()['data']
+
+        q = self.getL1TriggerRatesQuery(runNumber,minLS,maxLS)
+        data = self.iterPages(q)
         l1rate = {}
         for item in data:
             l1rate[item['attributes']["first_lumisection_number"]] = item['attributes']["l1a_random"]["rate"]
@@ -489,15 +767,9 @@ class DBParser:
     # Use: Gets the TOTAL L1 rate as a function of lumisection
     # Returns: A dictionary: [ LS ] <rate>
     def getL1rate(self, runNumber,minLS=-1,maxLS=9999999):
-        
-        q = omsapi.query("l1triggerrates")
-        q.custom("group[granularity]", "lumisection")
-        q.filter("run_number", runNumber)
-        q.filter("first_lumisection_number", minLS, "GE")
-        q.filter("last_lumisection_number", maxLS, "LE")
-        q.custom("fields", "first_lumisection_number,l1a_total")
-        q.per_page=PAGE_LIMIT
-        data = q.data().json()['data']
+
+        q = self.getL1TriggerRatesQuery(runNumber,minLS,maxLS)
+        data = self.iterPages(q)
         l1rate = {}
         for item in data:
             l1rate[item['attributes']["first_lumisection_number"]] = item['attributes']["l1a_total"]["rate"]
@@ -512,7 +784,7 @@ class DBParser:
         q.sort("run_number", asc=False)
         q.custom("fields", "run_number")
         q.per_page = 1
-        data = q.data().json()
+        data = self.fetch(q)
         try:
             runNumber = data['data'][0]['attributes']['run_number']
         except:
@@ -533,16 +805,12 @@ class DBParser:
     # Returns: string
     def getTriggerMode(self, runNumber):
         
-        q = omsapi.query("runs")
-        q.filter("run_number", runNumber)
-        q.custom("fields", "trigger_mode")
-        q.per_page = 1
-        try:
-            mode = q.data().json()['data'][0]['attributes']['trigger_mode']
-        except:
+        meta = self.getRunMetadata(runNumber)
+        if meta is None:
             print("Error: Unable to retrieve trigger mode.")
+            return None
         
-        return mode
+        return meta.trigger_mode
 
     # Use: Get the lastest runs in a fill with stable beam
     # Returns: list, with run numbers
@@ -551,8 +819,7 @@ class DBParser:
         q = omsapi.query("lumisections")
         q.filter("fill_number", fillNumber)
         q.custom("fields", "physics_flag,beam1_stable,beam2_stable,run_number")
-        q.per_page = PAGE_LIMIT
-        data = q.data().json()['data']
+        data = self.iterPages(q)
         run_list = []
         for item in data:
             if item['attributes']['physics_flag']*item['attributes']['beam1_stable']*item['attributes']['beam2_stable']:
@@ -569,7 +836,7 @@ class DBParser:
         q.sort("fill_number", asc=False)
         q.custom("fields", "fill_number")
         q.per_page = 1
-        data = q.data().json()
+        data = self.fetch(q)
         last_fill = data['data'][0]['attributes']['fill_number']
         run_list = []
         run_list += self.getFillRuns(last_fill)
@@ -583,9 +850,8 @@ class DBParser:
         q = omsapi.query("hltconfigdata")
         q.set_validation(False)
         q.filter("run_number", runNumber)
-        q.per_page = PAGE_LIMIT
         q.custom("fields", "stream_name,path_name")
-        data = q.data().json()['data']
+        data = self.iterPages(q)
         stream_paths = {}
         for item in data:
             if item['attributes']['stream_name'] == None:
@@ -602,92 +868,88 @@ class DBParser:
         
         q = omsapi.query("l1prescalesets")
         q.filter("run_number", runNumber)
-        q.per_page = PAGE_LIMIT
         q.custom("fields", "algo_name")
-        data = q.data().json()['data']
+        data = self.iterPages(q)
         L1_list = []
         for item in data:
             L1_list.append(item['attributes']['algo_name'])
 
         return L1_list
 
-    # Use: Gets the rates of L1 triggers per lumiseciton
+    # Use: Gets the rates of L1 triggers per lumiseciton, all the triggers or only those in trigList, always with a single query
+    # Note: The columnar l1algorithmtriggers/ratemon response has one entry per LS, indexed by the LS number (LS 0 is empty)
     # Returns: dictionary <trigger_name><LS>(rate, prescale)
     def getL1Rates(self, runNumber, minLS=-1, maxLS=9999999, trigList=[]):
         
         L1Triggers = {}
-        #Get all the triggers in one query
+        q = omsapi.query("l1algorithmtriggers/ratemon")
+        q.filter("run_number", runNumber)
+        try:
+            data = self.fetch(q)['data']['attributes']
+        except:
+            print("Failed to get L1Prescales")
+            return {}
+
+        # The columns (i.e. bits) of the triggers we want
+        columns = []
         if trigList == []:
-            q = omsapi.query("l1algorithmtriggers/ratemon")
-            q.filter("run_number", runNumber)
-            try:
-                data = q.data().json()['data']['attributes']
-            except:
-                print("Failed to get L1Prescales")
-                return {}
-            for lumi, item in enumerate(data['lumisections']):
-                #bypass lumisecion 0, which is empty
-                if item == {}:
-                    continue
-                if lumi < minLS:
-                    continue
-                if lumi > maxLS:
-                    break
-                for (rate, name, prescale) in zip(item['pre_dt_before_prescale_rate'], data['names'], data['prescales']):
-                    if name == None or prescale == None:
-                        continue
-                    if name not in L1Triggers:
-                        L1Triggers[name] = {}
-                    L1Triggers[name][lumi] = [rate, prescale['value']]
-
-        #Get the triggers for a subset of the total list, getting them one at a time
-        else: 
-            q = omsapi.query("l1algorithmtriggers")
-            q.custom("fields", "pre_dt_before_prescale_rate,initial_prescale,first_lumisection_number")
+            wanted = None
+        else:
+            wanted = set(trigList)
             for name in trigList:
                 L1Triggers[name] = {}
-                q.clear_filter()
-                q.filter("run_number", runNumber)
-                q.filter("name", name)
-                q.per_page = PAGE_LIMIT
-                try:
-                    data = q.data().json()['data']
-                except:
-                    print("Failed to get L1Prescales")
-                    return {}
-                for lumi, item in enumerate(data):
-                    if lumi < minLS:
-                        continue
-                    if lumi > maxLS:
-                        break
-                    L1Triggers[name][lumi] = [item['attributes']['pre_dt_before_prescale_rate'], item['attributes']['initial_prescale']['prescale']]
+        for column, (name, prescale) in enumerate(zip(data['names'], data['prescales'])):
+            if name == None or prescale == None:
+                continue
+            if wanted is not None and name not in wanted:
+                continue
+            columns.append((column, name, prescale['value']))
+
+        for lumi, item in enumerate(data['lumisections']):
+            #bypass lumisecion 0, which is empty
+            if item == {}:
+                continue
+            if lumi < minLS:
+                continue
+            if lumi > maxLS:
+                break
+            rates = item['pre_dt_before_prescale_rate']
+            for column, name, prescale in columns:
+                if name not in L1Triggers:
+                    L1Triggers[name] = {}
+                L1Triggers[name][lumi] = [rates[column], prescale]
 
         return L1Triggers
 
     # Use: Get the rates per stream as a function of lumisection
+    # Note: Both minLS and maxLS are included in the range
     # Returns: dictionary, <stream>(LS, rate, size, bandwidth)
     def getStreamData(self, runNumber, minLS=-1, maxLS=9999999):
 
         StreamData = {}
         if minLS < 1:
             minLS = 1
-        for LS in range(minLS, maxLS):
-            q = omsapi.query("streams")
-            q.per_page=PAGE_LIMIT
-            q.filter("run_number", runNumber)
-            q.filter("last_lumisection_number", LS)
-            q.custom("fields", "last_lumisection_number,rate,file_size,bandwidth,stream_name")
-            response = q.data().json()['data']
-            if response == []:
-                break
-            for item in response:
-                stream_name = item['attributes']['stream_name']
-                if stream_name not in StreamData:
-                    StreamData[stream_name] = []
-                StreamData[stream_name].append([item['attributes']['last_lumisection_number'], 
-                                                item['attributes']['rate'], 
-                                                item['attributes']['file_size']*1000000000, 
-                                                item['attributes']['bandwidth']*1000000])
+        q = omsapi.query("streams")
+        q.filter("run_number", runNumber)
+        q.filter("last_lumisection_number", minLS, "GE")
+        q.filter("last_lumisection_number", maxLS, "LE")
+        q.custom("fields", "last_lumisection_number,rate,file_size,bandwidth,stream_name")
+        try:
+            data = self.iterPages(q)
+        except:
+            print("Unable to get the stream data for run %s" % runNumber)
+            return StreamData
+        for item in data:
+            stream_name = item['attributes']['stream_name']
+            if stream_name not in StreamData:
+                StreamData[stream_name] = []
+            StreamData[stream_name].append([item['attributes']['last_lumisection_number'], 
+                                            item['attributes']['rate'], 
+                                            item['attributes']['file_size']*1000000000, 
+                                            item['attributes']['bandwidth']*1000000])
+        for stream_name in StreamData:
+            StreamData[stream_name].sort(key=lambda x: x[0])
+
         return StreamData
 
     # Use: Get info for L1 prescales and bit trigger relations
@@ -697,9 +959,9 @@ class DBParser:
         
         q = omsapi.query("l1prescalesets")
         q.filter("run_number", runNumber)
-        q.per_page = PAGE_LIMIT
+        q.custom("fields", "algo_name,algo_index,algo_mask,prescales")
         try:
-            data = q.data().json()['data']
+            data = self.iterPages(q)
         except:
             print("Get L1 Name Index failed")
             return
@@ -712,32 +974,57 @@ class DBParser:
             for row in item['attributes']['prescales']:
                 self.L1Prescales[item['attributes']['algo_index']][row['prescale_index']] = row['prescale']
 
-    # Use: Get the rate for each dataset in a run
+    # Use: Get the rate for each dataset in a run, with a single query for all the datasets
+    # Parameters:
+    # -- incremental: only fetch the LS after the last one returned by the previous incremental call for this run (or from minLS, if that is later)
     # Returns: dicitonary <Dataset name>[lumiseciton, rate]
-    def getPrimaryDatasets(self, runNumber, minLS=-1, maxLS=9999999):
+    def getPrimaryDatasets(self, runNumber, minLS=-1, maxLS=9999999, incremental=False):
 
+        if incremental and runNumber in self.PDLastLS:
+            minLS = max(minLS, self.PDLastLS[runNumber] + 1)
         q = omsapi.query("datasetrates")
-        q.per_page = PAGE_LIMIT
         q.filter("run_number", runNumber)
-        q.filter("first_lumisection_number", 1)
-        q.custom("fields", "rate,dataset_name,first_lumisection_number,last_lumisection_number")
+        q.filter("first_lumisection_number", minLS, "GE")
+        q.filter("last_lumisection_number", maxLS, "LE")
+        q.custom("fields", "rate,dataset_name,first_lumisection_number")
         try:
-            data = q.data().json()['data']
+            data = self.iterPages(q)
         except:
             print("Error: Unable to retrieve PD data.")
-        PrimaryDatasets = {}
+            return {}
+        # Every dataset of the run gets an entry, the ones without rows in the LS range an empty list
+        PrimaryDatasets = dict([(name, []) for name in self.getDatasetNames(runNumber)])
         for item in data:
-            PrimaryDatasets[item['attributes']['dataset_name']] = []
-            q.clear_filter()
-            q.filter("run_number", runNumber)
-            q.filter("dataset_name", item['attributes']['dataset_name'])
-            q.filter("first_lumisection_number", minLS, "GE")
-            q.filter("last_lumisection_number", maxLS, "LE")
-            rates = q.data().json()['data']
-            for rate in rates:
-                PrimaryDatasets[item['attributes']['dataset_name']].append([rate['attributes']['first_lumisection_number'], rate['attributes']['rate']])
+            name = item['attributes']['dataset_name']
+            if name not in PrimaryDatasets:
+                PrimaryDatasets[name] = []
+            PrimaryDatasets[name].append([item['attributes']['first_lumisection_number'], item['attributes']['rate']])
+        for name in PrimaryDatasets:
+            PrimaryDatasets[name].sort(key=lambda x: x[0])
+            if incremental and PrimaryDatasets[name]:
+                self.PDLastLS[runNumber] = max(self.PDLastLS.get(runNumber, 0), PrimaryDatasets[name][-1][0])
 
         return PrimaryDatasets
+
+    # Use: Gets the names of the datasets of a run, from their rates in the first LS
+    # Note: They are only queried once per run, unless none was found yet
+    # Returns: list of dataset names
+    def getDatasetNames(self, runNumber):
+
+        if runNumber in self.PDNames:
+            return self.PDNames[runNumber]
+        q = omsapi.query("datasetrates")
+        q.filter("run_number", runNumber)
+        q.filter("first_lumisection_number", 1)
+        q.custom("fields", "dataset_name")
+        try:
+            names = [item['attributes']['dataset_name'] for item in self.iterPages(q)]
+        except:
+            print("Error: Unable to retrieve the PD names.")
+            return []
+        if names:
+            self.PDNames[runNumber] = names
+        return names
         
     # This is a function for the old DBParser.py that was not able to be transferred to the OMS DB                                                                                                                                                                                                                                                                         
     # It is designed to get the list of Datasets and each HLT path within it                                                                                                                                                                                                                                                                                               
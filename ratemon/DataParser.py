@@ -11,14 +11,25 @@
 #####################################################################
 
 import array
+import copy
+import operator
+from collections import deque
+from itertools import compress
+from concurrent.futures import ThreadPoolExecutor
 
 import DBParser
+from LumiSections import PrescaleColumnIndex, IntervalSet, LumiInfo
+from RunStore import RunStore, RunIndex, makeRecord
+from RunCache import makeKey
+from RateColumns import RateColumns, DeadTimeCorrection
 from Exceptions import *
 
 # --- 13 TeV constant values ---
 ppInelXsec = 80000.
 orbitsPerSec = 11245.6
 
+DEFAULT_RUN_WORKERS = 1     # Runs parsed at the same time (one after the other by default), their queries still go through the OMS executor's workers
+
 LUMI_INFO_MAP = {
     "LS":       0,
     "ILUM":     1,
@@ -27,6 +38,31 @@ LUMI_INFO_MAP = {
     "CMSREADY": 4
 }
 
+# Returns: A list with the value of each position of the run index, NaN for the positions without value (or with None)
+# Parameters:
+# -- positions, values: the positions which have a value, and their value, None if there is no value at all
+def spreadColumn(positions,values,n_positions):
+    # type: (List[int],List[float],int) -> List[float]
+    column = [float('nan')]*n_positions
+    if values is None:
+        return column
+    if None in values:
+        values = [float('nan') if x is None else x for x in values]
+    for position,x in zip(positions,values):
+        column[position] = x
+    return column
+
+# The data of a single run, as fetched and parsed by DataParser.parseRun
+class ParsedRun:
+    def __init__(self,run):
+        # type: (int) -> None
+        self.run = run
+        self.bunches = 1
+        self.lumi_info = None   # LumiInfo: [ (LS,ilum,psi,phys,cms_ready,pileup) ], None if the run has no lumi info
+        self.records = {}       # {'object': {'field': array}}, the columns of each object, see RunStore.makeRecord
+        self.type_map = {}      # {'object': type}, the types of the objects found in the run
+        self.dropped_ls = []    # The LS dropped for having too much dead time
+
 #TODO: Rework how we store run_data info to also include a 'type' field, to avoid problems with identical stream/dataset names
 class DataParser:
     # This is an interface for DBParser() to select and manage the data returned by DBParser()
@@ -35,38 +71,31 @@ class DataParser:
 
         self.parser = DBParser.DBParser()
 
-        # The lists all have the same number of elements, e.g.: len(self.lumi_data[trg][run]) == len(self.pu_data[trg][run])
-        self.ls_data   = {}    # {'name': { run_number: [LS] } }
-        self.rate_data = {}    # {'name': { run_number: { LS: raw_rates } } }
-        self.cs_data   = {}    # {'name': { run_number: { LS: cross_section } } }
-        self.ps_data   = {}    # {'name': { run_number: { LS: prescale  } } }
-        self.pu_data   = {}    # {'name': { run_number: { LS: PU } } }
-        self.lumi_data = {}    # {'name': { run_number: { LS: iLumi } } }
-        self.det_data  = {}    # {'name': { run_number: { LS: detecotr_ready } } }
-        self.phys_data = {}    # {'name': { run_number: { LS: phys_active } } }
-        self.bw_data   = {}    # {'name': { run_number: { LS: bandwidth } } }
-        self.size_data = {}    # {'name': { run_number: { LS: size } } }
-        self.lumi_info = {}    # {run_number: [ (LS,ilum,psi,phys,cms_ready) ] }
+        # The LS, raw rates, cross sections, prescales, PU, iLumi, detector ready, phys active, bandwidth, size and runcount
+        # of each object in each run, one array per quantity, e.g.: len(self.store.getView("ilumi")[trg][run]) == len(self.store.getView("PU")[trg][run])
+        self.store = RunStore()
+        self.lumi_info = {}    # {run_number: LumiInfo }, i.e. [ (LS,ilum,psi,phys,cms_ready,pileup) ]
+        self.ps_columns = {}   # {run_number: PrescaleColumnIndex }
         self.bunch_map = {}    # {run_number: nBunches }
-        self.runcount_data = {}    # {'name': { run_number: { LS: runcount } } } 
+        self.dropped_ls = {}   # {run_number: [LS]}, the LS dropped for having more than max_deadtime
 
         self.hlt_triggers = []  # List of specific HLT triggers we want to get rates for, if empty --> get all HLT rates
         self.l1_triggers  = []  # List of specific L1 triggers we want to get rates for, if empty --> get all L1 rates
         self.runs_used    = []  # List of runs which had rate info for queried objects
         self.runs_skipped = []  # List of runs which did not have rate info for queried objects
         self.name_list = []     # List of all named objects for which we have data, e.g. triggers, datasets, streams, etc...
-        self.psi_filter = []
+        self.psi_filter = []    # IntervalSet (or list) of the prescale columns to keep, when use_ps_mask is set
         self.type_map = {}      # Maps each object name to a type: trigger, dataset, stream, or L1A
                                 # NOTE: Still need to handle the case where if two objects share the same name, but diff type
                                 # NOTE2: This approach should be fine, since DataParser owns the nameing, will need to be careful
 
-        self.ls_veto = {}     # {run_number:[LS list]} - LS to ignore
+        self.ls_veto = {}     # {run_number: IntervalSet} - LS to ignore, lists of LS work as well
         self.name_veto = []   # List of paths/objects to remove from consideration
 
         self.use_prescaled_rate = False # If true, then rates are not un-prescaled
         self.normalize_bunches  = True  # Normalize by the number of colliding bunches
         self.correct_for_DT = True
-        self.convert_output = True      # Flag to convert data from { LS: data } to [ data ], used in the data getters
+        self.convert_output = True      # Flag to return the data as [ data ] rather than { LS: data }, used in the data getters
 
         self.skip_l1_triggers = False   # Flag to skip collecting rates for L1 triggers
         self.skip_hlt_triggers = False  # Flag to skip collecting rates for HLT triggers
@@ -89,11 +118,47 @@ class DataParser:
         self.use_PLTZ_lumi = False      # Uses luminosity reading from PLTZ
         self.use_HF_lumi   = False      # Uses luminosity reading from HF
 
+        self.run_workers = DEFAULT_RUN_WORKERS  # Number of runs fetched and parsed at the same time by parseRuns
+        self.run_cache = None   # RunCache the parsed runs which have ended are stored in and read back from, None to always parse the runs
+
         self.verbose = True
 
     def parseRuns(self,run_list,get_all_rates):
         # type: (List[int]) -> None
+        for run,objects in self.iterRuns(run_list,get_all_rates):
+            for name,record in objects.items():
+                self.store.addRecord(name,run,record)
+
+    # Use: Fetches and parses the runs one at a time, without keeping their data: only the lumi info, number of
+    #      bunches, etc... of the runs are added to this DataParser, the store is left untouched
+    # Returns: A generator of (run_number, {'name': {'field': array}}), the columns of the objects of each run with
+    #          usable data, in the format of RunStore (the fields an object doesn't have are None)
+    # Note: The arrays are given in the order of the LS whatever convert_output is, and may be shared with other
+    #       objects of the same run, they must not be modified
+    def iterRuns(self,run_list,get_all_rates):
+        # type: (List[int],bool) -> Iterator[Tuple[int,Dict[str,Dict[str,array.array]]]]
+        self.selectTriggers(get_all_rates)
+
+        n_runs_usable = 0
+        for counter,parsed in enumerate(self.iterParsedRuns(sorted(run_list)),1):
+            if self.verbose and self.run_workers > 1: print("Parsed run: %d (%d/%d)" % (parsed.run,counter,len(run_list)))
+            if not self.addParsedRun(parsed):
+                continue
+            n_runs_usable += 1
+            objects = {}
+            for name,record in parsed.records.items():
+                if name in self.name_veto:
+                    continue
+                objects[name] = record
+            yield parsed.run,objects
+        if n_runs_usable == 0:
+            raise NoDataError(run_list)
 
+    # Use: Sets which of the L1 and HLT triggers are parsed
+    # Parameters:
+    # -- get_all_rates: get the rates of all the triggers, rather than only the ones in hlt_triggers/l1_triggers
+    def selectTriggers(self,get_all_rates):
+        # type: (bool) -> None
         if get_all_rates:
             self.skip_hlt_triggers = False
             self.skip_l1_triggers = False
@@ -106,87 +171,141 @@ class DataParser:
         if self.skip_hlt_triggers and self.skip_l1_triggers and (self.use_L1_triggers or self.use_HLT_triggers):
             raise NoValidTriggersError
 
-        counter = 1
-        n_runs_usable = 0
-        for run in sorted(run_list):
-            if self.verbose: print("Processing run: %d (%d/%d)" % (run,counter,len(run_list)))
-            counter += 1
-            bunches = self.parser.getNumberCollidingBunches(run)[0]
-
-            if bunches is None or bunches is 0:
-                bunches = 1
-
-            lumi_info = self.parseLumiInfo(run)     # [( LS,ilum,psi,phys,cms_ready ) ]
-            if lumi_info is None:
-                continue
-            run_list_sorted = sorted(run_list)
-            run_data = self.getRunData(run_list_sorted,run,bunches,lumi_info)
-            if len(list(run_data.keys())) == 0:   # i.e. no triggers/streams/datasets had enough valid rates
-                self.runs_skipped.append(run)
+    # Use: Fetches and parses the runs, run_workers runs at a time
+    # Returns: A generator of the ParsedRun of each run, in the order of run_list whatever the order they are parsed in
+    # Note: The parsing of the runs isn't started before the generator is iterated over
+    def iterParsedRuns(self,run_list):
+        # type: (List[int]) -> Iterator[ParsedRun]
+        if self.run_workers <= 1 or len(run_list) <= 1:
+            for counter,run in enumerate(run_list,1):
+                if self.verbose: print("Processing run: %d (%d/%d)" % (run,counter,len(run_list)))
+                yield self.getRunWorker(self.parser).parseRun(run,run_list)
+            return
+
+        # Each run gets its own DBParser, which keeps the menu, prescales, etc... of the run it is parsing.
+        # The runs have their own threads: their queries go to the OMS executor, which they wait for
+        pool = ThreadPoolExecutor(max_workers=self.run_workers,thread_name_prefix="parse")
+        try:
+            # Keep at most 2*run_workers runs parsed ahead of the one being yielded
+            pending = deque()
+            runs = deque(run_list)
+            while runs or pending:
+                while runs and len(pending) < 2*self.run_workers:
+                    pending.append(pool.submit(self.getRunWorker(self.parser.copyParser()).parseRun,runs.popleft(),run_list))
+                yield pending.popleft().result()
+        finally:
+            pool.shutdown(wait=False)
+
+    # Returns: A copy of this DataParser, with the same options, which parses a run with the given DBParser
+    # Note: The copy doesn't touch the data of this DataParser, the object types it finds are in its own type_map
+    def getRunWorker(self,parser):
+        # type: (DBParser.DBParser) -> DataParser
+        worker = copy.copy(self)
+        worker.parser = parser
+        worker.type_map = {}
+        worker.dropped_ls = {}
+        if self.run_workers > 1:
+            worker.verbose = False  # The messages of the runs parsed at the same time would be mixed
+        return worker
+
+    # Use: Gets all the data of a run from the run cache, or fetches and parses it (and stores it in the cache once the run has ended)
+    # Parameters:
+    # -- run_list: all the (sorted) runs being parsed, the runcount of a run is its position in it
+    # Returns: ParsedRun (or RunCache.CachedRun)
+    def parseRun(self,run,run_list):
+        # type: (int,List[int]) -> ParsedRun
+        run_cache = self.run_cache
+        if self.parser.executor.archive is not None:
+            run_cache = None    # When recording, every query must go through the archive, and a replay must not end up in the cache
+        if run_cache is not None:
+            key = makeKey(self.getCacheOptions())
+            parsed = run_cache.get(key,run,run_list.index(run),self.getLSVeto(run))
+            if parsed is not None:
+                if self.verbose: print("\tRead run %d from the run cache" % run)
+                return parsed
+
+        parsed = self.fetchRun(run,run_list)
+
+        if run_cache is not None and parsed.lumi_info is not None:
+            meta = self.parser.getRunMetadata(run)
+            if meta is not None and meta.ended and meta.complete:
+                run_cache.put(key,self.getCacheOptions(),parsed,self.getLSVeto(run))
+        return parsed
+
+    # Use: Fetches and parses all the data of a run
+    # Returns: ParsedRun
+    def fetchRun(self,run,run_list):
+        # type: (int,List[int]) -> ParsedRun
+        parsed = ParsedRun(run)
+        parsed.type_map = self.type_map
+        bunches = self.parser.getNumberCollidingBunches(run)[0]
+
+        if bunches is None or bunches == 0:
+            bunches = 1
+        parsed.bunches = bunches
+
+        parsed.lumi_info = self.parseLumiInfo(run)     # LumiInfo: [( LS,ilum,psi,phys,cms_ready,pileup ) ]
+        if parsed.lumi_info is None:
+            return parsed
+        index = RunIndex(run,parsed.lumi_info,IntervalSet.make(self.psi_filter) if self.use_ps_mask else None)
+        run_data = self.getRunData(run_list,run,bunches,index)
+        for name in run_data:
+            parsed.records[name] = makeRecord(index,run_data[name]["positions"],run_data[name])
+        parsed.dropped_ls = self.dropped_ls.get(run,[])
+        return parsed
+
+    # Returns: The options which change the data of the parsed runs, the runs in the run cache are keyed by them
+    # Note: The LS vetoed in a run are checked by the cache itself, and the vetoed objects are only removed when the runs are read
+    def getCacheOptions(self):
+        # type: () -> Dict[str,object]
+        return {
+            "use_prescaled_rate": self.use_prescaled_rate,
+            "normalize_bunches":  self.normalize_bunches,
+            "correct_for_DT":     self.correct_for_DT,
+            "max_deadtime":       self.max_deadtime,
+            "lumi_source":        [self.use_best_lumi,self.use_PLTZ_lumi,self.use_HF_lumi],
+            "l1_rate_cut":        self.l1_rate_cut,
+            "ls_range":           [self.min_ls,self.max_ls],
+            "ps_mask":            sorted(self.psi_filter) if self.use_ps_mask else None,
+            "objects":            [self.use_L1_triggers,self.use_HLT_triggers,self.use_streams,self.use_datasets,self.use_L1A_rate],
+            "l1_triggers":        None if self.skip_l1_triggers else sorted(self.l1_triggers),
+            "hlt_triggers":       None if self.skip_hlt_triggers else sorted(self.hlt_triggers),
+        }
+
+    # Use: Adds the lumi info, number of bunches, object names, etc... of a parsed run to this DataParser
+    # Returns: Whether the run had any usable data
+    # Note: The data of the objects isn't stored, see iterRuns
+    def addParsedRun(self,parsed):
+        # type: (ParsedRun) -> bool
+        self.type_map.update(parsed.type_map)
+        if parsed.lumi_info is None:
+            return False
+        run = parsed.run
+        records = parsed.records
+        lumi_info = parsed.lumi_info
+        if len(list(records.keys())) == 0:   # i.e. no triggers/streams/datasets had enough valid rates
+            self.runs_skipped.append(run)
+            return False
+        else:
+            self.runs_used.append(run)
+            self.bunch_map[run] = parsed.bunches
+            if parsed.dropped_ls:
+                self.dropped_ls[run] = parsed.dropped_ls
+            self.lumi_info[run] = lumi_info
+            self.ps_columns[run] = PrescaleColumnIndex([(LS,psi) for LS,ilum,psi,phys,cms_ready,pileup in lumi_info])
+
+        for name in records:
+            if name in self.name_veto:
                 continue
-            else:
-                self.runs_used.append(run)
-                self.bunch_map[run] = bunches
-                self.lumi_info[run] = lumi_info
 
-            for name in run_data:
-                if name in self.name_veto:
-                    continue
-
-                ls_array   = run_data[name]["LS"]
-                rate       = run_data[name]["rate"]
-                
-                try: 
-                    cross_section = run_data[name]["cross_section"]
-                except: 
-                    cross_section = 0
-
-                prescale   = run_data[name]["prescale"]
-                pu         = run_data[name]["PU"]
-                lumi       = run_data[name]["ilumi"]
-                det_status = run_data[name]["status"]
-                phys       = run_data[name]["phys"]
-                bw         = run_data[name]["bandwidth"]
-                size       = run_data[name]["size"]
-
-                try: 
-                    runcount   = run_data[name]["runcount"]
-                except: 
-                    runcount = 0
-
-                if not name in self.name_list:
-                    self.name_list.append(name)
-
-                    self.ls_data[name]   = {}
-                    self.rate_data[name] = {}
-                    self.cs_data[name]   = {}
-                    self.ps_data[name]   = {}
-                    self.pu_data[name]   = {}
-                    self.lumi_data[name] = {}
-                    self.det_data[name]  = {}
-                    self.phys_data[name] = {}
-                    self.bw_data[name]   = {}
-                    self.size_data[name] = {}
-                    self.runcount_data[name] = {}
-
-                self.ls_data[name][run]   = ls_array
-                self.rate_data[name][run] = rate
-                self.cs_data[name][run]   = cross_section
-                self.ps_data[name][run]   = prescale
-                self.pu_data[name][run]   = pu
-                self.lumi_data[name][run] = lumi
-                self.det_data[name][run]  = det_status
-                self.phys_data[name][run] = phys
-                self.bw_data[name][run]   = bw
-                self.size_data[name][run] = size
-                self.runcount_data[name][run] = runcount
-            n_runs_usable += 1
-        if n_runs_usable == 0:
-            raise NoDataError(run_list)
+            if not name in self.name_list:
+                self.name_list.append(name)
+        return True
 
+    # Returns: LumiInfo, [( LS,ilum,psi,phys,cms_ready,pileup ) ], or None if we don't know the run type
     def parseLumiInfo(self,run):
-        # [( LS,ilum,psi,phys,cms_ready ) ]
-        lumi_info = []
+        # type: (int) -> LumiInfo
+        lumi_info = LumiInfo()
 
         trigger_mode = self.parser.getTriggerMode(run)
 
@@ -199,7 +318,7 @@ class DataParser:
                 print("\tGetting lumi info...")
             for LS,psi in self.parser.getLSInfo(run):
                 # We hard code phys and cms_ready to both be true for all LS in the run
-                lumi_info.append([LS,0.0,psi,1,1,0])
+                lumi_info.append((LS,0.0,psi,1,1,0))
         elif trigger_mode.find('collisions') > 0:
             # This is a collisions menu
             if self.verbose:
@@ -213,13 +332,9 @@ class DataParser:
                 print("\tGetting lumi info...")
             lumi_info = self.parser.getLumiInfo(run,minLS=self.min_ls,maxLS=self.max_ls)
         
-        if run in self.ls_veto:
-            new_lumi_info = []
-            for LS,ilum,psi,phys,cms_ready,pileup in lumi_info:
-                if LS in self.ls_veto[run]:
-                    continue
-                new_lumi_info.append([LS,ilum,psi,phys,cms_ready,pileup])
-            lumi_info = new_lumi_info
+        ls_veto = self.getLSVeto(run)
+        if ls_veto:
+            lumi_info = lumi_info.select(list(map(operator.not_,ls_veto.getMask(lumi_info.LS))))
 
         return lumi_info
 
@@ -227,186 +342,149 @@ class DataParser:
     # ------
     # TODO: We need to ensure that none of the object names overlap with one another
     # (i.e. dataset names that overlap with stream names) for the rate data.
-    def getRunData(self,run_list,run,bunches,lumi_info):
-        # type: (int,int,List[Tuple[int,float,int,bool,bool]]) -> Dict[str: object]
+    # Returns: {'object': {"positions": [index], "rate": [...], ... } }, the positions being those of the LS in the RunIndex of the run
+    def getRunData(self,run_list,run,bunches,index):
+        # type: (List[int],int,int,RunIndex) -> Dict[str: object]
         run_data = {}
-        if bunches is None or bunches is 0:
+        if bunches is None or bunches == 0:
             if self.verbose: print("Unable to get bunches")
             return {}
 
         if self.use_streams:
-            run_data.update(self.getStreamData(run,bunches,lumi_info))
+            run_data.update(self.getStreamData(run,bunches,index))
         if self.use_datasets:
             try:
-                run_data.update(self.getDatasetData(run,bunches,lumi_info))
+                run_data.update(self.getDatasetData(run,bunches,index))
             except:
                 print("Failed to get Primary Datasets")
         if self.use_L1A_rate:
-            run_data.update(self.getL1AData(run,bunches,lumi_info))
+            run_data.update(self.getL1AData(run,bunches,index))
         if self.use_HLT_triggers:
-            run_data.update(self.getHLTTriggerData(run_list,run,bunches,lumi_info))
+            run_data.update(self.getHLTTriggerData(run_list,run,bunches,index))
         if self.use_L1_triggers:
-            run_data.update(self.getL1TriggerData(run_list,run,bunches,lumi_info))
+            run_data.update(self.getL1TriggerData(run_list,run,bunches,index))
 
         return run_data
 
     # Returns information related to L1 triggers 
-    def getL1TriggerData(self,run_list,run,bunches,lumi_info):
-        # type: (int,int,List[Tuple[int,float,int,bool,bool]]) -> Dict[str: object]
+    def getL1TriggerData(self,run_list,run,bunches,index):
+        # type: (List[int],int,int,RunIndex) -> Dict[str: object]
         if self.skip_l1_triggers:
             return {}
 
         if self.verbose: print("\tGetting L1 rates...")
         L1_rates = self.parser.getL1Rates(run,minLS=self.min_ls,maxLS=self.max_ls,trigList=self.l1_triggers)
 
-        run_data = {}   # {'object': {"LS": list, "rate": {...}, ... } }
+        run_data = {}   # {'object': {"positions": list, "rate": [...], ... } }
 
+        runcount = run_list.index(run)
         for trigger in L1_rates:
             self.type_map[trigger] = "trigger"
-            run_data[trigger] = {}
-            ls_array   = array.array('f')
-            rate_dict  = {}
-            cs_dict    = {}
-            ps_dict    = {}
-            pu_dict    = {}
-            lumi_dict  = {}
-            det_dict   = {}
-            phys_dict  = {}
-            bw_dict    = {}
-            size_dict  = {}
-            runcount_dict = {}
-            runcount = run_list.index(run)
-            for LS,ilum,psi,phys,cms_ready,pileup in lumi_info:
-                if psi not in self.psi_filter and self.use_ps_mask:
+            rates = L1_rates[trigger]
+            positions = []
+            rate_list = []
+            cs_list   = []
+            ps_list   = []
+            for i,LS in enumerate(index.ls_list):
+                if not LS in rates:
+                    continue
+                ilum = index.ilumi_list[i]
+                rate = rates[LS][0]
+                prescale = rates[LS][1]
+
+                if rate > self.l1_rate_cut:
                     continue
 
-                if not ilum is None and LS in L1_rates[trigger]:
-                    pu = pileup
-                    rate = L1_rates[trigger][LS][0]
-                    prescale = L1_rates[trigger][LS][1]
-
-                    if rate > self.l1_rate_cut:
-                        continue
-
-                    if self.normalize_bunches:
-                        rate = rate/bunches
-
-                    if self.use_prescaled_rate:
-                        if prescale != 0:
-                            rate = rate/prescale
-                        #else:
-                        #    rate = 0
-
-                    if ilum != 0:
-                        cross_section = rate/ilum
-                    elif ilum == 0:
-                        cross_section = 0
-                    
-                    ls_array.append(LS)
-                    rate_dict[LS] = rate
-                    cs_dict[LS] = cross_section
-                    ps_dict[LS] = prescale
-                    pu_dict[LS] = pu
-                    lumi_dict[LS] = ilum
-                    det_dict[LS] = cms_ready
-                    phys_dict[LS] = phys
-                    bw_dict[LS] = None
-                    size_dict[LS] = None
-                    runcount_dict[LS] = runcount
-
-            run_data[trigger]["LS"] = ls_array
-            run_data[trigger]["rate"] = rate_dict
-            run_data[trigger]["cross_section"] = cs_dict
-            run_data[trigger]["prescale"] = ps_dict
-            run_data[trigger]["PU"] = pu_dict
-            run_data[trigger]["ilumi"] = lumi_dict
-            run_data[trigger]["status"] = det_dict
-            run_data[trigger]["phys"] = phys_dict
-            run_data[trigger]["bandwidth"] = bw_dict
-            run_data[trigger]["size"] = size_dict
-            run_data[trigger]["runcount"] = runcount_dict
+                if self.normalize_bunches:
+                    rate = rate/bunches
+
+                if self.use_prescaled_rate:
+                    if prescale != 0:
+                        rate = rate/prescale
+                    #else:
+                    #    rate = 0
+
+                if ilum != 0:
+                    cross_section = rate/ilum
+                elif ilum == 0:
+                    cross_section = 0
+
+                positions.append(i)
+                rate_list.append(rate)
+                cs_list.append(cross_section)
+                ps_list.append(prescale)
+
+            run_data[trigger] = {
+                "positions": positions,
+                "rate": rate_list,
+                "cross_section": cs_list,
+                "prescale": ps_list,
+                "runcount": runcount
+            }
         return run_data
 
     # Returns information related to HLT triggers 
-    def getHLTTriggerData(self,run_list,run,bunches,lumi_info):
-        # type: (int,int,List[Tuple[int,float,int,bool,bool]]) -> Dict[str: object]
+    def getHLTTriggerData(self,run_list,run,bunches,index):
+        # type: (List[int],int,int,RunIndex) -> Dict[str: object]
         if self.skip_hlt_triggers:
             return {}
 
         if self.verbose: print("\tGetting HLT rates...")
 
-        HLT_rates = self.parser.getHLTRates(run,self.hlt_triggers,minLS=self.min_ls,maxLS=self.max_ls)
+        HLT_rates = self.parser.getHLTRates(run,self.hlt_triggers,minLS=self.min_ls,maxLS=self.max_ls,columns=True)  # {'trigger': RateColumns}
 
         if self.correct_for_DT:
-            self.correctForDeadtime(HLT_rates,run)
+            correction = self.getDeadTimeCorrection(run)
+            self.dropped_ls[run] = sorted(correction.dropped.intersection(index.ls_list))
+            for trigger in HLT_rates:
+                HLT_rates[trigger] = correction.apply(HLT_rates[trigger])
 
-        run_data = {}   # {'object': {"LS": list, "rate": {...}, ... } }
+        run_data = {}   # {'object': {"positions": list, "rate": [...], ... } }
 
+        runcount = run_list.index(run)
         for trigger in HLT_rates:
             self.type_map[trigger] = "trigger"
-            run_data[trigger] = {}
-            ls_array   = array.array('f')
-            rate_dict  = {}
-            cs_dict    = {}
-            ps_dict    = {}
-            pu_dict    = {}
-            lumi_dict  = {}
-            det_dict   = {}
-            phys_dict  = {}
-            bw_dict    = {}
-            size_dict  = {}
-            runcount_dict = {}
-            runcount = run_list.index(run) 
-            for LS,ilum,psi,phys,cms_ready,pileup in lumi_info:
-                if psi not in self.psi_filter and self.use_ps_mask:
-                    continue
+            # {position in the index: (rate,prescale)}, for the LS which have lumi info
+            rates = dict(zip(map(index.positions.get,HLT_rates[trigger].ls),zip(HLT_rates[trigger].rate,HLT_rates[trigger].prescale)))
+            rates.pop(None,None)
+            positions = []
+            rate_list = []
+            cs_list   = []
+            ps_list   = []
+            for i in sorted(rates):
+                ilum = index.ilumi_list[i]
+                rate,prescale = rates[i]
+
+                if self.normalize_bunches:
+                    rate = rate/bunches
+
+                if self.use_prescaled_rate:
+                    if prescale != 0:
+                        rate = rate/prescale
+                    #else:
+                    #    rate = 0
+
+                if ilum != 0:
+                    cross_section = rate/ilum
+                elif ilum == 0:
+                    cross_section = 0
 
-                if not ilum is None and LS in HLT_rates[trigger]:
-                    pu = pileup
-                    rate = HLT_rates[trigger][LS][0]
-                    prescale = HLT_rates[trigger][LS][1]
-
-                    if self.normalize_bunches:
-                        rate = rate/bunches
-
-                    if self.use_prescaled_rate:
-                        if prescale != 0:
-                            rate = rate/prescale
-                        #else:
-                        #    rate = 0
-
-                    if ilum != 0:
-                        cross_section = rate/ilum
-                    elif ilum == 0:
-                        cross_section = 0
-
-                    ls_array.append(LS)
-                    rate_dict[LS] = rate
-                    cs_dict[LS] = cross_section
-                    ps_dict[LS] = prescale
-                    pu_dict[LS] = pu
-                    lumi_dict[LS] = ilum
-                    det_dict[LS] = cms_ready
-                    phys_dict[LS] = phys
-                    bw_dict[LS] = None
-                    size_dict[LS] = None
-                    runcount_dict[LS] = runcount
-
-            run_data[trigger]["LS"] = ls_array
-            run_data[trigger]["rate"] = rate_dict
-            run_data[trigger]["cross_section"] = cs_dict
-            run_data[trigger]["prescale"] = ps_dict
-            run_data[trigger]["PU"] = pu_dict
-            run_data[trigger]["ilumi"] = lumi_dict
-            run_data[trigger]["status"] = det_dict
-            run_data[trigger]["phys"] = phys_dict
-            run_data[trigger]["bandwidth"] = bw_dict
-            run_data[trigger]["size"] = size_dict
-            run_data[trigger]["runcount"] = runcount_dict
+                positions.append(i)
+                rate_list.append(rate)
+                cs_list.append(cross_section)
+                ps_list.append(prescale)
+
+            run_data[trigger] = {
+                "positions": positions,
+                "rate": rate_list,
+                "cross_section": cs_list,
+                "prescale": ps_list,
+                "runcount": runcount
+            }
         return run_data
 
-    def getStreamData(self,run,bunches,lumi_info):
-        # type: (int,int,List[Tuple[int,float,int,bool,bool]]) -> Dict[str: object]
+    def getStreamData(self,run,bunches,index):
+        # type: (int,int,RunIndex) -> Dict[str: object]
         if self.verbose: print("\tGetting Stream rates...")
         data = self.parser.getStreamData(run,minLS=self.min_ls,maxLS=self.max_ls)   # {'stream': [ (LS,rate,size,bandwidth) ] }
 
@@ -418,66 +496,50 @@ class DataParser:
             for LS, rate, size, bandwidth in data[name]:
                 stream_rates[name][LS] = [ rate, size, bandwidth ]
 
-        run_data = {}   # {'object': {"LS": list, "rate": {...}, ... } }
+        run_data = {}   # {'object': {"positions": list, "rate": [...], ... } }
         
         blacklist = ["PhysicsEndOfFill","PhysicsMinimumBias0","PhysicsMinimumBias1","PhysicsMinimumBias2"]
         sum_list = []
 
         for _object in stream_rates:
             self.type_map[_object] = "stream"
-            run_data[_object] = {}
 
             if _object[:7] == "Physics" and not _object in blacklist:
                 sum_list.append(_object)
 
-            ls_array   = array.array('f')
-            rate_dict  = {}
-            ps_dict    = {}
-            pu_dict    = {}
-            lumi_dict  = {}
-            det_dict   = {}
-            phys_dict  = {}
-            bw_dict    = {}
-            size_dict  = {}
-            for LS,ilum,psi,phys,cms_ready,pileup in lumi_info:
-                if psi not in self.psi_filter and self.use_ps_mask:
+            rates = stream_rates[_object]
+            positions = []
+            rate_list = []
+            bw_list   = []
+            size_list = []
+            for i,LS in enumerate(index.ls_list):
+                if not LS in rates:
                     continue
+                rate = rates[LS][0]
+                size = rates[LS][1]
+                bandwidth = rates[LS][2]
+
+                if self.normalize_bunches:
+                    rate = rate/bunches
+
+                positions.append(i)
+                rate_list.append(rate)
+                bw_list.append(bandwidth)
+                size_list.append(size)
 
-                if not ilum is None and LS in stream_rates[_object]:
-                    pu = pileup
-                    rate = stream_rates[_object][LS][0]
-                    size = stream_rates[_object][LS][1]
-                    bandwidth = stream_rates[_object][LS][2]
-
-                    if self.normalize_bunches:
-                        rate = rate/bunches
-
-                    ls_array.append(LS)
-                    rate_dict[LS] = rate
-                    ps_dict[LS] = None
-                    pu_dict[LS] = pu
-                    lumi_dict[LS] = ilum
-                    det_dict[LS] = cms_ready
-                    phys_dict[LS] = phys
-                    bw_dict[LS] = bandwidth
-                    size_dict[LS] = size
-
-            run_data[_object]["LS"] = ls_array
-            run_data[_object]["rate"] = rate_dict
-            run_data[_object]["prescale"] = ps_dict
-            run_data[_object]["PU"] = pu_dict
-            run_data[_object]["ilumi"] = lumi_dict
-            run_data[_object]["status"] = det_dict
-            run_data[_object]["phys"] = phys_dict
-            run_data[_object]["bandwidth"] = bw_dict
-            run_data[_object]["size"] = size_dict
+            run_data[_object] = {
+                "positions": positions,
+                "rate": rate_list,
+                "bandwidth": bw_list,
+                "size": size_list
+            }
 
         self.sumObjects(run_data=run_data,new_name="Combined_Physics_Streams",sum_list=sum_list,obj_type="stream")
 
         return run_data
 
-    def getDatasetData(self,run,bunches,lumi_info):
-        # type: (int,int,List[Tuple[int,float,int,bool,bool]]) -> Dict[str: object]
+    def getDatasetData(self,run,bunches,index):
+        # type: (int,int,RunIndex) -> Dict[str: object]
         if self.verbose: print("\tGetting Dataset rates...")
         data = self.parser.getPrimaryDatasets(run,minLS=self.min_ls,maxLS=self.max_ls)   # {'dataset': [ (LS,rate) ] }
 
@@ -489,55 +551,33 @@ class DataParser:
             for LS, rate in data[name]:
                 dataset_rates[name][LS] = [ rate ]
 
-        run_data = {}   # {'object': {"LS": list, "rate": {...}, ... } }
+        run_data = {}   # {'object': {"positions": list, "rate": [...], ... } }
 
         for _object in dataset_rates:
             self.type_map[_object] = "dataset"
-            run_data[_object] = {}
-            ls_array   = array.array('f')
-            rate_dict  = {}
-            ps_dict    = {}
-            pu_dict    = {}
-            lumi_dict  = {}
-            det_dict   = {}
-            phys_dict  = {}
-            bw_dict    = {}
-            size_dict  = {}
-            for LS,ilum,psi,phys,cms_ready,pileup in lumi_info:
-                if psi not in self.psi_filter and self.use_ps_mask:
+            rates = dataset_rates[_object]
+            positions = []
+            rate_list = []
+            for i,LS in enumerate(index.ls_list):
+                if not LS in rates:
                     continue
+                rate = rates[LS][0]
+
+                if self.normalize_bunches:
+                    rate = rate/bunches
+
+                positions.append(i)
+                rate_list.append(rate)
 
-                if not ilum is None and LS in dataset_rates[_object]:
-                    pu = pileup
-                    rate = dataset_rates[_object][LS][0]
-
-                    if self.normalize_bunches:
-                        rate = rate/bunches
-
-                    ls_array.append(LS)
-                    rate_dict[LS] = rate
-                    ps_dict[LS] = None
-                    pu_dict[LS] = pu
-                    lumi_dict[LS] = ilum
-                    det_dict[LS] = cms_ready
-                    phys_dict[LS] = phys
-                    bw_dict[LS] = None
-                    size_dict[LS] = None
-
-            run_data[_object]["LS"] = ls_array
-            run_data[_object]["rate"] = rate_dict
-            run_data[_object]["prescale"] = ps_dict
-            run_data[_object]["PU"] = pu_dict
-            run_data[_object]["ilumi"] = lumi_dict
-            run_data[_object]["status"] = det_dict
-            run_data[_object]["phys"] = phys_dict
-            run_data[_object]["bandwidth"] = bw_dict
-            run_data[_object]["size"] = size_dict
+            run_data[_object] = {
+                "positions": positions,
+                "rate": rate_list
+            }
         return run_data
 
     # NOTE: L1A_rates has a slightly different dict format, the value-pair for the LS keys is NOT a list
-    def getL1AData(self,run,bunches,lumi_info):
-        # type: (int,int,List[Tuple[int,float,int,bool,bool]]) -> Dict[str: object]
+    def getL1AData(self,run,bunches,index):
+        # type: (int,int,RunIndex) -> Dict[str: object]
         L1A_rates = {}   # {'L1A': {LS: rate } }
 
         if self.verbose: print("\tGetting L1ATotal rates...")
@@ -549,67 +589,49 @@ class DataParser:
         if self.verbose: print("\tGetting L1ATotalPreDT rates...")
         L1A_rates["L1ATotalPreDT"] = self.parser.getL1TotalPreDT(run)
 
-        run_data = {}   # {'object': {"LS": list, "rate": {...}, ... } }
+        run_data = {}   # {'object': {"positions": list, "rate": [...], ... } }
 
         for _object in L1A_rates:
             self.type_map[_object] = "L1A"
-            run_data[_object] = {}
-            ls_array   = array.array('f')
-            rate_dict  = {}
-            ps_dict    = {}
-            pu_dict    = {}
-            lumi_dict  = {}
-            det_dict   = {}
-            phys_dict  = {}
-            bw_dict    = {}
-            size_dict  = {}
-            for LS,ilum,psi,phys,cms_ready,pileup in lumi_info:
-                if psi not in self.psi_filter and self.use_ps_mask:
+            rates = L1A_rates[_object]
+            positions = []
+            rate_list = []
+            for i,LS in enumerate(index.ls_list):
+                if not LS in rates:
                     continue
+                rate = rates[LS]
 
-                if not ilum is None and LS in L1A_rates[_object]:
-                    pu = pileup
-                    rate = L1A_rates[_object][LS]
-
-                    if self.normalize_bunches:
-                        rate = rate/bunches
-
-                    ls_array.append(LS)
-                    rate_dict[LS] = rate
-                    ps_dict[LS] = None
-                    pu_dict[LS] = pu
-                    lumi_dict[LS] = ilum
-                    det_dict[LS] = cms_ready
-                    phys_dict[LS] = phys
-                    bw_dict[LS] = None
-                    size_dict[LS] = None
-
-            run_data[_object]["LS"] = ls_array
-            run_data[_object]["rate"] = rate_dict
-            run_data[_object]["prescale"] = ps_dict
-            run_data[_object]["PU"] = pu_dict
-            run_data[_object]["ilumi"] = lumi_dict
-            run_data[_object]["status"] = det_dict
-            run_data[_object]["phys"] = phys_dict
-            run_data[_object]["bandwidth"] = bw_dict
-            run_data[_object]["size"] = size_dict
+                if self.normalize_bunches:
+                    rate = rate/bunches
+
+                positions.append(i)
+                rate_list.append(rate)
+
+            run_data[_object] = {
+                "positions": positions,
+                "rate": rate_list
+            }
         return run_data
 
+    # Returns: The dead time correction of a run, dropping the LS with more than max_deadtime
+    def getDeadTimeCorrection(self,run_number):
+        # type: (int) -> DeadTimeCorrection
+        return DeadTimeCorrection(self.parser.getDeadTime(run_number),self.max_deadtime)
+
     # Use: Modifies the rates in Rates, correcting them for deadtime
     # Parameters:
     # -- Rates: A dict - {'trigger': {LS: (raw_rate,prescale) } }
     def correctForDeadtime(self,Rates,run_number):
         # type: (Dict[str,object],int) -> None
-        dead_time = self.parser.getDeadTime(run_number)
-        for LS in dead_time:
-            for trigger in Rates:
-                if LS in Rates[trigger]: # Sometimes, LS's are missing
-                    Rates[trigger][LS][0] *= (1. + dead_time[LS]/100.)
-                    if dead_time[LS] > self.max_deadtime: # Do not plot lumis where deadtime is greater than 10%
-                        del Rates[trigger][LS]
+        correction = self.getDeadTimeCorrection(run_number)
+        for trigger in Rates:
+            Rates[trigger] = correction.apply(RateColumns.fromDict(Rates[trigger])).toDict()
 
     # Creates a new dictionary key, that corresponds to the summed rates of all the specified objects
-    # data: {'object': {"LS": list, "rate": {...}, ... } }
+    # data: {'object': {"positions": list, "rate": [...], ... } }
+    # Note: The objects are summed a whole column at a time: each one is spread over all the positions of the run index,
+    #       with NaN where it has no data, so that an LS missing from any of them ends up NaN in the total and is dropped,
+    #       and a missing bandwidth or size makes the total bandwidth or size of that LS missing (None) too
     def sumObjects(self,run_data,new_name,sum_list,obj_type):
         # type: (Dict[str,object],str,List[str],str) -> bool
         if not set(sum_list) <= set(run_data.keys()):
@@ -618,54 +640,27 @@ class DataParser:
         if (len(sum_list)==0):
             print("\tERROR: sum_list has size=0 (see sumObjects in DataParser.py). May be that there were no streams for this run.")
             return False
-        ref_name = sum_list[0]
-        ls_array   = array.array('f')
-        rate_dict  = {}
-        ps_dict    = {}
-        pu_dict    = {}
-        lumi_dict  = {}
-        det_dict   = {}
-        phys_dict  = {}
-        bw_dict    = {}
-        size_dict  = {}
 
-        # We only use LS that are in *all* of the objects
-        ls_set = set(run_data[ref_name]["LS"])
-        for name in sum_list:
-            ls_set = ls_set & set(run_data[name]["LS"])
-        ls_array.extend(sorted(ls_set))
-
-        for LS in ls_array:
-            total_rate = 0
-            total_bw   = 0
-            total_size = 0
+        n_positions = max([max(run_data[name]["positions"])+1 if run_data[name]["positions"] else 0 for name in sum_list])
+        totals = {}
+        for field in ["rate","bandwidth","size"]:
+            total = None
             for name in sum_list:
-                total_rate += run_data[name]["rate"][LS]
-                try: total_bw     += run_data[name]["bandwidth"][LS]
-                except: total_bw   = None
-
-                try: total_size   += run_data[name]["size"][LS]
-                except: total_size = None
-            rate_dict[LS] = total_rate
-            bw_dict[LS]   = total_bw
-            size_dict[LS] = total_size
-            ps_dict[LS]   = None
-            pu_dict[LS]   = run_data[ref_name]["PU"][LS]
-            lumi_dict[LS] = run_data[ref_name]["ilumi"][LS]
-            det_dict[LS]  = run_data[ref_name]["status"][LS]
-            phys_dict[LS] = run_data[ref_name]["phys"][LS]
+                column = spreadColumn(run_data[name]["positions"],run_data[name].get(field),n_positions)
+                total = column if total is None else list(map(operator.add,total,column))
+            totals[field] = total
+
+        # We only use LS that are in *all* of the objects
+        keep = list(map(operator.eq,totals["rate"],totals["rate"]))    # False for NaN
+        positions = list(compress(range(n_positions),keep))
 
         self.type_map[new_name] = obj_type
-        run_data[new_name] = {}
-        run_data[new_name]["LS"]        = ls_array
-        run_data[new_name]["rate"]      = rate_dict
-        run_data[new_name]["prescale"]  = ps_dict
-        run_data[new_name]["PU"]        = pu_dict
-        run_data[new_name]["ilumi"]     = lumi_dict
-        run_data[new_name]["status"]    = det_dict
-        run_data[new_name]["phys"]      = phys_dict
-        run_data[new_name]["bandwidth"] = bw_dict
-        run_data[new_name]["size"]      = size_dict
+        run_data[new_name] = {
+            "positions": positions,
+            "rate": list(compress(totals["rate"],keep)),
+            "bandwidth": list(compress(totals["bandwidth"],keep)),
+            "size": list(compress(totals["size"],keep))
+        }
 
         return True
 
@@ -683,19 +678,11 @@ class DataParser:
 
     def resetData(self):
         # type: () -> None
-        self.ls_data   = {}    # {'name': { run_number: [LS] } }
-        self.rate_data = {}    # {'name': { run_number: { LS: raw_rates } } }
-        self.ps_data   = {}    # {'name': { run_number: { LS: prescale } } }
-        self.cs_data   = {}    # {'name': { run_number: { LS: cross_section } } }
-        self.pu_data   = {}    # {'name': { run_number: { LS: PU } } }
-        self.lumi_data = {}    # {'name': { run_number: { LS: iLumi } } }
-        self.det_data  = {}    # {'name': { run_number: { LS: detecotr_ready } } }
-        self.phys_data = {}    # {'name': { run_number: { LS: phys_active } } }
-        self.bw_data   = {}    # {'name': { run_number: { LS: bandwidth } } }
-        self.size_data = {}    # {'name': { run_number: { LS: size } } }
-        self.lumi_info = {}    # {run_number: [ (LS,ilum,psi,phys,cms_ready) ] }
+        self.store = RunStore()
+        self.lumi_info = {}    # {run_number: LumiInfo }
+        self.ps_columns = {}   # {run_number: PrescaleColumnIndex }
         self.bunch_map = {}    # {run_number: nBunches }
-        self.runcount_data = {}  # {'name': {run_number:{LS: runcount}}}
+        self.dropped_ls = {}   # {run_number: [LS]}
 
         self.runs_used    = []
         self.runs_skipped = []
@@ -705,94 +692,81 @@ class DataParser:
 ####################################################################################################
 
     # --- All the 'getters' ---
+    # Note: With convert_output the arrays of the store are returned as they are, they must not be modified
     def getLSData(self):
         # type: () -> Dict[str,object]
-        return self.ls_data
+        return self.store.getView("LS")
 
-    def getRateData(self):
-        # type: () -> Dict[str,object]
+    # Returns: {'name': { run_number: [ data ] } } with convert_output, {'name': { run_number: { LS: data } } } otherwise
+    def getStoreData(self,field):
+        # type: (str) -> Dict[str,object]
         if self.convert_output:
-            output = self.convertOutput(self.rate_data)
+            output = self.store.getView(field)
         else:
-            output = self.rate_data
+            output = self.store.getDictView(field)
         return output
 
+    def getRateData(self):
+        # type: () -> Dict[str,object]
+        return self.getStoreData("rate")
+
     def getCSData(self):
         # type: () -> Dict[str,object]
-        if self.convert_output:
-            output = self.convertOutput(self.cs_data)
-        else:
-            output = self.cs_data
-        return output
+        return self.getStoreData("cross_section")
 
     def getPSData(self):
         # type: () -> Dict[str,object]
-        if self.convert_output:
-            output = self.convertOutput(self.ps_data)
-        else:
-            output = self.ps_data
-        return output
+        return self.getStoreData("prescale")
 
     def getPUData(self):
         # type: () -> Dict[str,object]
-        if self.convert_output:
-            output = self.convertOutput(self.pu_data)
-        else:
-            output = self.pu_data
-        return output
+        return self.getStoreData("PU")
 
     def getLumiData(self):
         # type: () -> Dict[str,object]
-        if self.convert_output:
-            output = self.convertOutput(self.lumi_data)
-        else:
-            output = self.lumi_data
-        return output
+        return self.getStoreData("ilumi")
 
     def getDetectorStatus(self):
         # type: () -> Dict[str,object]
-        if self.convert_output:
-            output = self.convertOutput(self.det_data)
-        else:
-            output = self.det_data
-        return output
+        return self.getStoreData("status")
 
     def getPhysStatus(self):
         # type: () -> Dict[str,object]
-        if self.convert_output:
-            output = self.convertOutput(self.phys_data)
-        else:
-            output = self.phys_data
-        return output
+        return self.getStoreData("phys")
 
     def getBandwidthData(self):
         # type: () -> Dict[str,object]
-        if self.convert_output:
-            output = self.convertOutput(self.bw_data)
-        else:
-            output = self.bw_data
-        return output
+        return self.getStoreData("bandwidth")
 
     def getSizeData(self):
         # type: () -> Dict[str,object]
-        if self.convert_output:
-            output = self.convertOutput(self.size_data)
-        else:
-            output = self.size_data
-        return output
+        return self.getStoreData("size")
 
     def getRunCountData(self):
         # type: () -> Dict[str,object]
-        if self.convert_output:
-            output = self.convertOutput(self.runcount_data)
-        else:
-            output = self.runcount_data
-        return output
+        return self.getStoreData("runcount")
 
     def getLumiInfo(self):
         # type: () -> Dict[int,List[Tuple]]
         return self.lumi_info
 
+    # Returns the prescale column used in a given LS of a run, or None if we have no lumi info for the run
+    def getPrescaleColumn(self,run,LS):
+        # type: (int,int) -> int
+        if not run in self.ps_columns:
+            return None
+        return self.ps_columns[run].getColumn(LS)
+
+    # Returns: IntervalSet of the LS vetoed in a run, or None if none is
+    def getLSVeto(self,run):
+        # type: (int) -> IntervalSet
+        return IntervalSet.make(self.ls_veto.get(run))
+
+    # Returns: {run_number: [LS]}, the LS which were dropped for having more than max_deadtime
+    def getDroppedLS(self):
+        # type: () -> Dict[int,List[int]]
+        return self.dropped_ls
+
     def getBunchMap(self):
         # type: () -> Dict[int,int]
         return self.bunch_map
@@ -823,8 +797,7 @@ class DataParser:
         # type: (int) -> int
         if not run in self.runs_used:
             return -1
-        index = LUMI_INFO_MAP["LS"]
-        return max(self.lumi_info[run],key=lambda x: x[index])[index]
+        return max(self.lumi_info[run].LS)
 
     # Return the latest run for which we have data or -1
     def getLastRun(self):
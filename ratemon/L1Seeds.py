@@ -0,0 +1,202 @@
+#####################################################################
+# File: L1Seeds.py
+#
+# Dependencies: None
+#
+# Parses the L1 seed expression of an HLT path, e.g.
+#    L1_SingleMu22 OR (L1_DoubleMu0 AND NOT L1_ZeroBias)
+# and compiles it, once per L1 menu, into the effective L1 prescale of
+# the path in each prescale column, so that un-prescaling the rates of a
+# path is a simple list lookup per LS.
+#
+# The effective prescale of an expression is taken to be:
+#    seed      -- the prescale of the seed, 0 if it is disabled
+#    A OR B    -- the *LOWEST* non-zero prescale of A and B, 0 if they are all disabled
+#    A AND B   -- the product of the prescales of A and B, 0 if any is disabled
+#    NOT A     -- 1, the prescale of A doesn't reduce the rate of NOT A
+# Seeds which aren't in the L1 menu are ignored, an expression with no
+# seed in the menu has a prescale of 0.
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import re
+import threading
+
+TOKEN_RE = re.compile(r"\(|\)|[^\s()]+")
+OPERATORS = ["OR","AND","NOT"]
+
+# Use: Splits a seed expression into seeds, operators and parentheses
+# Returns: list of tokens
+def tokenize(expression):
+    # type: (str) -> List[str]
+    return TOKEN_RE.findall(expression)
+
+# A parsed L1 seed expression, stored as a tree of (operator, [operands]) tuples, the leaves being ("SEED", name)
+class SeedExpression:
+    def __init__(self,expression):
+        # type: (str) -> None
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.pos = 0
+        if not self.tokens:
+            raise ValueError("Empty L1 seed expression")
+        self.tree = self.parseOr()
+        if self.pos != len(self.tokens):
+            raise ValueError("Unexpected '%s' in L1 seed expression '%s'" % (self.tokens[self.pos],expression))
+        del self.tokens
+
+    def peek(self):
+        # type: () -> str
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        # type: () -> str
+        token = self.peek()
+        if token is None:
+            raise ValueError("Unexpected end of L1 seed expression '%s'" % self.expression)
+        self.pos += 1
+        return token
+
+    # Note: AND binds tighter than OR, and NOT tighter than both
+    def parseOr(self):
+        operands = [self.parseAnd()]
+        while self.peek() == "OR":
+            self.next()
+            operands.append(self.parseAnd())
+        return operands[0] if len(operands) == 1 else ("OR",operands)
+
+    def parseAnd(self):
+        operands = [self.parseNot()]
+        while self.peek() == "AND":
+            self.next()
+            operands.append(self.parseNot())
+        return operands[0] if len(operands) == 1 else ("AND",operands)
+
+    def parseNot(self):
+        if self.peek() == "NOT":
+            self.next()
+            return ("NOT",[self.parseNot()])
+        token = self.next()
+        if token == "(":
+            node = self.parseOr()
+            if self.next() != ")":
+                raise ValueError("Unbalanced parentheses in L1 seed expression '%s'" % self.expression)
+            return node
+        if token == ")" or token in OPERATORS:
+            raise ValueError("Unexpected '%s' in L1 seed expression '%s'" % (token,self.expression))
+        return ("SEED",token)
+
+    # Returns: The names of all the seeds in the expression
+    def getSeeds(self,node=None):
+        # type: (tuple) -> List[str]
+        if node is None:
+            node = self.tree
+        if node[0] == "SEED":
+            return [node[1]]
+        seeds = []
+        for operand in node[1]:
+            seeds += self.getSeeds(operand)
+        return seeds
+
+    # Returns: The effective prescale of the expression, None if none of its seeds is in the menu
+    # Parameters:
+    # -- prescales: {seed name: prescale}, for a single prescale column
+    def getPrescale(self,prescales,node=None):
+        # type: (Dict[str,float],tuple) -> float
+        if node is None:
+            node = self.tree
+        op = node[0]
+        if op == "SEED":
+            return prescales.get(node[1])
+        if op == "NOT":
+            return 1
+        values = [x for x in [self.getPrescale(prescales,operand) for operand in node[1]] if x is not None]
+        if not values:
+            return None
+        if op == "OR":
+            enabled = [x for x in values if x]
+            return min(enabled) if enabled else 0
+        product = 1
+        for x in values:
+            product *= x
+        return product
+
+# Use: Compiles a seed expression into its effective L1 prescale in each prescale column
+# Parameters:
+# -- L1Prescales: {algo_index: {psi: prescale}}
+# -- L1IndexNameMap: {algo_name: algo_index}
+# Returns: SeedPrescales, the effective prescale indexed by the prescale column
+def compilePrescales(expression,L1Prescales,L1IndexNameMap):
+    # type: (str,Dict[int,Dict[int,float]],Dict[str,int]) -> SeedPrescales
+    seed_expression = SeedExpression(expression)
+    seeds = [seed for seed in set(seed_expression.getSeeds()) if seed in L1IndexNameMap]
+    if not seeds:
+        return SeedPrescales([0],True)  # Nothing in the menu, 0 in every column
+
+    n_columns = 0
+    for seed in seeds:
+        columns = L1Prescales.get(L1IndexNameMap[seed],{})
+        if columns:
+            n_columns = max(n_columns,max(columns.keys())+1)
+
+    vector = []
+    for psi in range(n_columns):
+        prescales = {}
+        try:
+            for seed in seeds:
+                prescales[seed] = L1Prescales[L1IndexNameMap[seed]][psi]
+        except KeyError:
+            vector.append(None)
+            continue
+        ps = seed_expression.getPrescale(prescales)
+        vector.append(ps if ps is not None else 0)
+
+    return SeedPrescales(vector)
+
+# The effective L1 prescales of a seed expression in each prescale column, see compilePrescales
+class SeedPrescales:
+    def __init__(self,vector,constant=False):
+        # type: (List[float],bool) -> None
+        self.vector = vector        # [prescale], indexed by the prescale column, None for the columns which some seed doesn't have
+        self.constant = constant    # The same value in every column, e.g. when none of the seeds is in the menu
+
+    # Returns: The effective prescale in column psi, or default if it isn't known
+    def get(self,psi,default=None):
+        # type: (int,object) -> float
+        if self.constant:
+            return self.vector[0]
+        if 0 <= psi < len(self.vector) and self.vector[psi] is not None:
+            return self.vector[psi]
+        return default
+
+# The compiled seed prescales, keyed by (L1 menu key, seed expression), shared by all the DBParser objects
+class SeedPrescaleCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}   # {(menu_key, expression): SeedPrescales}
+        self.hits = 0
+        self.misses = 0
+
+    # Returns: The SeedPrescales of the expression, compiled the first time it is seen with this L1 menu
+    # Parameters:
+    # -- menu_key: identifies the L1 menu and prescale table the L1Prescales come from, None to always compile
+    def get(self,menu_key,expression,L1Prescales,L1IndexNameMap):
+        # type: (tuple,str,Dict[int,Dict[int,float]],Dict[str,int]) -> SeedPrescales
+        if menu_key is not None:
+            with self.lock:
+                entry = self.entries.get((menu_key,expression))
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+        entry = compilePrescales(expression,L1Prescales,L1IndexNameMap)
+        if menu_key is not None:
+            with self.lock:
+                self.misses += 1
+                self.entries[(menu_key,expression)] = entry
+        return entry
+
+seed_cache = SeedPrescaleCache()
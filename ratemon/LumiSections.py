@@ -0,0 +1,234 @@
+#####################################################################
+# File: LumiSections.py
+#
+# Dependencies: None
+#
+# Helpers for per lumisection information which changes only at a few
+# points in a run, and the compact storage of the lumi info of a run.
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import array
+import bisect
+from itertools import compress
+
+# Maps each LS of a run to the prescale column in use, from the LS where the column changes
+class PrescaleColumnIndex:
+    # Parameters:
+    # -- changes: list of (LS, psi), either the prescale changes of the run or simply the column of every LS
+    def __init__(self,changes=[]):
+        # type: (List[Tuple[int,int]]) -> None
+        self.change_ls = []     # [LS], sorted, where a new prescale column starts being used
+        self.columns   = []     # [psi], the column used from the matching change_ls on
+        for LS, psi in sorted(changes, key=lambda x: x[0]):
+            self.addChange(LS,psi)
+
+    # Use: Records that the column psi is used from LS on, changes must be added in increasing LS order
+    def addChange(self,LS,psi):
+        # type: (int,int) -> None
+        if self.change_ls and LS < self.change_ls[-1]:
+            raise ValueError("Prescale column changes must be added in increasing LS order")
+        if self.columns and self.columns[-1] == psi:
+            return  # Not actually a change
+        if self.change_ls and LS == self.change_ls[-1]:
+            # Two changes in the same LS, the last one wins
+            self.columns[-1] = psi
+            return
+        self.change_ls.append(LS)
+        self.columns.append(psi)
+
+    # Returns: The prescale column used in LS
+    # Note: LS before the first change use the first column (OMS may only record the column from the first LS it has data for),
+    #       if there are no changes at all we return default
+    def getColumn(self,LS,default=None):
+        # type: (int,object) -> int
+        if not self.change_ls:
+            return default
+        i = bisect.bisect_right(self.change_ls,LS) - 1
+        if i < 0:
+            i = 0
+        return self.columns[i]
+
+    # Returns: The prescale column of each LS, in linear time, as long as ls_list is sorted
+    def getColumns(self,ls_list,default=None):
+        # type: (List[int],object) -> List[int]
+        if not self.change_ls:
+            return [default]*len(ls_list)
+        columns = []
+        i = 0
+        n = len(self.change_ls)
+        for LS in ls_list:
+            if i > 0 and LS < self.change_ls[i-1]:
+                # Not sorted, fall back to the bisection
+                i = max(bisect.bisect_right(self.change_ls,LS),1)
+            while i < n and self.change_ls[i] <= LS:
+                i += 1
+            columns.append(self.columns[max(i-1,0)])
+        return columns
+
+    # Returns: list of (first_LS, last_LS, psi), last_LS of the last range is None (i.e. open ended)
+    def getRanges(self):
+        # type: () -> List[Tuple[int,int,int]]
+        ranges = []
+        for i, (LS, psi) in enumerate(zip(self.change_ls,self.columns)):
+            last_LS = self.change_ls[i+1] - 1 if i+1 < len(self.change_ls) else None
+            ranges.append((LS,last_LS,psi))
+        return ranges
+
+    def __len__(self):
+        return len(self.change_ls)
+
+# A set of integers (LS, prescale columns, ...), stored as sorted and disjoint [first, last] ranges rather than one by one
+class IntervalSet:
+    # Parameters:
+    # -- ranges: list of [first, last] (both included) or [value], in any order, they may overlap
+    def __init__(self,ranges=[]):
+        # type: (List[List[int]]) -> None
+        self.firsts = []    # [first], sorted
+        self.lasts  = []    # [last], the last value of the range starting at the matching first
+        for r in sorted([(r[0],r[-1]) for r in ranges]):
+            first, last = r
+            if last < first:
+                continue
+            if self.lasts and first <= self.lasts[-1] + 1:
+                # Overlaps or touches the previous range
+                self.lasts[-1] = max(self.lasts[-1],last)
+                continue
+            self.firsts.append(first)
+            self.lasts.append(last)
+
+    # Returns: IntervalSet, built from a list of single values
+    @staticmethod
+    def fromValues(values):
+        # type: (Iterable[int]) -> IntervalSet
+        return IntervalSet([(x,x) for x in values])
+
+    # Returns: The set, lists of values being turned into an IntervalSet, None being left as it is
+    @staticmethod
+    def make(values):
+        # type: (object) -> IntervalSet
+        if values is None or isinstance(values,IntervalSet):
+            return values
+        return IntervalSet.fromValues(values)
+
+    # Note: None (e.g. the psi of a LS whose prescale column isn't known) and other non-int values are never in the set,
+    #       as they weren't in the lists of values the set replaces
+    def __contains__(self,x):
+        if not isinstance(x,int):
+            return False
+        i = bisect.bisect_right(self.firsts,x) - 1
+        return i >= 0 and x <= self.lasts[i]
+
+    # Returns: Whether each value is in the set, in linear time as long as values is sorted
+    def getMask(self,values):
+        # type: (Sequence[int]) -> List[bool]
+        mask = []
+        i = 0
+        n = len(self.firsts)
+        prev = None
+        for x in values:
+            if prev is not None and x < prev:
+                # Not sorted, fall back to the bisection
+                i = bisect.bisect_right(self.lasts,x-1)
+            prev = x
+            while i < n and self.lasts[i] < x:
+                i += 1
+            mask.append(i < n and self.firsts[i] <= x)
+        return mask
+
+    # Returns: list of (first, last), both included
+    def getRanges(self):
+        # type: () -> List[Tuple[int,int]]
+        return list(zip(self.firsts,self.lasts))
+
+    # Note: Iterates over every value of the set, in increasing order
+    def __iter__(self):
+        for first, last in zip(self.firsts,self.lasts):
+            for x in range(first,last+1):
+                yield x
+
+    def __len__(self):
+        return sum([last - first + 1 for first, last in zip(self.firsts,self.lasts)])
+
+    def __eq__(self,other):
+        return isinstance(other,IntervalSet) and self.firsts == other.firsts and self.lasts == other.lasts
+
+    def __repr__(self):
+        return "IntervalSet(%s)" % [list(r) for r in self.getRanges()]
+
+NO_PSI = -1     # The psi stored for the LS whose prescale column isn't known (None)
+
+# The lumi info of the LS of a run, one typed array per field rather than a [LS,ilum,psi,phys,cms_ready,pileup] list per LS
+# Note: Iterating over it (or indexing it) gives the (LS,ilum,psi,phys,cms_ready,pileup) tuple of each LS, so that it can
+#       still be unpacked like the list of lists it replaces. The arrays store None as NaN (ilum, pileup) or NO_PSI (psi)
+class LumiInfo:
+    __slots__ = ("LS","ilum","psi","phys","cms_ready","pileup","has_none")
+
+    def __init__(self,rows=[]):
+        # type: (Iterable[Sequence]) -> None
+        self.LS        = array.array('i')
+        self.ilum      = array.array('d')
+        self.psi       = array.array('h')
+        self.phys      = array.array('b')
+        self.cms_ready = array.array('b')
+        self.pileup    = array.array('d')
+        self.has_none  = False  # Whether any LS has a None field, if not the rows are simply the zipped arrays
+        for row in rows:
+            self.append(row)
+
+    # Use: Adds a LS at the end
+    # Parameters:
+    # -- row: (LS,ilum,psi,phys,cms_ready,pileup)
+    def append(self,row):
+        # type: (Sequence) -> None
+        LS, ilum, psi, phys, cms_ready, pileup = row
+        if ilum is None or psi is None or pileup is None:
+            self.has_none = True
+        self.LS.append(LS)
+        self.ilum.append(float('nan') if ilum is None else ilum)
+        self.psi.append(NO_PSI if psi is None else psi)
+        self.phys.append(phys)
+        self.cms_ready.append(cms_ready)
+        self.pileup.append(float('nan') if pileup is None else pileup)
+
+    def __len__(self):
+        return len(self.LS)
+
+    def __iter__(self):
+        if not self.has_none:
+            return zip(self.LS,self.ilum,self.psi,self.phys,self.cms_ready,self.pileup)
+        return zip(self.LS,map(nanToNone,self.ilum),map(noPsiToNone,self.psi),self.phys,self.cms_ready,map(nanToNone,self.pileup))
+
+    # Returns: The (LS,ilum,psi,phys,cms_ready,pileup) tuple of the i-th LS
+    def __getitem__(self,i):
+        # type: (int) -> Tuple
+        return (self.LS[i],nanToNone(self.ilum[i]),noPsiToNone(self.psi[i]),self.phys[i],self.cms_ready[i],nanToNone(self.pileup[i]))
+
+    def __eq__(self,other):
+        return isinstance(other,LumiInfo) and list(self) == list(other)
+
+    # Returns: LumiInfo, with only the LS whose value in mask is true
+    def select(self,mask):
+        # type: (Sequence[bool]) -> LumiInfo
+        selected = LumiInfo()
+        for field in ["LS","ilum","psi","phys","cms_ready","pileup"]:
+            getattr(selected,field).extend(compress(getattr(self,field),mask))
+        selected.has_none = self.has_none
+        return selected
+
+    # Returns: The number of bytes used by the arrays
+    def getSize(self):
+        # type: () -> int
+        return sum([len(x)*x.itemsize for x in [self.LS,self.ilum,self.psi,self.phys,self.cms_ready,self.pileup]])
+
+def nanToNone(x):
+    # type: (float) -> float
+    return None if x != x else x
+
+def noPsiToNone(psi):
+    # type: (int) -> int
+    return None if psi == NO_PSI else psi
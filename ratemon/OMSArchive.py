@@ -0,0 +1,130 @@
+#####################################################################
+# File: OMSArchive.py
+#
+# Dependencies: None
+#
+# Records every OMS response of a session to a local archive (gzipped
+# JSON lines) and replays them later, without network access, e.g.:
+#    RATEMON_OMS_RECORD=run370000.oms.gz python3 ShiftMonitorTool.py --simulate=370000
+#    RATEMON_OMS_REPLAY=run370000.oms.gz python3 ShiftMonitorTool.py --simulate=370000
+#
+# Responses are looked up by the OMS resource and the sorted query
+# parameters, so an archive recorded through one OMS url (e.g. lxplus)
+# can be replayed with any other. When the same query was sent several
+# times while recording (e.g. while a run was ongoing) the responses are
+# replayed in the same order, the last one being repeated once they run
+# out, so a replay is deterministic.
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import os
+import gzip
+import json
+import atexit
+import threading
+
+from OMSCache import canonicalQuery, getResource
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Returns: The key that a query url is archived with, which doesn't depend on the OMS url or on the order of the parameters
+def makeKey(url):
+    # type: (str) -> str
+    return "%s?%s" % (getResource(url),"&".join(canonicalQuery(url)[1]))
+
+# Stands in for the requests.Response of a replayed query
+class ArchivedResponse:
+    def __init__(self,status_code,text):
+        # type: (int,str) -> None
+        self.status_code = status_code
+        self.text = text
+
+    @property
+    def content(self):
+        return self.text.encode()
+
+    def json(self):
+        return json.loads(self.text)
+
+class OMSArchive:
+    def __init__(self,path,mode):
+        # type: (str,str) -> None
+        if mode not in [RECORD,REPLAY]:
+            raise ValueError("Unknown OMS archive mode '%s'" % mode)
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.responses = {}     # {key: [(status_code, text)]}, only used to replay
+        self.replayed = {}      # {key: number of times it was replayed}
+        self.missing = set()    # Keys requested during the replay which were never recorded
+        self.n_recorded = 0
+        self.archive_file = None
+
+        if self.mode == RECORD:
+            # Append, so that several sessions can be recorded in the same archive
+            self.archive_file = gzip.open(self.path,"at")
+            atexit.register(self.close)
+        else:
+            self.load()
+
+    def isReplaying(self):
+        # type: () -> bool
+        return self.mode == REPLAY
+
+    def load(self):
+        if not os.path.exists(self.path):
+            raise IOError("OMS archive %s not found" % self.path)
+        with gzip.open(self.path,"rt") as f:
+            try:
+                for line in f:
+                    entry = json.loads(line)
+                    self.responses.setdefault(entry['key'],[]).append((entry['status'],entry['body']))
+            except (EOFError, ValueError):
+                # The recording session was interrupted, keep what was fully written
+                print("The OMS archive %s is truncated, using the first %d queries" % (self.path,sum([len(x) for x in self.responses.values()])))
+
+    # Use: Appends a response to the archive
+    def record(self,url,response):
+        # type: (str,requests.Response) -> None
+        line = json.dumps({'key': makeKey(url), 'status': response.status_code, 'body': response.text})
+        with self.lock:
+            if self.archive_file is None:
+                return
+            self.archive_file.write(line+"\n")
+            self.archive_file.flush()
+            self.n_recorded += 1
+
+    # Returns: The next recorded response for the query url, or a 404 response if it was never recorded
+    def replay(self,url):
+        # type: (str) -> ArchivedResponse
+        key = makeKey(url)
+        with self.lock:
+            if key not in self.responses:
+                if key not in self.missing:
+                    print("Query not found in the OMS archive: %s" % key)
+                    self.missing.add(key)
+                return ArchivedResponse(404,json.dumps({'errors': [{'status': '404', 'title': 'Not found in the OMS archive'}]}))
+            i = self.replayed.get(key,0)
+            self.replayed[key] = i + 1
+            status, text = self.responses[key][min(i,len(self.responses[key])-1)]
+        return ArchivedResponse(status,text)
+
+    def close(self):
+        with self.lock:
+            if self.archive_file is not None:
+                self.archive_file.close()
+                self.archive_file = None
+
+# Returns: The archive requested with the RATEMON_OMS_RECORD or RATEMON_OMS_REPLAY environment variables, or None
+def fromEnvironment():
+    # type: () -> OMSArchive
+    if os.environ.get("RATEMON_OMS_REPLAY"):
+        return OMSArchive(os.environ["RATEMON_OMS_REPLAY"],REPLAY)
+    if os.environ.get("RATEMON_OMS_RECORD"):
+        return OMSArchive(os.environ["RATEMON_OMS_RECORD"],RECORD)
+    return None
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+#####################################################################
+# File: OMSCache.py
+#
+# Dependencies: OMSDecoder.py
+#
+# A local, on disk cache of the OMS responses. Entries are addressed by
+# a hash of the endpoint, filters, fields and page of the query. The data
+# of a run doesn't change once the run has ended, so those entries never
+# expire, while the entries of a run which is still going on are only
+# kept for a short time. The least recently used entries are evicted when
+# the cache grows over its maximum size.
+#
+# Usage: python3 OMSCache.py info|purge [--cacheDir=<dir>] [--run=<run>] [--ongoing]
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import getopt
+import hashlib
+import threading
+
+import OMSDecoder
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ratemon", "oms")
+DEFAULT_MAX_BYTES = 2*1024**3   # 2 GB
+DEFAULT_ONGOING_TTL = 60        # seconds that the entries of a run which hasn't ended are valid for
+
+ENDED_RUNS_FILE = "ended_runs"
+
+# Returns: The endpoint and the sorted list of parameters of a query url, so that the order of the filters doesn't matter
+def canonicalQuery(url):
+    # type: (str) -> Tuple[str,List[str]]
+    endpoint, _, params = url.partition("?")
+    return endpoint, sorted([p for p in params.split("&") if p])
+
+# Returns: The run number that a query url is restricted to, or None if it isn't restricted to a single run
+def getRunNumber(url):
+    # type: (str) -> int
+    match = re.search(r"filter\[run_number\]\[EQ\]=(\d+)(&|$)", url)
+    if match is None:
+        return None
+    return int(match.group(1))
+
+# Returns: The OMS resource (e.g. 'hltpathrates', 'l1algorithmtriggers/ratemon') of a query url
+def getResource(url):
+    # type: (str) -> str
+    endpoint = canonicalQuery(url)[0]
+    match = re.search(r"/api/(v[0-9]+/)?(.*)$",endpoint)
+    if match is None:
+        return endpoint
+    return match.group(2)
+
+class OMSCache:
+    def __init__(self,cache_dir=DEFAULT_CACHE_DIR,max_bytes=DEFAULT_MAX_BYTES,ongoing_ttl=DEFAULT_ONGOING_TTL):
+        # type: (str,int,float) -> None
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ongoing_ttl = ongoing_ttl
+
+        self.lock = threading.Lock()
+        self.total_bytes = None     # Only computed the first time we write to the cache
+        self.ended_runs = set()
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            os.makedirs(self.cache_dir,exist_ok=True)
+            self.loadEndedRuns()
+        except:
+            print("Unable to use %s as the OMS cache directory, the cache is disabled" % self.cache_dir)
+            self.cache_dir = None
+
+    # Returns: The hash that an entry is stored with
+    def makeKey(self,url):
+        # type: (str) -> str
+        endpoint, params = canonicalQuery(url)
+        return hashlib.sha256(("%s?%s" % (endpoint,"&".join(params))).encode()).hexdigest()
+
+    # Returns: The path of the file that an entry is stored in
+    def getPath(self,key):
+        # type: (str) -> str
+        return os.path.join(self.cache_dir,key[:2],key+".json.gz")
+
+    def loadEndedRuns(self):
+        path = os.path.join(self.cache_dir,ENDED_RUNS_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                if line.strip().isdigit():
+                    self.ended_runs.add(int(line))
+
+    # Use: Remembers that a run has ended, so that all its future entries never expire
+    def setRunEnded(self,runNumber):
+        # type: (int) -> None
+        if self.cache_dir is None or runNumber in self.ended_runs:
+            return
+        with self.lock:
+            self.ended_runs.add(runNumber)
+            try:
+                with open(os.path.join(self.cache_dir,ENDED_RUNS_FILE),"a") as f:
+                    f.write("%d\n" % runNumber)
+            except:
+                print("Unable to record the end of run %d in the OMS cache" % runNumber)
+
+    def isRunEnded(self,runNumber):
+        # type: (int) -> bool
+        return runNumber in self.ended_runs
+
+    # Use: Looks up the response to a query url
+    # Returns: The cached json content of the response, or None if there isn't a valid entry for it
+    def get(self,url):
+        # type: (str) -> Dict[str,object]
+        if self.cache_dir is None:
+            return None
+        path = self.getPath(self.makeKey(url))
+        try:
+            with gzip.open(path,"rb") as f:
+                entry = OMSDecoder.loads(f.read())
+        except:
+            self.misses += 1
+            return None
+        if not entry['ended'] and time.time() - entry['created'] > self.ongoing_ttl:
+            self.remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Keep track of when the entry was last used, for the eviction
+        except:
+            pass
+        self.hits += 1
+        return entry['response']
+
+    # Use: Stores the response to a query url
+    def put(self,url,response,runNumber=None):
+        # type: (str,Dict[str,object],int) -> None
+        if self.cache_dir is None:
+            return
+        entry = {
+            'url': url,
+            'run': runNumber,
+            'ended': runNumber is not None and self.isRunEnded(runNumber),
+            'created': time.time(),
+            'response': response
+        }
+        path = self.getPath(self.makeKey(url))
+        tmp_path = "%s.%d.%d.tmp" % (path,os.getpid(),threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(path),exist_ok=True)
+            with gzip.open(tmp_path,"wt") as f:
+                json.dump(entry,f)
+            os.replace(tmp_path,path)   # Readers never see a partially written entry
+            size = os.path.getsize(path)
+        except:
+            print("Unable to write to the OMS cache")
+            self.remove(tmp_path)
+            return
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum([os.path.getsize(p) for p in self.listEntries()])
+            else:
+                self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    # Use: Removes the least recently used entries, until the cache is back below 90% of its maximum size
+    # Note: Must be called with self.lock held
+    def evict(self):
+        entries = []
+        for path in self.listEntries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime,stat.st_size,path))
+        entries.sort()
+        self.total_bytes = sum([e[1] for e in entries])
+        for mtime, size, path in entries:
+            if self.total_bytes <= 0.9*self.max_bytes:
+                break
+            if self.remove(path):
+                self.total_bytes -= size
+
+    def remove(self,path):
+        # type: (str) -> bool
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    # Returns: The paths of all the entries in the cache
+    def listEntries(self):
+        # type: () -> List[str]
+        if self.cache_dir is None:
+            return []
+        paths = []
+        for subdir in sorted(os.listdir(self.cache_dir)):
+            subdir = os.path.join(self.cache_dir,subdir)
+            if not os.path.isdir(subdir):
+                continue
+            for name in os.listdir(subdir):
+                if name.endswith(".json.gz"):
+                    paths.append(os.path.join(subdir,name))
+        return paths
+
+    # Returns: The entry stored in a file, without the response
+    def readEntryInfo(self,path):
+        # type: (str) -> Dict[str,object]
+        with gzip.open(path,"rt") as f:
+            entry = json.load(f)
+        del entry['response']
+        entry['size'] = os.path.getsize(path)
+        return entry
+
+    # Use: Prints a summary of the contents of the cache
+    def printInfo(self):
+        entries = []
+        for path in self.listEntries():
+            try:
+                entries.append(self.readEntryInfo(path))
+            except:
+                continue
+        total_size = sum([e['size'] for e in entries])
+        print("Cache directory: %s" % self.cache_dir)
+        print("Entries: %d, size: %.1f MB (max %.1f MB)" % (len(entries),total_size/1024.**2,self.max_bytes/1024.**2))
+        print("Ended runs: %d" % len(self.ended_runs))
+        by_endpoint = {}
+        runs = {}
+        for entry in entries:
+            endpoint = getResource(entry['url'])
+            count, size = by_endpoint.get(endpoint,(0,0))
+            by_endpoint[endpoint] = (count+1,size+entry['size'])
+            if entry['run'] is not None:
+                runs[entry['run']] = entry['ended']
+        for endpoint in sorted(by_endpoint):
+            count, size = by_endpoint[endpoint]
+            print("    %-30s %6d entries %10.1f kB" % (endpoint,count,size/1024.))
+        ongoing = sorted([run for run, ended in runs.items() if not ended])
+        print("Runs: %d, of which with expiring entries: %s" % (len(runs),ongoing if ongoing else "none"))
+
+    # Use: Removes entries from the cache
+    # Parameters:
+    # -- runNumber: only remove the entries of this run
+    # -- ongoing_only: only remove the entries of runs which had not ended when the entries were written
+    # Returns: The number of removed entries
+    def purge(self,runNumber=None,ongoing_only=False):
+        # type: (int,bool) -> int
+        removed = 0
+        with self.lock:
+            for path in self.listEntries():
+                if runNumber is not None or ongoing_only:
+                    try:
+                        entry = self.readEntryInfo(path)
+                    except:
+                        entry = {'run': None, 'ended': False}
+                    if runNumber is not None and entry['run'] != runNumber:
+                        continue
+                    if ongoing_only and entry['ended']:
+                        continue
+                if self.remove(path):
+                    removed += 1
+            if runNumber is None and not ongoing_only:
+                self.remove(os.path.join(self.cache_dir,ENDED_RUNS_FILE))
+                self.ended_runs = set()
+            self.total_bytes = None
+        return removed
+
+shared_cache = None
+
+# Returns: The OMSCache shared by all the DBParser objects
+def getCache():
+    # type: () -> OMSCache
+    global shared_cache
+    if shared_cache is None:
+        shared_cache = OMSCache()
+    return shared_cache
+
+def printUsage():
+    print("Usage: python3 OMSCache.py info|purge [--cacheDir=<dir>] [--run=<run>] [--ongoing]")
+    print("    info          Print a summary of the contents of the cache")
+    print("    purge         Remove entries from the cache (all of them, unless --run or --ongoing are given)")
+    print("    --cacheDir    The cache directory, default: %s" % DEFAULT_CACHE_DIR)
+    print("    --run         Only remove the entries of this run")
+    print("    --ongoing     Only remove the entries of runs which had not ended yet when they were cached")
+
+if __name__ == "__main__":
+    try:
+        opt, args = getopt.gnu_getopt(sys.argv[1:],"",["cacheDir=","run=","ongoing","Help"])
+    except getopt.GetoptError as err:
+        print(str(err))
+        printUsage()
+        sys.exit(1)
+
+    cache_dir = DEFAULT_CACHE_DIR
+    run = None
+    ongoing = False
+    for label, op in opt:
+        if label == "--cacheDir":
+            cache_dir = str(op)
+        elif label == "--run":
+            run = int(op)
+        elif label == "--ongoing":
+            ongoing = True
+        elif label == "--Help":
+            printUsage()
+            sys.exit(0)
+
+    if len(args) != 1 or args[0] not in ["info","purge"]:
+        printUsage()
+        sys.exit(1)
+
+    cache = OMSCache(cache_dir)
+    if args[0] == "info":
+        cache.printInfo()
+    else:
+        print("Removed %d entries from %s" % (cache.purge(run,ongoing),cache.cache_dir))
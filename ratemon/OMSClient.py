@@ -0,0 +1,157 @@
+#####################################################################
+# File: OMSClient.py
+#
+# Dependencies: OMSExecutor.py, OMSArchive.py, yaml
+#
+# Creates the OMS client the first time it is needed (not when a module
+# is imported), and authenticates it as configured:
+#    krb  -- kerberos, only available on lxplus
+#    oidc -- OIDC token, using the 'token_info' of OMSConfig.yaml (API VMs)
+#    none -- no authentication, e.g. at P5
+#    auto -- guess one of the above from the hostname (the default)
+#
+# The configuration is taken, in order of precedence, from configure(),
+# the RATEMON_OMS_AUTH/RATEMON_OMS_URL/RATEMON_OMS_VERSION environment
+# variables and the optional 'oms' section of OMSConfig.yaml, e.g.:
+#    oms:
+#      'auth': 'krb'
+#      'url': 'https://cmsoms.cern.ch/agg/api'
+#      'version': 'v1'
+#
+# The same section can set the timeouts and latency budgets of the OMS
+# calls (see OMSExecutor.py), e.g.:
+#    oms:
+#      'timeout': 30                    # read timeout of a request, in seconds
+#      'budget': 60                     # time a call may take, retries included
+#      'budgets': {'hltpathrates': 120} # per endpoint budgets
+#      'hedge': True                    # hedge the requests slower than the p95 latency
+#####################################################################
+
+import os
+import socket
+import threading
+
+import yaml
+
+import OMSExecutor
+import OMSArchive
+
+AUTH_MODES = ["auto","krb","oidc","none"]
+
+DEFAULT_CONFIG_FILE = "OMSConfig.yaml"
+DEFAULT_URLS = {
+    "krb":  ("https://cmsoms.cern.ch/agg/api","v1"),
+    "oidc": ("https://cmsoms.cern.ch/agg/api","v1"),
+    "none": ("http://cmsoms.cms:8080/api","v1"),
+}
+
+config = {
+    'auth': None,
+    'url': None,
+    'version': None,
+    'config_file': DEFAULT_CONFIG_FILE
+}
+
+client = None
+client_lock = threading.Lock()
+
+# Use: Sets how the OMS client is created, the arguments left to None are taken from the environment or the config file
+# Note: Drops the current client, if there is one, so that the next query uses the new configuration
+def configure(auth=None,url=None,version=None,config_file=None):
+    # type: (str,str,str,str) -> None
+    global client
+    if auth is not None and auth not in AUTH_MODES:
+        raise ValueError("Unknown OMS authentication mode '%s', expected one of %s" % (auth,AUTH_MODES))
+    with client_lock:
+        config['auth'] = auth
+        config['url'] = url
+        config['version'] = version
+        if config_file is not None:
+            config['config_file'] = config_file
+        client = None
+
+# Returns: The contents of the config file, or an empty dictionary if there isn't one
+def readConfigFile(path):
+    # type: (str) -> Dict[str,object]
+    if not os.path.exists(path):
+        return {}
+    with open(path,'r') as stream:
+        return yaml.safe_load(stream) or {}
+
+# Returns: The authentication mode to use on this machine, when it is configured as 'auto'
+def guessAuthMode():
+    # type: () -> str
+    hostname = socket.gethostname()
+    # This option uses a DB authentication only available on lxplus
+    if "lxplus" in hostname:
+        return "krb"
+    # This option uses a token setup for the API VMs
+    elif "ruber" in hostname or "ater" in hostname or "caer" in hostname:
+        return "oidc"
+    # This option is for P5, no authentication necessary
+    return "none"
+
+# Returns: A new, authenticated, OMS client
+def makeClient():
+    # type: () -> OMSExecutor.OMSSessionAPI
+    cfg = readConfigFile(config['config_file'])
+    oms_cfg = cfg.get('oms',{}) or {}
+
+    auth = config['auth'] or os.environ.get("RATEMON_OMS_AUTH") or oms_cfg.get('auth') or "auto"
+    if auth not in AUTH_MODES:
+        raise ValueError("Unknown OMS authentication mode '%s', expected one of %s" % (auth,AUTH_MODES))
+    if auth == "auto":
+        auth = guessAuthMode()
+    if OMSExecutor.getExecutor().archive is not None and OMSExecutor.getExecutor().archive.isReplaying():
+        # All the responses come from the archive, we never talk to OMS
+        auth = "none"
+    OMSExecutor.getExecutor().configureLatency(timeout=oms_cfg.get('timeout'),budget=oms_cfg.get('budget'),
+                                               budgets=oms_cfg.get('budgets'),hedge=oms_cfg.get('hedge'))
+    url = config['url'] or os.environ.get("RATEMON_OMS_URL") or oms_cfg.get('url') or DEFAULT_URLS[auth][0]
+    version = config['version'] or os.environ.get("RATEMON_OMS_VERSION") or oms_cfg.get('version') or DEFAULT_URLS[auth][1]
+
+    if auth == "none":
+        new_client = OMSExecutor.OMSSessionAPI(url,version,verbose=False)
+    else:
+        new_client = OMSExecutor.OMSSessionAPI(url,version,cert_verify=False,verbose=False)
+    if auth == "krb":
+        new_client.auth_krb()
+    elif auth == "oidc":
+        my_app_id = cfg['token_info']['token_name']
+        my_app_secret = cfg['token_info']['token_secret']
+        new_client.auth_oidc(my_app_id,my_app_secret,audience="cmsoms-prod")
+
+    return new_client
+
+# Returns: The shared OMS client, creating and authenticating it the first time
+def getClient():
+    # type: () -> OMSExecutor.OMSSessionAPI
+    global client
+    if client is None:
+        with client_lock:
+            if client is None:
+                client = makeClient()
+    return client
+
+# Use: Records all the OMS responses to an archive, or replays them from it instead of querying OMS (see OMSArchive.py)
+# Parameters:
+# -- mode: OMSArchive.RECORD or OMSArchive.REPLAY
+def useArchive(path,mode):
+    # type: (str,str) -> None
+    global client
+    archive = OMSArchive.OMSArchive(path,mode)
+    with client_lock:
+        OMSExecutor.getExecutor().archive = archive
+        OMSExecutor.getExecutor().meta_cache = {}   # So that the meta information is recorded too
+        client = None   # Don't keep a client authenticated for OMS when replaying, and vice versa
+
+# Stands in for the OMS client, which is only created when the first query is made
+class LazyOMSClient:
+    def query(self,resource,query_validation=True):
+        # type: (str,bool) -> OMSExecutor.OMSSessionQuery
+        return getClient().query(resource,query_validation)
+
+    @property
+    def executor(self):
+        # type: () -> OMSExecutor.OMSExecutor
+        return OMSExecutor.getExecutor()
@@ -0,0 +1,68 @@
+#####################################################################
+# File: OMSDecoder.py
+#
+# Dependencies: None (orjson or msgspec, if they are installed)
+#
+# Decodes the json content of the OMS responses. The fastest decoder
+# installed is used: orjson, then msgspec, then the json module of the
+# standard library. The decoder can be forced with the
+# RATEMON_JSON_DECODER environment variable (orjson, msgspec or json),
+# or with setDecoder().
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import os
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+DECODERS = ["orjson","msgspec","json"]     # In order of preference
+
+# Returns: {name: function}, the decoders which are installed, each taking the bytes (or str) of a json document
+def getAvailableDecoders():
+    # type: () -> Dict[str,Callable]
+    decoders = {}
+    if orjson is not None:
+        decoders["orjson"] = orjson.loads
+    if msgspec is not None:
+        decoders["msgspec"] = msgspec.json.Decoder().decode
+    decoders["json"] = json.loads
+    return decoders
+
+available = getAvailableDecoders()
+
+decoder_name = None
+decode = None
+
+# Use: Selects the decoder used by loads, the first one installed if name is None
+def setDecoder(name=None):
+    # type: (str) -> None
+    global decoder_name, decode
+    if name is None:
+        name = [x for x in DECODERS if x in available][0]
+    if name not in DECODERS:
+        raise ValueError("Unknown json decoder '%s', expected one of %s" % (name,DECODERS))
+    if name not in available:
+        print("The %s json decoder is not installed, using the json module" % name)
+        name = "json"
+    decoder_name = name
+    decode = available[name]
+
+setDecoder(os.environ.get("RATEMON_JSON_DECODER") or None)
+
+# Returns: The decoded json document
+def loads(content):
+    # type: (bytes) -> object
+    return decode(content)
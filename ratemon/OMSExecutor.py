@@ -0,0 +1,289 @@
+#####################################################################
+# File: OMSExecutor.py
+#
+# Dependencies: omsapi, requests, OMSArchive.py, OMSDecoder.py, OMSLatency.py
+#
+# Runs OMS queries on a bounded pool of worker threads, all sharing the
+# same HTTP session (and so the same pool of keep-alive connections).
+#
+# Every request has a timeout, and every call a latency budget per OMS
+# endpoint: requests which time out, can't connect or get a 502/503/504
+# are retried (at most max_retries times, with a jittered exponential
+# backoff) as long as the budget isn't spent, after which the call fails
+# with OMSBudgetExceeded. With hedging enabled, a request which takes
+# longer than the p95 latency of its endpoint gets a second, identical
+# request, and the first response wins (all the OMS queries are reads).
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import requests
+from omsapi import OMSAPI, OMSQuery
+
+import OMSArchive
+import OMSDecoder
+import OMSLatency
+from OMSCache import getResource
+
+DEFAULT_WORKERS = 8     # Maximum number of OMS requests in flight at the same time
+DEFAULT_TIMEOUT = (5.,30.)  # (connect, read) timeout of a single request, in seconds
+DEFAULT_BUDGET = 60.    # Time a call may take, retries included, in seconds
+DEFAULT_RETRIES = 2     # Number of times a failed request is sent again
+BACKOFF_BASE = 0.5      # Delay before the first retry, in seconds, doubled for each following one
+BACKOFF_MAX = 8.
+RETRY_STATUS = [502,503,504]
+
+# Raised when an OMS call doesn't succeed within the latency budget of its endpoint
+class OMSBudgetExceeded(requests.exceptions.Timeout):
+    pass
+
+class OMSExecutor:
+    def __init__(self,max_workers=DEFAULT_WORKERS):
+        # type: (int) -> None
+        self.lock = threading.Lock()
+        self.meta_cache = {}    # {'resource': fields}, the meta information never changes, so we only get it once
+        self.archive = None     # OMSArchive, to record the responses or to replay them instead of querying OMS
+        self.session = None
+        self.pool = None
+        self.hedge_pool = None  # The hedged requests have their own threads, so that they never wait for the ones they hedge
+        self.max_workers = 0
+        self.latency = OMSLatency.LatencyMonitor()
+        self.timeout = DEFAULT_TIMEOUT
+        self.budget = DEFAULT_BUDGET
+        self.budgets = {}       # {'resource': seconds}, the budgets of the endpoints which don't use the default one
+        self.max_retries = DEFAULT_RETRIES
+        self.hedge = False
+        self.setMaxWorkers(max_workers)
+
+    # Use: (Re)creates the worker pool and the HTTP session, sized for max_workers concurrent requests
+    def setMaxWorkers(self,max_workers):
+        # type: (int) -> None
+        max_workers = max(1,int(max_workers))
+        with self.lock:
+            if max_workers == self.max_workers:
+                return
+            old_pool = self.pool
+            old_hedge_pool = self.hedge_pool
+            self.max_workers = max_workers
+            self.pool = ThreadPoolExecutor(max_workers=max_workers,thread_name_prefix="oms")
+            self.hedge_pool = ThreadPoolExecutor(max_workers=2*max_workers,thread_name_prefix="oms-hedge")
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers,pool_maxsize=max_workers)
+            self.session.mount("http://",adapter)
+            self.session.mount("https://",adapter)
+        if old_pool is not None:
+            old_pool.shutdown(wait=False)
+        if old_hedge_pool is not None:
+            old_hedge_pool.shutdown(wait=False)
+
+    # Use: Sets the timeouts and latency budgets of the OMS calls, the arguments left to None are unchanged
+    # Parameters:
+    # -- timeout: read timeout of a single request, in seconds
+    # -- budget: default latency budget of a call, in seconds
+    # -- budgets: {'resource': seconds}, the latency budget of some endpoints, e.g. {'hltpathrates': 120}
+    # -- hedge: whether to send a second request when the first one is slower than the p95 latency of its endpoint
+    def configureLatency(self,timeout=None,budget=None,budgets=None,hedge=None,max_retries=None):
+        # type: (float,float,Dict[str,float],bool,int) -> None
+        if timeout is not None:
+            self.timeout = (min(DEFAULT_TIMEOUT[0],float(timeout)),float(timeout))
+        if budget is not None:
+            self.budget = float(budget)
+        if budgets is not None:
+            self.budgets = dict((resource,float(seconds)) for resource, seconds in budgets.items())
+        if hedge is not None:
+            self.hedge = bool(hedge)
+        if max_retries is not None:
+            self.max_retries = max(0,int(max_retries))
+
+    # Returns: The latency budget of a call to an OMS endpoint, in seconds
+    def getBudget(self,resource):
+        # type: (str) -> float
+        return self.budgets.get(resource,self.budget)
+
+    # Use: Sends a GET request through the shared session, or replays it from the archive
+    # Note: Raises OMSBudgetExceeded if no response is received within the latency budget of the endpoint
+    def get(self,url,verify=False,headers=None,cookies=None,proxies=None):
+        # type: (str,bool,Dict[str,str],Dict[str,str],Dict[str,str]) -> requests.Response
+        archive = self.archive
+        if archive is not None and archive.isReplaying():
+            return archive.replay(url)
+        def send(timeout):
+            return self.session.get(url,verify=verify,headers=headers,cookies=cookies,proxies=proxies,allow_redirects=False,timeout=timeout)
+        response = self.sendWithRetries(getResource(url),send)
+        if archive is not None:
+            archive.record(url,response)
+        return response
+
+    # Use: Sends a request, retrying it with a jittered exponential backoff while the latency budget of the endpoint allows
+    # Parameters:
+    # -- send: function taking the (connect, read) timeout, which sends the request and returns the response
+    # Returns: The response, the last one received if all the attempts got a 502/503/504
+    def sendWithRetries(self,resource,send):
+        # type: (str,Callable) -> requests.Response
+        budget = self.getBudget(resource)
+        deadline = time.time() + budget
+        attempt = 0
+        while True:
+            remaining = deadline - time.time()
+            timeout = (min(self.timeout[0],remaining),min(self.timeout[1],remaining))
+            start = time.time()
+            response = None
+            try:
+                response = self.sendHedged(resource,send,timeout)
+            except (requests.exceptions.Timeout,requests.exceptions.ConnectionError) as e:
+                error = e
+                self.latency.recordFailure(resource,"timeout" if isinstance(e,requests.exceptions.Timeout) else "error")
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    self.latency.record(resource,time.time() - start)
+                    return response
+                error = "HTTP %d" % response.status_code
+                self.latency.recordFailure(resource,"error")
+
+            attempt += 1
+            delay = min(BACKOFF_BASE*2**(attempt - 1),BACKOFF_MAX)*random.uniform(0.5,1.5)
+            if attempt > self.max_retries or time.time() + delay >= deadline:
+                if response is not None:
+                    return response
+                if time.time() + delay >= deadline:
+                    raise OMSBudgetExceeded("OMS call to '%s' went over its latency budget of %.0f s (%s)" % (resource,budget,error))
+                raise error
+            self.latency.recordFailure(resource,"retry")
+            time.sleep(delay)
+
+    # Use: Sends a request, and sends it a second time if the first one takes longer than the p95 latency of the endpoint
+    # Returns: The first successful response
+    def sendHedged(self,resource,send,timeout):
+        # type: (str,Callable,Tuple[float,float]) -> requests.Response
+        p95 = self.latency.getQuantile(resource,0.95) if self.hedge else None
+        if p95 is None or p95 >= timeout[1]:
+            return send(timeout)
+        first = self.hedge_pool.submit(send,timeout)
+        try:
+            return first.result(timeout=p95)
+        except FutureTimeoutError:
+            pass
+        self.latency.recordFailure(resource,"hedged")
+        second = self.hedge_pool.submit(send,(timeout[0],max(timeout[1] - p95,timeout[0])))
+        done, pending = wait([first,second],return_when=FIRST_COMPLETED)
+        winner = done.pop()
+        if winner.exception() is not None and pending:
+            # The other request may still succeed
+            winner = pending.pop()
+        return winner.result()
+
+    # Use: Runs a query and decodes the response, with the fastest json decoder installed (see OMSDecoder.py)
+    # Returns: The json content of the response
+    def fetch(self,q):
+        # type: (OMSQuery) -> Dict[str,object]
+        return OMSDecoder.loads(q.data().content)
+
+    # Use: Schedules a query on the worker pool, to be run by fetch (by default self.fetch)
+    # Returns: A concurrent.futures.Future, whose result() is the json content of the response
+    def submit(self,q,fetch=None):
+        # type: (OMSQuery,Callable) -> Future
+        return self.pool.submit(fetch or self.fetch,q)
+
+    # Use: Runs all the queries concurrently, and waits for all of them to finish
+    # Returns: The json content of each response, in the same order as the queries
+    def gather(self,queries,fetch=None):
+        # type: (List[OMSQuery],Callable) -> List[Dict[str,object]]
+        futures = [self.submit(q,fetch) for q in queries]
+        return [f.result() for f in futures]
+
+# An OMS query which sends its requests through an OMSExecutor, and only fetches the meta information of each resource once
+class OMSSessionQuery(OMSQuery):
+    def __init__(self,api,*args,**kwargs):
+        self.api = api
+        self.executor = api.executor
+        OMSQuery.__init__(self,*args,**kwargs)
+
+    def _load_meta(self):
+        resource_base = self.resource.split("/")[0]
+        if resource_base in self.executor.meta_cache:
+            self.metadata = self.executor.meta_cache[resource_base]
+            return
+        OMSQuery._load_meta(self)
+        if self.metadata is not None:
+            self.executor.meta_cache[resource_base] = self.metadata
+
+    def get_request(self,url,verify=False):
+        response = self.sendRequest(url,verify)
+        # Check if the token (or the kerberos cookies) expired (Unauthorized)
+        if response.status_code == 401:
+            print("Unauthorized. Will try to authenticate again")
+            self.api.refreshAuth()
+            response = self.sendRequest(url,verify)
+        return response
+
+    def sendRequest(self,url,verify=False):
+        if self.oms_auth:
+            return self.executor.get(url,verify=verify,headers=self.oms_auth.token_headers,proxies=self.proxies)
+        else:
+            # Always use the latest cookies of the client, they are replaced when we authenticate again
+            return self.executor.get(url,verify=verify,cookies=self.api.cookies,proxies=self.proxies)
+
+# The OMS API client, creating OMSSessionQuery objects instead of plain OMSQuery ones
+class OMSSessionAPI(OMSAPI):
+    def __init__(self,*args,**kwargs):
+        self.executor = kwargs.pop("executor",None) or getExecutor()
+        self.auth_lock = threading.Lock()
+        self.auth_mode = "none"
+        self.token_margin = 60  # Renew the OIDC token when it is about to expire in less than this number of seconds
+        OMSAPI.__init__(self,*args,**kwargs)
+
+    def auth_krb(self):
+        self.auth_mode = "krb"
+        OMSAPI.auth_krb(self)
+
+    def auth_oidc(self,*args,**kwargs):
+        self.auth_mode = "oidc"
+        OMSAPI.auth_oidc(self,*args,**kwargs)
+
+    # Use: Authenticates again, with the same method used the first time
+    def refreshAuth(self):
+        with self.auth_lock:
+            if self.auth_mode == "oidc":
+                self.oms_auth.auth_oidc()
+            elif self.auth_mode == "krb":
+                self.auth_krb()
+
+    # Use: Renews the OIDC token before it expires, instead of waiting for a request to be refused
+    def checkToken(self):
+        if self.auth_mode != "oidc" or not self.oms_auth.token_json:
+            return
+        lifetime = self.oms_auth.token_json.get("expires_in")
+        if lifetime is None:
+            return
+        if time.time() - self.oms_auth.token_time > lifetime - self.token_margin:
+            self.refreshAuth()
+
+    def query(self,resource,query_validation=True):
+        self.checkToken()
+        return OMSSessionQuery(self,self.base_url,resource=resource,verbose=self.verbose,
+                               cookies=self.cookies,oms_auth=self.oms_auth,cert_verify=self.cert_verify,
+                               throw_on_err=self.throw_on_err,retry_on_err_sec=self.err_sec,proxies=self.proxies)
+
+shared_executor = None
+shared_executor_lock = threading.Lock()
+
+# Returns the OMSExecutor shared by all the DBParser objects
+def getExecutor(max_workers=None):
+    # type: (int) -> OMSExecutor
+    global shared_executor
+    with shared_executor_lock:
+        if shared_executor is None:
+            shared_executor = OMSExecutor(max_workers or DEFAULT_WORKERS)
+            shared_executor.archive = OMSArchive.fromEnvironment()
+        elif max_workers is not None:
+            shared_executor.setMaxWorkers(max_workers)
+    return shared_executor
@@ -0,0 +1,130 @@
+#####################################################################
+# File: OMSLatency.py
+#
+# Dependencies: None (prometheus_client, if it is installed)
+#
+# Keeps track of the latency of the OMS requests, per endpoint (i.e. OMS
+# resource), over the last WINDOW requests, together with the number of
+# errors, timeouts, retries and hedged requests. The latencies can be
+# printed, and exported to prometheus when prometheus_client is
+# installed (ShiftMonitorTool exposes the metrics on port 8000).
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import threading
+from collections import deque
+
+accessPrometheus_ = False
+try:
+    from prometheus_client import Gauge
+    accessPrometheus_ = True
+except ModuleNotFoundError:
+    pass
+
+WINDOW = 200            # Number of recent requests the quantiles of an endpoint are computed from
+MIN_SAMPLES = 20        # Below this number of requests we don't trust the quantiles of an endpoint
+
+# The latencies and failures of the requests to a single OMS endpoint
+class EndpointLatency:
+    def __init__(self,resource):
+        # type: (str) -> None
+        self.resource = resource
+        self.samples = deque(maxlen=WINDOW)     # Latency of the recent successful requests, in seconds
+        self.n_requests = 0
+        self.n_errors = 0
+        self.n_timeouts = 0     # Requests which timed out, or calls which went over their latency budget
+        self.n_retries = 0
+        self.n_hedged = 0
+        self.max_latency = 0.
+
+    # Returns: The latency below which a fraction q of the recent requests were, or None if there were too few
+    def getQuantile(self,q,min_samples=MIN_SAMPLES):
+        # type: (float,int) -> float
+        if len(self.samples) < max(min_samples,1):
+            return None
+        samples = sorted(self.samples)
+        return samples[min(int(q*len(samples)),len(samples)-1)]
+
+class LatencyMonitor:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}     # {resource: EndpointLatency}
+        self.gauges = None
+
+    def getEndpoint(self,resource):
+        # type: (str) -> EndpointLatency
+        with self.lock:
+            if resource not in self.endpoints:
+                self.endpoints[resource] = EndpointLatency(resource)
+            return self.endpoints[resource]
+
+    # Use: Records the latency of a successful request
+    def record(self,resource,seconds):
+        # type: (str,float) -> None
+        endpoint = self.getEndpoint(resource)
+        with self.lock:
+            endpoint.n_requests += 1
+            endpoint.samples.append(seconds)
+            endpoint.max_latency = max(endpoint.max_latency,seconds)
+
+    # Use: Records a failed request
+    # Parameters:
+    # -- kind: 'error', 'timeout', 'retry' or 'hedged'
+    def recordFailure(self,resource,kind):
+        # type: (str,str) -> None
+        endpoint = self.getEndpoint(resource)
+        with self.lock:
+            if kind == "timeout":
+                endpoint.n_timeouts += 1
+            elif kind == "retry":
+                endpoint.n_retries += 1
+            elif kind == "hedged":
+                endpoint.n_hedged += 1
+            else:
+                endpoint.n_errors += 1
+
+    # Returns: The latency below which a fraction q of the recent requests to the endpoint were, or None if we don't know it yet
+    def getQuantile(self,resource,q):
+        # type: (str,float) -> float
+        with self.lock:
+            endpoint = self.endpoints.get(resource)
+            if endpoint is None:
+                return None
+            return endpoint.getQuantile(q)
+
+    # Returns: list of (resource, requests, p50, p95, max, errors, timeouts, retries, hedged), one per endpoint
+    def getSummary(self):
+        # type: () -> List[Tuple]
+        summary = []
+        with self.lock:
+            for resource in sorted(self.endpoints.keys()):
+                endpoint = self.endpoints[resource]
+                summary.append((resource,endpoint.n_requests,endpoint.getQuantile(0.5,1),endpoint.getQuantile(0.95,1),endpoint.max_latency,
+                                endpoint.n_errors,endpoint.n_timeouts,endpoint.n_retries,endpoint.n_hedged))
+        return summary
+
+    def printSummary(self):
+        print("%-32s %8s %8s %8s %8s %7s %8s %7s %7s" % ("OMS endpoint","requests","p50 (s)","p95 (s)","max (s)","errors","timeouts","retries","hedged"))
+        for resource, n, p50, p95, max_latency, errors, timeouts, retries, hedged in self.getSummary():
+            print("%-32s %8d %8s %8s %8.3f %7d %8d %7d %7d" % (resource,n,"%.3f" % p50 if p50 is not None else "-",
+                                                               "%.3f" % p95 if p95 is not None else "-",max_latency,errors,timeouts,retries,hedged))
+
+    # Use: Sets the prometheus gauges of the latencies, does nothing if prometheus_client isn't installed
+    def exportPrometheus(self):
+        if not accessPrometheus_:
+            return
+        if self.gauges is None:
+            self.gauges = {
+                'latency':  Gauge('ratemon_oms_latency_seconds','Latency of the recent OMS requests',["endpoint","quantile"]),
+                'requests': Gauge('ratemon_oms_requests','Number of OMS requests',["endpoint","outcome"]),
+            }
+        for resource, n, p50, p95, max_latency, errors, timeouts, retries, hedged in self.getSummary():
+            for quantile, value in [("0.5",p50),("0.95",p95),("1",max_latency)]:
+                if value is not None:
+                    self.gauges['latency'].labels(endpoint=resource,quantile=quantile).set(value)
+            for outcome, value in [("ok",n),("error",errors),("timeout",timeouts),("retry",retries),("hedged",hedged)]:
+                self.gauges['requests'].labels(endpoint=resource,outcome=outcome).set(value)
@@ -0,0 +1,90 @@
+#####################################################################
+# File: QueryContext.py
+#
+# Dependencies: None
+#
+# A memo of the OMS responses of a single ShiftMonitor cycle (or any
+# other short unit of work). The first request for a query url is sent,
+# any identical request made while it is in flight waits for it, and the
+# ones made after it has finished get the same response. Nothing is kept
+# once the context is dropped, so the data is never older than a cycle.
+#
+# Note: The responses are shared by all the callers, they must not be
+#       modified
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import threading
+from concurrent.futures import Future
+
+class QueryContext:
+    def __init__(self,name=""):
+        # type: (str) -> None
+        self.name = name
+        self.lock = threading.Lock()
+        self.entries = {}       # {url: Future}, the responses of the queries sent in this context
+        self.n_queries = 0      # Number of requests for a query made in this context
+        self.n_sent = 0         # ... of which were sent to OMS (or to the cache)
+        self.n_in_flight = 0    # ... of which waited for an identical query already in flight
+        self.n_failed = 0       # Number of queries sent which failed, e.g. went over their latency budget
+
+    # Use: Gets the response to a query url, calling fetcher only if no identical query was made in this context
+    # Parameters:
+    # -- fetcher: function without arguments which sends the query and returns the json content of the response
+    # Returns: The json content of the response
+    def fetch(self,url,fetcher):
+        # type: (str,Callable) -> Dict[str,object]
+        with self.lock:
+            self.n_queries += 1
+            future = self.entries.get(url)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.entries[url] = future
+                self.n_sent += 1
+            elif not future.done():
+                self.n_in_flight += 1
+
+        if owner:
+            try:
+                response = fetcher()
+            except Exception as e:
+                # Don't remember failures, the next caller tries again
+                with self.lock:
+                    del self.entries[url]
+                    self.n_failed += 1
+                future.set_exception(e)
+                raise
+            if 'data' not in response:
+                # An error from OMS, don't keep it for the rest of the cycle either
+                with self.lock:
+                    del self.entries[url]
+            future.set_result(response)
+            return response
+
+        return future.result()
+
+    # Returns: The number of requests which didn't have to be sent
+    def getHits(self):
+        # type: () -> int
+        return self.n_queries - self.n_sent
+
+    # Returns: The fraction of the requests which didn't have to be sent
+    def getHitRate(self):
+        # type: () -> float
+        if self.n_queries == 0:
+            return 0.
+        return float(self.getHits())/self.n_queries
+
+    # Returns: A one line summary of the requests made in this context
+    def getSummary(self):
+        # type: () -> str
+        summary = "%s: %d OMS queries, %d sent, %d deduplicated (%d in flight), hit rate %.1f%%" % (
+            self.name or "Query context", self.n_queries, self.n_sent, self.getHits(), self.n_in_flight, 100*self.getHitRate())
+        if self.n_failed > 0:
+            summary += ", %d failed" % self.n_failed
+        return summary
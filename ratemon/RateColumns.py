@@ -0,0 +1,93 @@
+#####################################################################
+# File: RateColumns.py
+#
+# Dependencies: None
+#
+# The rates of a trigger stored by column, one list per quantity, and
+# the un-prescaling of the raw rates of an HLT path done a whole column
+# at a time: the prescale of each LS is picked from the prescale table of
+# the path (one entry per prescale column) and multiplied with the rates
+# by map(), so that the loop over the LS runs in C rather than with a
+# dictionary lookup and a try/except per LS.
+#
+# Note: numpy isn't a dependency of RateMon, plain lists filled by map()
+#       turned out faster than array.array for the few thousand LS of a run
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import operator
+from itertools import compress, repeat
+
+# The (un-prescaled) rate and the prescale of a trigger in each LS
+class RateColumns:
+    def __init__(self,ls=None,rate=None,prescale=None):
+        # type: (List[int],List[float],List[float]) -> None
+        self.ls       = ls if ls is not None else []                # LS number
+        self.rate     = rate if rate is not None else []            # prescale*raw rate
+        self.prescale = prescale if prescale is not None else []    # total (L1*HLT) prescale
+
+    def __len__(self):
+        return len(self.ls)
+
+    # Returns: dictionary [LS] <rate><prescale>, the format returned by DBParser.getHLTRates
+    def toDict(self):
+        # type: () -> Dict[int,List[float]]
+        return dict(zip(self.ls,map(list,zip(self.rate,self.prescale))))
+
+    # Returns: RateColumns, built from a dictionary [LS] <rate><prescale>
+    @staticmethod
+    def fromDict(rates):
+        # type: (Dict[int,List[float]]) -> RateColumns
+        ls = sorted(rates.keys())
+        return RateColumns(ls,[rates[LS][0] for LS in ls],[rates[LS][1] for LS in ls])
+
+# Use: Un-prescales the raw rates of a path
+# Parameters:
+# -- ls, raw_rates: the (LS, rate) rows of the path, as two sequences
+# -- column_by_ls: {LS: psi}, the prescale column of each LS, LS which aren't in it (or are None) use column 0
+# -- prescales: the total prescale of the path in each prescale column
+# -- default: the prescale of the columns after the last one in prescales
+# Returns: RateColumns
+def unprescale(ls,raw_rates,column_by_ls,prescales,default):
+    # type: (Sequence[int],Sequence[float],Dict[int,int],List[float],float) -> RateColumns
+    # The prescale of each column used in the run, there are only a handful of them
+    column_prescales = {}
+    for psi in set(column_by_ls.values()) | set([None]):
+        column = 0 if psi is None else psi
+        column_prescales[psi] = prescales[column] if 0 <= column < len(prescales) else default
+
+    ls = list(ls)
+    prescale = list(map(column_prescales.__getitem__,map(column_by_ls.get,ls)))
+    rate = list(map(operator.mul,prescale,raw_rates))
+
+    return RateColumns(ls,rate,prescale)
+
+# The dead time correction of the rates of a run
+class DeadTimeCorrection:
+    # Parameters:
+    # -- dead_time: {LS: dead time percentage}
+    # -- max_deadtime: the LS with more dead time than this are dropped, None to keep all of them
+    def __init__(self,dead_time,max_deadtime=None):
+        # type: (Dict[int,float],float) -> None
+        self.factors = dict((LS,1. + dt/100.) for LS,dt in dead_time.items())  # {LS: factor}, the LS without dead time info aren't corrected
+        self.dropped = set()    # The LS with more than max_deadtime
+        if max_deadtime is not None:
+            self.dropped = set(LS for LS,dt in dead_time.items() if dt > max_deadtime)
+
+    # Returns: The factor the rate of an LS is multiplied by
+    def getFactor(self,LS):
+        # type: (int) -> float
+        return self.factors.get(LS,1.)
+
+    # Returns: The rates corrected for dead time, without the dropped LS
+    def apply(self,columns):
+        # type: (RateColumns) -> RateColumns
+        rate = list(map(operator.mul,columns.rate,map(self.factors.get,columns.ls,repeat(1.))))
+        if self.dropped.isdisjoint(columns.ls):
+            return RateColumns(list(columns.ls),rate,list(columns.prescale))
+        keep = [LS not in self.dropped for LS in columns.ls]
+        return RateColumns(list(compress(columns.ls,keep)),list(compress(rate,keep)),list(compress(columns.prescale,keep)))
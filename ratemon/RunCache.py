@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+#####################################################################
+# File: RunCache.py
+#
+# Dependencies: RunStore.py
+#
+# A local, on disk store of the runs parsed by DataParser, so that the
+# runs of a second analysis (another plotTriggerRates invocation, the
+# reference fits update, the cron job, ...) are read back in a fraction
+# of the time it takes to query OMS and parse them again.
+#
+# The runs are stored in one directory per set of parsing options which
+# change the parsed values (un-prescaling, bunch normalisation, dead time
+# correction, lumi source, triggers, LS range, ...), keyed by a hash of
+# the options, with one file per run. A file holds a json header (the
+# lumi info, number of bunches, object types and the layout of the
+# columns) followed by the raw arrays of RunStore, which are read back
+# from a memory map of the file. The columns shared by the objects of a
+# run (LS, PU, iLumi, ...) are only written once and are shared again
+# once read back.
+#
+# Only the runs which have ended are stored, the data of a run never
+# changes afterwards. The runcount of the objects depends on the list of
+# runs being parsed, it isn't stored but set when the run is read back.
+#
+# Usage: python3 RunCache.py info|purge [--cacheDir=<dir>] [--run=<run>]
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import os
+import sys
+import json
+import mmap
+import array
+import getopt
+import hashlib
+import threading
+
+from RunStore import TYPECODE
+from LumiSections import LumiInfo
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ratemon", "runs")
+FORMAT_VERSION = 1
+
+MAGIC = b"RATEMON-RUN"
+OPTIONS_FILE = "options.json"
+RUN_FILE_EXT = ".run"
+
+# Returns: The hash of a set of parsing options, the name of the directory the runs parsed with them are stored in
+def makeKey(options):
+    # type: (Dict[str,object]) -> str
+    options = dict(options,format_version=FORMAT_VERSION)
+    return hashlib.sha256(json.dumps(options,sort_keys=True).encode()).hexdigest()[:16]
+
+# Returns: [[first, last]], the ranges of vetoed LS as they are stored in the header of a run
+def getVetoRanges(ls_veto):
+    # type: (IntervalSet) -> List[List[int]]
+    if not ls_veto:
+        return []
+    return [list(r) for r in ls_veto.getRanges()]
+
+# The data of a run as read back from the cache, with the attributes of DataParser.ParsedRun
+class CachedRun:
+    def __init__(self,run):
+        # type: (int) -> None
+        self.run = run
+        self.bunches = 1
+        self.lumi_info = None
+        self.records = {}
+        self.type_map = {}
+        self.dropped_ls = []
+
+class RunCache:
+    def __init__(self,cache_dir=DEFAULT_CACHE_DIR):
+        # type: (str) -> None
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.known_keys = set()     # The option directories we already made
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            os.makedirs(self.cache_dir,exist_ok=True)
+        except:
+            print("Unable to use %s as the run cache directory, the cache is disabled" % self.cache_dir)
+            self.cache_dir = None
+
+    # Returns: The path of the file that a run is stored in
+    def getPath(self,key,run):
+        # type: (str,int) -> str
+        return os.path.join(self.cache_dir,key,"%d%s" % (run,RUN_FILE_EXT))
+
+    def hasRun(self,key,run):
+        # type: (str,int) -> bool
+        return self.cache_dir is not None and os.path.exists(self.getPath(key,run))
+
+    # Returns: The runs stored with a set of options
+    def listRuns(self,key):
+        # type: (str) -> List[int]
+        if self.cache_dir is None:
+            return []
+        try:
+            names = os.listdir(os.path.join(self.cache_dir,key))
+        except OSError:
+            return []
+        return sorted([int(name[:-len(RUN_FILE_EXT)]) for name in names if name.endswith(RUN_FILE_EXT)])
+
+    # Use: Stores a parsed run, replacing the previous entry of the run
+    # Parameters:
+    # -- key, options: see makeKey, the options are kept next to the runs for the info command
+    # -- parsed: ParsedRun (or CachedRun)
+    # -- ls_veto: IntervalSet of the LS of the run which were vetoed when it was parsed
+    def put(self,key,options,parsed,ls_veto=None):
+        # type: (str,Dict[str,object],object,IntervalSet) -> None
+        if self.cache_dir is None:
+            return
+
+        blocks = []         # The arrays to write, each shared array only once
+        block_ids = {}      # {id(array): position in blocks}
+        objects = {}        # {'name': {'field': position in blocks, or None} }
+        for name,record in parsed.records.items():
+            objects[name] = {}
+            for field,column in record.items():
+                if field == "runcount":
+                    objects[name][field] = -1   # Set when the run is read back
+                    continue
+                if column is None:
+                    objects[name][field] = None
+                    continue
+                if id(column) not in block_ids:
+                    block_ids[id(column)] = len(blocks)
+                    blocks.append(column)
+                objects[name][field] = block_ids[id(column)]
+
+        layout = []     # [(offset, length)] of each block, relative to the end of the header
+        offset = 0
+        for column in blocks:
+            layout.append((offset,len(column)))
+            offset += len(column)*column.itemsize
+        header = {
+            'format_version': FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'typecode': TYPECODE,
+            'run': parsed.run,
+            'bunches': parsed.bunches,
+            'lumi_info': [list(x) for x in parsed.lumi_info],
+            'type_map': parsed.type_map,
+            'dropped_ls': list(parsed.dropped_ls),
+            'ls_veto': getVetoRanges(ls_veto),
+            'objects': objects,
+            'layout': layout
+        }
+        header = json.dumps(header).encode()
+
+        path = self.getPath(key,parsed.run)
+        tmp_path = "%s.%d.%d.tmp" % (path,os.getpid(),threading.get_ident())
+        try:
+            with self.lock:
+                if key not in self.known_keys:
+                    os.makedirs(os.path.dirname(path),exist_ok=True)
+                    with open(os.path.join(os.path.dirname(path),OPTIONS_FILE),"w") as f:
+                        json.dump(options,f,sort_keys=True,indent=1)
+                    self.known_keys.add(key)
+            with open(tmp_path,"wb") as f:
+                f.write(MAGIC + b"%d\n" % len(header))
+                f.write(header)
+                for column in blocks:
+                    column.tofile(f)
+            os.replace(tmp_path,path)   # Readers never see a partially written run
+        except:
+            print("Unable to write run %d to the run cache" % parsed.run)
+            self.remove(tmp_path)
+
+    # Use: Reads a run back from the cache
+    # Parameters:
+    # -- runcount: the runcount of the objects of the run, see DataParser.getRunData
+    # -- ls_veto: IntervalSet of the LS of the run which are vetoed, the run is only read back if it was stored with the same ones
+    # Returns: CachedRun, or None if the run isn't in the cache
+    def get(self,key,run,runcount,ls_veto=None):
+        # type: (str,int,int,IntervalSet) -> CachedRun
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.getPath(key,run),"rb") as f:
+                with mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as buf:
+                    parsed = self.readRun(buf,runcount,ls_veto)
+        except:
+            parsed = None
+        with self.lock:
+            if parsed is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return parsed
+
+    # Returns: CachedRun, or None if the run was stored with other LS vetoed or in another format
+    def readRun(self,buf,runcount,ls_veto):
+        # type: (mmap.mmap,int,IntervalSet) -> CachedRun
+        start = buf.find(b"\n")
+        if buf[:len(MAGIC)] != MAGIC:
+            return None
+        header_end = start + 1 + int(buf[len(MAGIC):start])
+        header = json.loads(buf[start+1:header_end])
+        if header['format_version'] != FORMAT_VERSION or header['typecode'] != TYPECODE:
+            return None
+        if header['ls_veto'] != getVetoRanges(ls_veto):
+            return None
+
+        view = memoryview(buf)
+        try:
+            blocks = []
+            itemsize = array.array(TYPECODE).itemsize
+            for offset,length in header['layout']:
+                column = array.array(TYPECODE)
+                column.frombytes(view[header_end+offset:header_end+offset+length*itemsize])
+                if header['byteorder'] != sys.byteorder:
+                    column.byteswap()
+                blocks.append(column)
+        finally:
+            view.release()  # The map can't be closed while a view of it is alive
+
+        parsed = CachedRun(header['run'])
+        parsed.bunches = header['bunches']
+        parsed.lumi_info = LumiInfo(header['lumi_info'])
+        parsed.type_map = header['type_map']
+        parsed.dropped_ls = header['dropped_ls']
+        runcounts = {}  # {length: array}, shared by the objects with the same LS
+        for name,fields in header['objects'].items():
+            record = {}
+            for field,block in fields.items():
+                if block is None:
+                    record[field] = None
+                elif block == -1:
+                    length = len(record["LS"])
+                    if length not in runcounts:
+                        runcounts[length] = array.array(TYPECODE,[runcount])*length
+                    record[field] = runcounts[length]
+                else:
+                    record[field] = blocks[block]
+            parsed.records[name] = record
+        return parsed
+
+    def remove(self,path):
+        # type: (str) -> bool
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    # Returns: {key: options}, the sets of options runs are stored with
+    def listKeys(self):
+        # type: () -> Dict[str,Dict[str,object]]
+        if self.cache_dir is None:
+            return {}
+        keys = {}
+        for key in sorted(os.listdir(self.cache_dir)):
+            try:
+                with open(os.path.join(self.cache_dir,key,OPTIONS_FILE)) as f:
+                    keys[key] = json.load(f)
+            except:
+                continue
+        return keys
+
+    # Use: Prints a summary of the contents of the cache
+    def printInfo(self):
+        print("Cache directory: %s" % self.cache_dir)
+        total_size = 0
+        for key,options in self.listKeys().items():
+            runs = self.listRuns(key)
+            size = sum([os.path.getsize(self.getPath(key,run)) for run in runs])
+            total_size += size
+            print("%s: %d runs, %.1f MB" % (key,len(runs),size/1024.**2))
+            for name in sorted(options):
+                print("    %-20s %s" % (name,options[name]))
+            if runs:
+                print("    runs: %s" % runs)
+        print("Total size: %.1f MB" % (total_size/1024.**2))
+
+    # Use: Removes runs from the cache
+    # Parameters:
+    # -- runNumber: only remove this run (with any options)
+    # Returns: The number of removed runs
+    def purge(self,runNumber=None):
+        # type: (int) -> int
+        removed = 0
+        with self.lock:
+            for key in self.listKeys():
+                for run in self.listRuns(key):
+                    if runNumber is not None and run != runNumber:
+                        continue
+                    if self.remove(self.getPath(key,run)):
+                        removed += 1
+                if runNumber is None:
+                    self.remove(os.path.join(self.cache_dir,key,OPTIONS_FILE))
+                    try:
+                        os.rmdir(os.path.join(self.cache_dir,key))
+                    except OSError:
+                        pass
+            self.known_keys = set()
+        return removed
+
+shared_cache = None
+
+# Returns: The RunCache shared by all the DataParser objects
+def getCache():
+    # type: () -> RunCache
+    global shared_cache
+    if shared_cache is None:
+        shared_cache = RunCache()
+    return shared_cache
+
+def printUsage():
+    print("Usage: python3 RunCache.py info|purge [--cacheDir=<dir>] [--run=<run>]")
+    print("    info          Print a summary of the contents of the cache")
+    print("    purge         Remove runs from the cache (all of them, unless --run is given)")
+    print("    --cacheDir    The cache directory, default: %s" % DEFAULT_CACHE_DIR)
+    print("    --run         Only remove this run")
+
+if __name__ == "__main__":
+    try:
+        opt, args = getopt.gnu_getopt(sys.argv[1:],"",["cacheDir=","run=","Help"])
+    except getopt.GetoptError as err:
+        print(str(err))
+        printUsage()
+        sys.exit(1)
+
+    cache_dir = DEFAULT_CACHE_DIR
+    run = None
+    for label, op in opt:
+        if label == "--cacheDir":
+            cache_dir = str(op)
+        elif label == "--run":
+            run = int(op)
+        elif label == "--Help":
+            printUsage()
+            sys.exit(0)
+
+    if len(args) != 1 or args[0] not in ["info","purge"]:
+        printUsage()
+        sys.exit(1)
+
+    cache = RunCache(cache_dir)
+    if args[0] == "info":
+        cache.printInfo()
+    else:
+        print("Removed %d runs from %s" % (cache.purge(run),cache.cache_dir))
@@ -0,0 +1,69 @@
+#####################################################################
+# File: RunSession.py
+#
+# Dependencies: DBParser.py
+#
+# The data of the run being monitored online. The menu and prescales of
+# the run are only loaded once, and every following cycle only fetches
+# the lumisections newer than the last one seen, which are appended to
+# the run buffers. This way the cost of a cycle doesn't grow with the
+# length of the run.
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+class RunSession:
+    def __init__(self,parser,runNumber):
+        # type: (DBParser,int) -> None
+        self.parser = parser
+        self.run_number = runNumber
+        self.menu_loaded = False
+
+        # The run buffers, only ever appended to
+        self.dead_time = {}     # {LS: deadtime}
+        self.l1_rate = {}       # {LS: L1A total rate}
+
+        # The prescale columns of the previous run must not be used for this one
+        self.parser.PSColumnByLS = {}
+
+    # Use: Gets the HLT rates, loading the menu the first time (or until it is available, at the start of a run)
+    # Returns: dictionary [tirgger_name][LS] <rate><prescale>
+    def getHLTRates(self,minLS=-1,maxLS=9999999):
+        # type: (int,int) -> Dict[str,Dict[int,List[float]]]
+        rates = self.parser.getHLTRates(self.run_number,[],minLS,maxLS,load_menu=not self.menu_loaded)
+        if not self.menu_loaded:
+            self.menu_loaded = len(self.parser.HLT_name_map) > 0
+
+        return rates
+
+    # Use: Appends the new rows of a per LS getter to a run buffer
+    def updateBuffer(self,buffer,getter):
+        # type: (Dict[int,float],Callable) -> None
+        minLS = max(buffer.keys()) + 1 if buffer else -1
+        for LS, value in sorted(getter(self.run_number,minLS).items()):
+            if LS not in buffer:
+                buffer[LS] = value
+
+    # Returns: The dead time of every LS of the run so far, dictionary [ LS ] <percent>
+    def getDeadTime(self):
+        # type: () -> Dict[int,float]
+        self.updateBuffer(self.dead_time,self.parser.getDeadTime)
+        return self.dead_time
+
+    # Returns: The total L1A rate of every LS of the run so far, dictionary [ LS ] <rate>
+    def getL1rate(self):
+        # type: () -> Dict[int,float]
+        self.updateBuffer(self.l1_rate,self.parser.getL1rate)
+        return self.l1_rate
+
+    # Returns: The last LS in the run buffers, or 0 if they are empty
+    def getLastLS(self):
+        # type: () -> int
+        last_LS = 0
+        for buffer in [self.dead_time,self.l1_rate]:
+            if buffer:
+                last_LS = max(last_LS,max(buffer.keys()))
+        return last_LS
@@ -0,0 +1,193 @@
+#####################################################################
+# File: RunStore.py
+#
+# Dependencies: None
+#
+# Columnar storage of the data parsed by DataParser: instead of one
+# { LS: value } dictionary per quantity, object and run, every quantity
+# of an object in a run is kept in one contiguous array('f'), all of them
+# aligned on the LS of the object. The LS with luminosity information of
+# each run are indexed once (RunIndex), and the quantities which come
+# from the lumi info (PU, iLumi, status, phys) are only stored once per
+# run: an object which has data for every LS of the index shares the
+# arrays of the index, and only the LS it has data for are copied
+# otherwise.
+#
+# The arrays are handed out as they are (no copy), they are of the type
+# the plotting and fitting code already works with: array('f').
+#
+# Note: numpy isn't a dependency of RateMon, array.array stores the same
+#       contiguous typed buffers
+#
+# Data Type Key:
+#    ( a, b, c, ... )       -- denotes a tuple
+#    [ a, b, c, ... ]       -- denotes a list
+#    { key:obj }            -- denotes a dictionary
+#####################################################################
+
+import array
+import math
+
+TYPECODE = 'f'  # TGraph and the array('f') concatenations of PlotMaker/FitFinder need every column to be of the same type
+
+FIELDS = ["rate","cross_section","prescale","PU","ilumi","status","phys","bandwidth","size","runcount"]
+RUN_FIELDS = ["PU","ilumi","status","phys"]     # Taken from the lumi info, the same for all the objects of a run
+NULLABLE_FIELDS = ["prescale","bandwidth","size"]   # None is stored as NaN
+MISSING = {"cross_section": 0, "runcount": 0}   # The value of the fields an object type doesn't have (None for the others)
+
+# Returns: The values as an array, None (the missing values) being stored as NaN, or None if no value is set (all None or NaN)
+def toColumn(values):
+    # type: (Sequence[float]) -> array.array
+    column = array.array(TYPECODE)
+    has_value = False
+    for x in values:
+        if x is None or x != x:
+            column.append(float('nan'))
+        else:
+            column.append(x)
+            has_value = True
+    if not has_value and len(column) > 0:
+        return None
+    return column
+
+# The LS of a run which have luminosity information (and pass the prescale column filter), in order
+class RunIndex:
+    # Parameters:
+    # -- lumi_info: LumiInfo (or list), [ (LS,ilum,psi,phys,cms_ready,pileup) ]
+    # -- psi_filter: only keep the LS in these prescale columns (IntervalSet, or list), None to keep all of them
+    def __init__(self,run,lumi_info,psi_filter=None):
+        # type: (int,List[Tuple],IntervalSet) -> None
+        self.run = run
+        rows = {}
+        for LS,ilum,psi,phys,cms_ready,pileup in lumi_info:
+            if psi_filter is not None and (psi is None or psi not in psi_filter):
+                continue
+            if ilum is None:
+                continue
+            rows[LS] = (ilum,phys,cms_ready,pileup)
+
+        self.ls_list = sorted(rows.keys())      # [LS], as ints
+        self.positions = dict(zip(self.ls_list,range(len(self.ls_list))))  # {LS: position in the index}
+        self.ilumi_list = [rows[LS][0] for LS in self.ls_list]
+        self.pu_list = [rows[LS][3] for LS in self.ls_list]
+        self.ls = array.array(TYPECODE,self.ls_list)
+        self.columns = {    # {'field': array}
+            "PU":     toColumn(self.pu_list),
+            "ilumi":  array.array(TYPECODE,self.ilumi_list),
+            "status": array.array(TYPECODE,[rows[LS][2] for LS in self.ls_list]),
+            "phys":   array.array(TYPECODE,[rows[LS][1] for LS in self.ls_list]),
+        }
+        self.constants = {}     # {value: array}, the constant columns (e.g. runcount) shared by the objects of the run
+
+    def __len__(self):
+        return len(self.ls_list)
+
+    # Returns: The column of an object, only copying the values of the LS it has data for
+    # Parameters:
+    # -- positions: the position in the index of each LS of the object, None if the object has all of them
+    def getColumn(self,field,positions):
+        # type: (str,List[int]) -> array.array
+        column = self.columns[field]
+        if column is None or positions is None:
+            return column
+        return array.array(TYPECODE,map(column.__getitem__,positions))
+
+    # Returns: An array with the same value for each LS of the index, shared by the objects of the run
+    def getConstant(self,value):
+        # type: (float) -> array.array
+        if value not in self.constants:
+            self.constants[value] = array.array(TYPECODE,[value])*len(self.ls_list)
+        return self.constants[value]
+
+# Returns: {'field': array}, the columns of an object in a run, 'LS' included, the fields the object doesn't have being None
+# Parameters:
+# -- index: RunIndex of the run
+# -- positions: the position in the index of each LS the object has data for
+# -- columns: {'field': values}, one value per position, for the fields which don't come from the lumi info;
+#             a field which is a number (e.g. runcount) has that value for every LS, and the missing fields are MISSING
+def makeRecord(index,positions,columns):
+    # type: (RunIndex,List[int],Dict[str,object]) -> Dict[str,array.array]
+    if len(positions) == len(index):
+        positions = None    # Every LS of the run, the index is shared
+    record = {}
+    record["LS"] = index.ls if positions is None else array.array(TYPECODE,map(index.ls.__getitem__,positions))
+    for field in RUN_FIELDS:
+        record[field] = index.getColumn(field,positions)
+    for field in FIELDS:
+        if field in RUN_FIELDS or field not in columns:
+            continue
+        values = columns[field]
+        if isinstance(values,(int,float)):
+            if positions is None:
+                record[field] = index.getConstant(values)
+            else:
+                record[field] = array.array(TYPECODE,[values])*len(positions)
+        else:
+            record[field] = toColumn(values)
+    return record
+
+class RunStore:
+    def __init__(self):
+        self.objects = {}   # {'name': { run_number: {'field': array} } }, 'LS' included
+
+    # Use: Stores the data of an object in a run, replacing the previous data of the object for that run
+    # Parameters: see makeRecord
+    def addObject(self,name,index,positions,columns):
+        # type: (str,RunIndex,List[int],Dict[str,object]) -> None
+        self.addRecord(name,index.run,makeRecord(index,positions,columns))
+
+    # Use: Stores the columns of an object in a run, as returned by makeRecord
+    def addRecord(self,name,run,record):
+        # type: (str,int,Dict[str,array.array]) -> None
+        if name not in self.objects:
+            self.objects[name] = {}
+        self.objects[name][run] = record
+
+    def hasObject(self,name):
+        # type: (str) -> bool
+        return name in self.objects
+
+    # Returns: {'name': { run_number: array } }, the arrays of a field as they are stored
+    # Note: The arrays are shared, they must not be modified
+    def getView(self,field):
+        # type: (str) -> Dict[str,Dict[int,array.array]]
+        view = {}
+        for name,runs in self.objects.items():
+            view[name] = {}
+            for run,record in runs.items():
+                column = record.get(field)
+                view[name][run] = column if column is not None else MISSING.get(field)
+        return view
+
+    # Returns: {'name': { run_number: { LS: value } } }, the format DataParser used to store its data in
+    def getDictView(self,field):
+        # type: (str) -> Dict[str,Dict[int,Dict[int,float]]]
+        view = {}
+        for name,runs in self.objects.items():
+            view[name] = {}
+            for run,record in runs.items():
+                column = record.get(field)
+                if column is None:
+                    if field in MISSING:
+                        view[name][run] = MISSING[field]
+                    else:
+                        view[name][run] = dict.fromkeys(map(int,record["LS"]))
+                    continue
+                if field in NULLABLE_FIELDS:
+                    column = [None if math.isnan(x) else x for x in column]
+                view[name][run] = dict(zip(map(int,record["LS"]),column))
+        return view
+
+    # Returns: The number of bytes used by the arrays, the shared ones being counted once
+    def getSize(self):
+        # type: () -> int
+        seen = set()
+        size = 0
+        for runs in self.objects.values():
+            for record in runs.values():
+                for column in record.values():
+                    if column is None or id(column) in seen:
+                        continue
+                    seen.add(id(column))
+                    size += len(column)*column.itemsize
+        return size
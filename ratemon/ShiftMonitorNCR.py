@@ -26,6 +26,8 @@ from colors import bcolors # colors
 
 # Database parser
 import DBParser
+from RunSession import RunSession
+from RateColumns import DeadTimeCorrection
 
 # For alerts
 from Alerts import AlertLevel, PriorityAlert, MultipleAlert, MattermostMessage, AudioMessage, OnScreenMessage, RateAlert 
@@ -81,6 +83,7 @@ class ShiftMonitor:
             'InputFitHLT',
             'badRates',
             'deadTimeData',
+            'deadTimeCorrection',
             'l1rateData',
             'InputFitL1',
             'LSRange',
@@ -95,6 +98,8 @@ class ShiftMonitor:
             'triggerList',
             'HLTRates',
             'parser',
+            'session',
+            'lastQueryRunNumber',
             'l1t_rate_alert',
             'L1Rates',
             'FitFinder',
@@ -124,16 +129,19 @@ class ShiftMonitor:
 
         # DBParser
         self.parser = DBParser.DBParser()   # A database parser
+        self.session = None                 # The RunSession of the run being monitored
 
         # Rates
         self.HLTRates = None            # HLT rates
         self.L1Rates = None             # L1 rates
         self.Rates = None               # Combined L1 and HLT rates
         self.deadTimeData = {}          # initializing deadTime dict
+        self.deadTimeCorrection = DeadTimeCorrection({})   # The deadtime correction factor of each LS
 
         # Run control
         self.lastRunNumber = -2         # The run number during the last segment
         self.runNumber = -1             # The number of the current run
+        self.lastQueryRunNumber = -1    # The run the data of the last queryDatabase comes from
         self.numBunches = [-1, -1]      # Number of [target, colliding] bunches
         self.LHCStatus = ["",0]         # First element is the status string, second is the number of consecutive queries in this status
         self.simulation_runNumber = []  # Define a list of simulation runs
@@ -508,6 +516,8 @@ Plase check the rate of L1_HCAL_LaserMon_Veto and contact the HCAL DoC
         self.redoTList = True
         while True:
             try:
+                # Identical OMS queries made during the cycle are only sent once
+                self.parser.beginCycle("Cycle queries")
                 # Check if we are still in the same run, get trigger mode
                 self.lastRunNumber = self.runNumber
                 self.saveRunInfo()
@@ -516,6 +526,13 @@ Plase check the rate of L1_HCAL_LaserMon_Veto and contact the HCAL DoC
                 if self.simulate:
                     self.runNumber = self.simulation_runNumber[self.runIndex]
                 self.runLoop()
+                context = self.parser.endCycle()
+                if not self.quiet and context is not None:
+                    print(context.getSummary())
+                    if context.n_failed > 0:
+                        self.parser.executor.latency.printSummary()
+                if self.accessPrometheus:
+                    self.parser.executor.latency.exportPrometheus()
                 self.runMail()
                 self.sleepWait()
                 if self.simulate:
@@ -696,26 +713,44 @@ Plase check the rate of L1_HCAL_LaserMon_Veto and contact the HCAL DoC
                         self.otherL1Triggers.append(trigger)
         self.getHeader()
     
+    # Use: Calls a getter of queryDatabase, keeping the data of the previous cycle if its OMS queries fail (e.g. go over their latency budget)
+    # Parameters:
+    # -- name: the attribute the data is stored in
+    # -- empty: the data to use when the query fails and there's no data of the same run to keep
+    # Returns: The new data, or the data of the previous cycle
+    def queryOrReuse(self, name, empty, getter, *args):
+        context = self.parser.query_context
+        n_failed = context.n_failed if context is not None else 0
+        try:
+            data = getter(*args)
+            failed = context is not None and context.n_failed > n_failed
+        except Exception as e:
+            print("Error getting %s: %s" % (name, e))
+            data = empty
+            failed = True
+        if failed and self.lastQueryRunNumber == self.runNumber and getattr(self, name) is not None:
+            print("Reusing the %s of the previous cycle" % name)
+            return getattr(self, name)
+        return data
+
     # Use: Gets the rates for the lumisections we want
     def queryDatabase(self):
         # Update lastLS
         self.lastLS = self.currentLS
+        # Only load the menu of the run once, and then only get the new LS
+        if self.session is None or self.session.run_number != self.runNumber:
+            self.session = RunSession(self.parser,self.runNumber)
+        # When some OMS calls fail or go over their latency budget, the data of the previous cycle is kept
         if not self.useLSRange:
-            self.HLTRates = self.parser.getHLTRates(self.runNumber,[],self.lastLS)
-            self.L1Rates = self.parser.getL1Rates(self.runNumber,self.lastLS,99999)
-            try:
-                self.streamData = self.parser.getStreamData(self.runNumber, self.lastLS)
-                self.pdData = self.parser.getPrimaryDatasets(self.runNumber, self.lastLS)
-            except:
-                print("no stream or dataset")
+            self.HLTRates = self.queryOrReuse("HLTRates",{},self.session.getHLTRates,self.lastLS)
+            self.L1Rates = self.queryOrReuse("L1Rates",{},self.parser.getL1Rates,self.runNumber,self.lastLS,99999)
+            self.streamData = self.queryOrReuse("streamData",{},self.parser.getStreamData,self.runNumber,self.lastLS)
+            self.pdData = self.queryOrReuse("pdData",{},self.parser.getPrimaryDatasets,self.runNumber,self.lastLS)
         else:
-            self.HLTRates = self.parser.getHLTRates(self.runNumber,[],self.LSRange[0],self.LSRange[1])
-            self.L1Rates = self.parser.getL1Rates(self.runNumber,self.LSRange[0],self.LSRange[1])
-            try:
-                self.streamData = self.parser.getStreamData(self.runNumber, self.LSRange[0], self.LSRange[1])
-                self.pdData = self.parser.getPrimaryDatasets(self.runNumber, self.LSRange[0], self.LSRange[1])
-            except:
-                print("no stream or dataset")
+            self.HLTRates = self.queryOrReuse("HLTRates",{},self.session.getHLTRates,self.LSRange[0],self.LSRange[1])
+            self.L1Rates = self.queryOrReuse("L1Rates",{},self.parser.getL1Rates,self.runNumber,self.LSRange[0],self.LSRange[1])
+            self.streamData = self.queryOrReuse("streamData",{},self.parser.getStreamData,self.runNumber,self.LSRange[0],self.LSRange[1])
+            self.pdData = self.queryOrReuse("pdData",{},self.parser.getPrimaryDatasets,self.runNumber,self.LSRange[0],self.LSRange[1])
         try:
             self.totalStreams = len(list(self.streamData.keys()))
         except:
@@ -745,20 +780,13 @@ Plase check the rate of L1_HCAL_LaserMon_Veto and contact the HCAL DoC
 
         self.isUpdating = (self.currentLS > self.lastLS)
 
-        try:
-            self.deadTimeData = self.parser.getDeadTime(self.runNumber)
-        except:
-            self.deadTimeData = {}
-            print("Error getting deadtime data")
-
-        try:
-            self.l1rateData = self.parser.getL1rate(self.runNumber)
-        except:
-            self.l1rateData = {}
-            print("Error getting total L1 rate data")
-
-        self.lumiData = self.parser.getLumiInfo(self.runNumber, self.lastLS, self.currentLS)
-        self.numBunches = self.parser.getNumberCollidingBunches(self.runNumber)
+        self.deadTimeData = self.queryOrReuse("deadTimeData",{},self.session.getDeadTime)
+        # The correction factor of each LS, worked out once for all the triggers
+        self.deadTimeCorrection = DeadTimeCorrection(self.deadTimeData)
+        self.l1rateData = self.queryOrReuse("l1rateData",{},self.session.getL1rate)
+        self.lumiData = self.queryOrReuse("lumiData",[],self.parser.getLumiInfo,self.runNumber,self.lastLS,self.currentLS)
+        self.numBunches = self.queryOrReuse("numBunches",[0,0],self.parser.getNumberCollidingBunches,self.runNumber)
+        self.lastQueryRunNumber = self.runNumber
 
         # Calculate self.lumi_ave
         # TODO: Add avg deadtime and avg l1 rate calculations here
@@ -1141,12 +1169,8 @@ Plase check the rate of L1_HCAL_LaserMon_Veto and contact the HCAL DoC
 
             prescale = self.Rates[trigger][LS][1]
             rate = self.Rates[trigger][LS][0]
-            try:
-                deadTime = self.deadTimeData[LS]
-            except:
-                # Unable to get deadtime for some LS
-                deadTime = 0
-            if trigger[0:3] != "L1_": rate *= 1. + (deadTime/100.)
+            # The LS without deadtime aren't corrected
+            if trigger[0:3] != "L1_": rate *= self.deadTimeCorrection.getFactor(LS)
             if prescale > 0: properAvePSRate += rate/prescale
             else: properAvePSRate += rate
             aveRate += rate
@@ -1238,12 +1262,6 @@ Plase check the rate of L1_HCAL_LaserMon_Veto and contact the HCAL DoC
 
     # Use: Checks for bad triggers
     def checkForBadTriggers(self):
-        # Check if physActive is true or false
-        physActive = False
-        for LS, instLumi, psi, physics, all_subSys_good, pileup in self.lumiData:
-            if not instLumi is None and physics:
-                physActive = True
-                break
         for trigger, data in self.Rates.items():
 
             # Check if there is a non-default value for trigger threshold in the configuration file and set thresholds accordingly
@@ -1278,12 +1296,8 @@ Plase check the rate of L1_HCAL_LaserMon_Veto and contact the HCAL DoC
                 elif LS < self.lastLS or LS > self.currentLS: continue
                 prescale = data[LS][1]
                 rate = data[LS][0]
-                try:
-                    deadTime = self.deadTimeData[LS]
-                except:
-                    # Unable to get deadtime for some LS
-                    deadTime = 0
-                if trigger[0:3] != "L1_": rate *= 1. + (deadTime/100.)
+                # The LS without deadtime aren't corrected
+                if trigger[0:3] != "L1_": rate *= self.deadTimeCorrection.getFactor(LS)
                 if prescale > 0: properAvePSRate += rate/prescale
                 else: properAvePSRate += rate
                 aveRate += rate
@@ -1343,12 +1357,6 @@ Plase check the rate of L1_HCAL_LaserMon_Veto and contact the HCAL DoC
 
     # Use: Checks for bad streams
     def checkForBadStreams(self):
-        physActive = False
-        for LS, instLumi, psi, physics, all_subSys_good, pileup in self.lumiData:
-            if not instLumi is None and physics:
-                physActive = True
-                break
-        
         # loop through streams and if the rate is exceeding the threshold, add to the badDatasets dictionary
         for name in self.streamData.keys():
             empty_threshold = False
@@ -1370,12 +1378,6 @@ Plase check the rate of L1_HCAL_LaserMon_Veto and contact the HCAL DoC
         
     # Use: Checks for bad streams
     def checkForBadDatasets(self):
-        physActive = False
-        for LS, instLumi, psi, physics, all_subSys_good, pileup in self.lumiData:
-            if not instLumi is None and physics:
-                physActive = True
-                break
-
         # loop through datasets and if the rate is exceeding the threshold, add to the badDatasets dictionary
         for name in self.pdData.keys():
             empty_threshold = False
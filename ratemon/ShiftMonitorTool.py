@@ -25,6 +25,8 @@ import getopt
 import array
 # For the ShiftMonitor tool
 from ShiftMonitorNCR import *
+import OMSClient
+import OMSArchive
 
 accessPrometheus_ = False
 try:
@@ -40,7 +42,8 @@ class CommandLineParser:
             opt, args = getopt.getopt(sys.argv[1:],"",["Help", "fitFile=", "configFile=", "triggerList=",
                                                        "LSRange=", "displayBad=", "allowedPercDiff=", "allowedDev=", "window=","keepZeros",
                                                        "quiet", "noColors", "alertsOn", "mattermostAlertsOn", "audioAlertsOn", "usePerDiff", "hideStreams",
-                                                       "maxStream=", "maxHLTRate=", "maxL1Rate=","simulate=", "oldParser"])
+                                                       "maxStream=", "maxHLTRate=", "maxL1Rate=","simulate=", "oldParser",
+                                                       "recordOMS=", "replayOMS="])
         except:
             print("Error getting options. Exiting.")
             sys.exit(1)
@@ -110,6 +113,10 @@ class CommandLineParser:
                 self.monitor.maxHLTRate = float(op)
             elif label == "--maxL1Rate":
                 self.monitor.maxL1Rate = float(op)
+            elif label == "--recordOMS":
+                OMSClient.useArchive(str(op),OMSArchive.RECORD)
+            elif label == "--replayOMS":
+                OMSClient.useArchive(str(op),OMSArchive.REPLAY)
             elif label == "--Help":
                 self.printOptions()
         #self.monitor.printProperties()
@@ -147,6 +154,8 @@ class CommandLineParser:
         print("Secondary Capabilities:")
         print("--LSRange=<start>-<end>   : A range of LS to look at") #if we are using the --run=<num> option (you can actually use it any time, it just might not be useful)."
         print("--simulate=<num>          : Simulates online monitoring of run <num>.")
+        print("--recordOMS=<file>        : Records all the OMS responses to <file>.")
+        print("--replayOMS=<file>        : Replays the OMS responses recorded in <file> with --recordOMS, instead of querying OMS.")
         print("")
         print("Format Options:")
         print("--keepZeros               : By default, triggers with zero rate that we don't have fits for are not shown. This makes them visible.")
@@ -20,7 +20,8 @@ def getRatesROOT(runNumber: int, triggerKey: str):
             triggerList = [triggerKey],
             bestFit = True,
             data_lst = [runNumber],
-            runType = run_type
+            runType = run_type,
+            useRunCache = True
         )
 
     except NoDataError as e:
@@ -66,7 +67,8 @@ def getRatesJSON(runOrFillNumber: int, triggerKey: str, queryByFill: bool, creat
             fitFile = refFitVal,
             data_lst = [runOrFillNumber],
             runType = run_type,
-            useFills = queryByFill
+            useFills = queryByFill,
+            useRunCache = True
         )
     
     except NoDataError as e:
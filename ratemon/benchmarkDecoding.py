@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+#####################################################################
+# File: benchmarkDecoding.py
+#
+# Dependencies: DBParser.py, OMSDecoder.py
+#
+# Measures the time spent decoding the OMS responses of a run, with each
+# json decoder installed (see OMSDecoder.py), and how much the 'fields'
+# projection of the lumisections query saves compared to asking for all
+# the columns. The responses are fetched once (the OMS response cache is
+# disabled) and then decoded repeatedly.
+#
+# Usage: python3 benchmarkDecoding.py <run> [repetitions]
+#####################################################################
+
+import sys
+import time
+
+import DBParser
+import OMSDecoder
+
+# Use: Runs the getters used to parse a run, keeping the body of every response they receive
+# Returns: list of the response bodies, as bytes
+def recordResponses(parser, runNumber):
+    bodies = []
+    session_get = parser.executor.get
+    def recordingGet(*args, **kwargs):
+        response = session_get(*args, **kwargs)
+        bodies.append(response.content)
+        return response
+    parser.executor.get = recordingGet
+
+    parser.getHLTRates(runNumber)
+    parser.getL1Rates(runNumber)
+    parser.getLumiInfo(runNumber)
+    parser.getStreamData(runNumber)
+    parser.getPrimaryDatasets(runNumber)
+    parser.getDeadTime(runNumber)
+    parser.getL1rate(runNumber)
+
+    parser.executor.get = session_get
+    return bodies
+
+# Returns: The body of the lumisections query of a run, with only the columns used by getLumiInfo or with all of them
+def getLumisectionsBody(parser, runNumber, projected):
+    q = DBParser.omsapi.query("lumisections")
+    q.filter("run_number", runNumber)
+    if projected:
+        q.custom("fields", ",".join(["lumisection_number","init_lumi","physics_flag","beam1_present","pileup"] + DBParser.READY_FLAGS))
+    q.custom("include", "meta")
+    q.paginate(1, DBParser.PAGE_LIMIT)
+    return q.data().content
+
+# Returns: The best time, in seconds, to decode all the bodies with a decoder
+def timeDecoding(decode, bodies, repetitions):
+    best = None
+    for i in range(repetitions):
+        start = time.time()
+        for body in bodies:
+            decode(body)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 benchmarkDecoding.py <run> [repetitions]")
+        sys.exit(1)
+    run = int(sys.argv[1])
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    parser = DBParser.DBParser()
+    parser.cache = None
+
+    bodies = recordResponses(parser, run)
+    n_bytes = sum([len(body) for body in bodies])
+    print("Run %d: %d responses, %.1f MB" % (run, len(bodies), n_bytes/1e6))
+
+    print("%-20s %12s" % ("decoder", "time (ms)"))
+    times = {}
+    for name in OMSDecoder.DECODERS:
+        if name not in OMSDecoder.available:
+            print("%-20s %12s" % (name, "not installed"))
+            continue
+        times[name] = timeDecoding(OMSDecoder.available[name], bodies, repetitions)
+        print("%-20s %12.2f" % (name, times[name]*1000))
+    best = min(times, key=times.get)
+    print("Decode time saved per run with %s: %.2f ms (%.1fx)" % (best, (times["json"]-times[best])*1000,
+                                                                  times["json"]/times[best] if times[best] > 0 else 1.))
+
+    full = getLumisectionsBody(parser, run, False)
+    projected = getLumisectionsBody(parser, run, True)
+    decode = OMSDecoder.available[OMSDecoder.decoder_name]
+    full_time = timeDecoding(decode, [full], repetitions)
+    projected_time = timeDecoding(decode, [projected], repetitions)
+    print("lumisections, all columns:   %8.1f kB %8.2f ms" % (len(full)/1e3, full_time*1000))
+    print("lumisections, used columns:  %8.1f kB %8.2f ms" % (len(projected)/1e3, projected_time*1000))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+#####################################################################
+# File: benchmarkStreamData.py
+#
+# Dependencies: DBParser.py
+#
+# Compares the time and number of OMS requests of DBParser.getStreamData
+# (one paginated range query per run) with the old implementation,
+# which sent one 'streams' query per lumisection, and checks that both
+# return the same data. The OMS response cache is disabled for both.
+#
+# Usage: python3 benchmarkStreamData.py <run> [minLS] [maxLS] [repetitions]
+#####################################################################
+
+import sys
+import time
+
+import DBParser
+
+# The old implementation of DBParser.getStreamData, one query per LS until a LS has no data
+# Note: maxLS is excluded from the range
+def getStreamDataPerLS(parser, runNumber, minLS=-1, maxLS=9999999):
+    StreamData = {}
+    if minLS < 1:
+        minLS = 1
+    for LS in range(minLS, maxLS):
+        q = DBParser.omsapi.query("streams")
+        q.per_page=DBParser.PAGE_LIMIT
+        q.filter("run_number", runNumber)
+        q.filter("last_lumisection_number", LS)
+        q.custom("fields", "last_lumisection_number,rate,file_size,bandwidth,stream_name")
+        response = parser.fetch(q)['data']
+        if response == []:
+            break
+        for item in response:
+            stream_name = item['attributes']['stream_name']
+            if stream_name not in StreamData:
+                StreamData[stream_name] = []
+            StreamData[stream_name].append([item['attributes']['last_lumisection_number'],
+                                            item['attributes']['rate'],
+                                            item['attributes']['file_size']*1000000000,
+                                            item['attributes']['bandwidth']*1000000])
+    return StreamData
+
+# Use: Runs a function several times, counting the HTTP requests it sends
+# Returns: (best time in seconds, requests per call, result of the last call)
+def benchmark(parser, function, repetitions):
+    n_requests = [0]
+    session_get = parser.executor.get
+    def countingGet(*args, **kwargs):
+        n_requests[0] += 1
+        return session_get(*args, **kwargs)
+    parser.executor.get = countingGet
+
+    best = None
+    result = None
+    for i in range(repetitions):
+        start = time.time()
+        result = function()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    parser.executor.get = session_get
+    return best, n_requests[0]/float(repetitions), result
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 benchmarkStreamData.py <run> [minLS] [maxLS] [repetitions]")
+        sys.exit(1)
+    run = int(sys.argv[1])
+    minLS = int(sys.argv[2]) if len(sys.argv) > 2 else -1
+    maxLS = int(sys.argv[3]) if len(sys.argv) > 3 else 9999999
+    repetitions = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+
+    parser = DBParser.DBParser()
+    parser.cache = None
+
+    old_time, old_requests, old_data = benchmark(parser, lambda: getStreamDataPerLS(parser, run, minLS, maxLS+1), repetitions)
+    new_time, new_requests, new_data = benchmark(parser, lambda: parser.getStreamData(run, minLS, maxLS), repetitions)
+
+    n_rows = sum([len(rows) for rows in new_data.values()])
+    print("Run %d: %d streams, %d rows" % (run, len(new_data), n_rows))
+    print("%-20s %10s %10s" % ("", "time (s)", "requests"))
+    print("%-20s %10.3f %10.1f" % ("one query per LS", old_time, old_requests))
+    print("%-20s %10.3f %10.1f" % ("range query", new_time, new_requests))
+    if new_time > 0:
+        print("Speed-up: %.1fx" % (old_time/new_time))
+    if old_data == new_data:
+        print("Both implementations return the same data")
+    else:
+        print("WARNING: the two implementations return different data (the old one stops at the first LS without data)")
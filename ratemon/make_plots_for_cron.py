@@ -60,6 +60,7 @@ def main():
         data_lst       = run_lst,
         runType        = run_type,
         cronJob        = True, 
+        useRunCache    = True,
         fitFile        = "/opt/ratemon/Fits/{runType}/referenceFits_{runType}_all.pkl".format(runType = run_type)
     )
 
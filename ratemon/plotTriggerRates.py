@@ -19,6 +19,12 @@ import yaml
 import sys
 
 import DBParser
+import DataParser
+import OMSClient
+import OMSArchive
+import OMSCache
+import RunCache
+from LumiSections import IntervalSet
 from RateMonitor import *
 from Exceptions import *
 
@@ -63,7 +69,12 @@ class MonitorController:
             "makeTitle"        : None,
             "exportJson"       : None,
             "allTriggers"      : None,
-            "plot_avgCS"       : None
+            "plot_avgCS"       : None,
+            "recordOMS="       : None,
+            "replayOMS="       : None,
+            "runWorkers="      : None,
+            "useRunCache"      : None,
+            "useOMSCache"      : None
         }
 
     # Set the default values for variables
@@ -95,6 +106,9 @@ class MonitorController:
         self.rate_monitor.data_parser.use_datasets = False
         self.rate_monitor.data_parser.use_L1A_rate = False
         self.rate_monitor.data_parser.use_cross_section  = self.rate_monitor.use_cross_section
+        self.rate_monitor.data_parser.run_cache = None
+        self.rate_monitor.data_parser.run_workers = DataParser.DEFAULT_RUN_WORKERS
+        self.rate_monitor.data_parser.parser.cache = None
 
         self.rate_monitor.fitter.use_best_fit = False
 
@@ -193,7 +207,7 @@ class MonitorController:
                     self.rate_monitor.plotter.show_eq     = True
 
                 elif op_name == "psFilter=":
-                    self.rate_monitor.data_parser.psi_filter = op_val
+                    self.rate_monitor.data_parser.psi_filter = IntervalSet.make(op_val)
                     self.rate_monitor.data_parser.use_ps_mask = True
 
                 elif op_name == "lsVeto=":
@@ -356,6 +370,18 @@ class MonitorController:
                 elif op_name == "showFitRunGroups":
                     self.rate_monitor.plotter.show_fit_run_groups = True
 
+                elif op_name == "runWorkers=":
+                    self.rate_monitor.data_parser.run_workers = op_val
+
+                elif op_name == "useRunCache":
+                    self.rate_monitor.data_parser.run_cache = RunCache.getCache()
+
+                elif op_name == "useOMSCache":
+                    self.rate_monitor.data_parser.parser.cache = OMSCache.getCache()
+
+                elif op_name == "recordOMS=" or op_name == "replayOMS=":
+                    pass    # The archive is set up by parseArgs, before any query is made
+
                 else:
                     print("Unimplemented option '%s'." % op_name)
                     return False
@@ -596,6 +622,28 @@ class MonitorController:
             elif label == "--plot_avgCS":
                 self.ops_dict["plot_avgCS"] = True
 
+            elif label == "--recordOMS":
+                # Record all the OMS responses to an archive, ex: '--recordOMS=run370000.oms.gz'
+                self.ops_dict["recordOMS="] = str(op)
+                OMSClient.useArchive(str(op),OMSArchive.RECORD)
+
+            elif label == "--replayOMS":
+                # Replay the OMS responses from an archive made with --recordOMS, instead of querying OMS
+                self.ops_dict["replayOMS="] = str(op)
+                OMSClient.useArchive(str(op),OMSArchive.REPLAY)
+
+            elif label == "--runWorkers":
+                # Number of runs fetched and parsed at the same time, ex: '--runWorkers=4' (by default they are parsed one after the other)
+                self.ops_dict["runWorkers="] = max(1,int(op))
+
+            elif label == "--useRunCache":
+                # Read the runs already parsed with the same options from the run cache, and store the ones which have ended in it
+                self.ops_dict["useRunCache"] = True
+
+            elif label == "--useOMSCache":
+                # Keep the OMS responses of single runs in the local OMS cache, and read them back from it
+                self.ops_dict["useOMSCache"] = True
+
             else:
                 print("Unimplemented option '%s'." % label)
                 return False
@@ -702,9 +750,7 @@ class MonitorController:
         json_data = json.load(json_file)
         ls_veto = {}
         for run_number in json_data:
-            ls_veto[int(run_number)] = []
-            for ls_low,ls_high in json_data[run_number]:
-                ls_veto[int(run_number)] += [x for x in range(ls_low,ls_high+1)]
+            ls_veto[int(run_number)] = IntervalSet(json_data[run_number])     # [[ls_low,ls_high]]
         return ls_veto
 
     # Gets the runs from each fill specified in arg_list
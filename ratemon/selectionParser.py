@@ -1,33 +1,26 @@
 import json
+from LumiSections import IntervalSet
 class selectionParser(object):
     def __init__(self,selectStr):
         self.__result={}
-        self.__strresult={}
         strresult=json.loads(selectStr)
         for k,v in list(strresult.items()):
-            expandedvalues=[]
-            for w in v:
-            ###weed out [10]-like stuff just in case they exist
-                if len(w)==1:
-                    expandedvalues.append(w[0])
-            ##weed out [10,10]-like stuff
-                elif len(w)==2 and w[0]==w[1]:
-                    expandedvalues.append(w[0])
-                else:
-                    for i in range(w[0],w[1]+1):
-                        expandedvalues.append(i)
-            self.__result[int(k)]=expandedvalues
-            self.__strresult[k]=[str(x) for x in expandedvalues]
+            ###[10]-like and [10,10]-like stuff are single LS ranges, overlapping ranges are merged
+            self.__result[int(k)]=IntervalSet(v)
     def runs(self):
         return list(self.__result.keys())
     def runsandls(self):
         '''return expanded {run:lslist}
         '''
-        return self.__result
+        return dict([(run,list(ls)) for run,ls in self.__result.items()])
     def runsandlsStr(self):
         '''return expanded {'run':lslist}
         '''
-        return self.__strresult
+        return dict([(str(run),[str(x) for x in ls]) for run,ls in self.__result.items()])
+    def runsandintervals(self):
+        '''return {run:IntervalSet}, without expanding the ranges
+        '''
+        return self.__result
     def numruns(self):
         return len(list(self.__result.keys()))
     def numls(self,run):
@@ -37,5 +30,6 @@ if __name__ == "__main__":
     print('runs : ',s.runs())
     print('full result : ',s.runsandls())
     print('str result : ',s.runsandlsStr())
+    print('interval result : ',s.runsandintervals())
     print('num runs : ',s.numruns())
     print('numls in run : ',s.numls(1))
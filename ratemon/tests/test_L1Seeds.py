@@ -0,0 +1,132 @@
+#####################################################################
+# File: test_L1Seeds.py
+#
+# Unit tests of L1Seeds.py, the effective L1 prescales of the seed
+# expressions are checked against UnwindORSeed, the way DBParser worked
+# them out before the seeds were compiled per L1 menu.
+#
+# Usage: python3 -m unittest discover -s ratemon/tests
+#####################################################################
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+from L1Seeds import SeedExpression, SeedPrescaleCache, compilePrescales
+
+L1IndexNameMap = {"L1_A": 0, "L1_B": 1, "L1_C": 2, "L1_Off": 3}
+L1Prescales = {     # {algo_index: {psi: prescale}}
+    0: {0: 1, 1: 10, 2: 0},
+    1: {0: 5, 1: 2, 2: 0},
+    2: {0: 100, 1: 0, 2: 3},
+    3: {0: 0, 1: 0, 2: 0},
+}
+N_COLUMNS = 3
+
+# Returns: The effective prescale of the OR of several seeds, as DBParser.UnwindORSeed worked it out
+def unwindORSeed(expression,L1Prescales,L1IndexNameMap,psi):
+    # type: (str,Dict[int,Dict[int,float]],Dict[str,int],int) -> float
+    if expression.find(" AND ") != -1:
+        return 1
+    seedList = []
+    if expression.find(" OR ") != -1:
+        for elem in expression.split(" OR "):
+            seedList.append(elem.replace(" ",""))
+    else:
+        expression = expression.replace(" ","")
+        seedList.append(expression)
+    minPS = 99999999999
+    for seed in seedList:
+        if seed not in L1IndexNameMap:
+            continue
+        ps = L1Prescales[L1IndexNameMap[seed]][psi]
+        if ps: minPS = min(ps,minPS)
+
+    if minPS == 99999999999: return 0
+    else: return minPS
+
+class TestSeedExpression(unittest.TestCase):
+    def test_seeds(self):
+        expression = SeedExpression("L1_A OR (L1_B AND NOT L1_C)")
+        self.assertEqual(expression.getSeeds(),["L1_A","L1_B","L1_C"])
+        self.assertEqual(expression.tree,("OR",[("SEED","L1_A"),("AND",[("SEED","L1_B"),("NOT",[("SEED","L1_C")])])]))
+
+    def test_precedence(self):
+        # AND binds tighter than OR
+        self.assertEqual(SeedExpression("L1_A OR L1_B AND L1_C").tree,
+                         ("OR",[("SEED","L1_A"),("AND",[("SEED","L1_B"),("SEED","L1_C")])]))
+
+    def test_invalid(self):
+        for expression in ["","L1_A OR","(L1_A","L1_A)","OR L1_A","L1_A AND AND L1_B"]:
+            with self.assertRaises(ValueError):
+                SeedExpression(expression)
+
+class TestCompilePrescales(unittest.TestCase):
+    def check(self,expression,expected):
+        prescales = compilePrescales(expression,L1Prescales,L1IndexNameMap)
+        self.assertEqual([prescales.get(psi) for psi in range(N_COLUMNS)],expected)
+
+    def test_matches_unwind(self):
+        # The single seeds and the ORs of seeds get the prescales they always had
+        expressions = [
+            "L1_A",
+            "L1_C",
+            "L1_Off",
+            "L1_A OR L1_B",
+            "L1_A OR L1_B OR L1_C",
+            "L1_B OR L1_C",
+            "L1_Off OR L1_C",
+            "L1_A OR L1_NotInMenu",
+            "L1_NotInMenu",
+        ]
+        for expression in expressions:
+            prescales = compilePrescales(expression,L1Prescales,L1IndexNameMap)
+            for psi in range(N_COLUMNS):
+                self.assertEqual(prescales.get(psi),unwindORSeed(expression,L1Prescales,L1IndexNameMap,psi),
+                                 "%s in column %d" % (expression,psi))
+
+    def test_or(self):
+        # The lowest non-zero prescale, 0 if every seed is disabled
+        self.check("L1_A OR L1_B",[1,2,0])
+        self.check("L1_Off OR L1_B",[5,2,0])
+
+    def test_and(self):
+        # The product of the prescales, 0 if any seed is disabled
+        self.check("L1_A AND L1_B",[5,20,0])
+        self.check("L1_B AND L1_C",[500,0,0])
+        self.check("L1_A AND L1_NotInMenu",[1,10,0])
+
+    def test_not(self):
+        self.check("NOT L1_C",[1,1,1])
+        self.check("L1_B AND NOT L1_C",[5,2,0])
+        self.check("L1_C OR (L1_A AND NOT L1_B)",[1,10,3])
+
+    def test_not_in_menu(self):
+        prescales = compilePrescales("L1_X OR L1_Y",L1Prescales,L1IndexNameMap)
+        self.assertTrue(prescales.constant)
+        self.assertEqual(prescales.get(0),0)
+        self.assertEqual(prescales.get(42),0)
+
+    def test_missing_column(self):
+        # UnwindORSeed raised for a column which a seed doesn't have, and the caller used a prescale of 1
+        prescales = compilePrescales("L1_A OR L1_B",{0: {0: 1, 1: 10}, 1: {0: 5}},L1IndexNameMap)
+        self.assertEqual(prescales.get(0),1)
+        self.assertEqual(prescales.get(1,1),1)
+        self.assertEqual(prescales.get(5,1),1)
+        self.assertIsNone(prescales.get(1))
+
+class TestSeedPrescaleCache(unittest.TestCase):
+    def test_get(self):
+        cache = SeedPrescaleCache()
+        first = cache.get(("menu",1),"L1_A OR L1_B",L1Prescales,L1IndexNameMap)
+        self.assertIs(cache.get(("menu",1),"L1_A OR L1_B",L1Prescales,L1IndexNameMap),first)
+        self.assertEqual((cache.hits,cache.misses),(1,1))
+        # Another menu, or no menu key, is compiled again
+        self.assertIsNot(cache.get(("menu",2),"L1_A OR L1_B",L1Prescales,L1IndexNameMap),first)
+        self.assertIsNot(cache.get(None,"L1_A OR L1_B",L1Prescales,L1IndexNameMap),first)
+        self.assertEqual((cache.hits,cache.misses),(1,2))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+#####################################################################
+# File: test_LumiSections.py
+#
+# Unit tests of LumiSections.py
+#
+# Usage: python3 -m unittest discover -s ratemon/tests
+#####################################################################
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+from LumiSections import IntervalSet, PrescaleColumnIndex
+
+class TestPrescaleColumnIndex(unittest.TestCase):
+    def setUp(self):
+        # Column 2 from LS 5, 1 from LS 20, back to 2 from LS 40
+        self.index = PrescaleColumnIndex([(20,1),(5,2),(40,2)])
+
+    def test_getColumn(self):
+        self.assertEqual([self.index.getColumn(LS) for LS in [5,19,20,39,40,1000]],[2,2,1,1,2,2])
+
+    def test_before_first_change(self):
+        # OMS may only record the column from the first LS it has data for
+        self.assertEqual(self.index.getColumn(1),2)
+        self.assertEqual(self.index.getColumn(4,default=7),2)
+        self.assertEqual(self.index.getColumns([1,2,3]),[2,2,2])
+
+    def test_no_changes(self):
+        index = PrescaleColumnIndex()
+        self.assertEqual(len(index),0)
+        self.assertIsNone(index.getColumn(10))
+        self.assertEqual(index.getColumn(10,default=0),0)
+        self.assertEqual(index.getColumns([1,2],default=0),[0,0])
+        self.assertEqual(index.getColumns([]),[])
+        self.assertEqual(index.getRanges(),[])
+
+    def test_getColumns(self):
+        ls_list = [1,5,6,19,20,21,39,40,41]
+        expected = [self.index.getColumn(LS) for LS in ls_list]
+        self.assertEqual(self.index.getColumns(ls_list),expected)
+        # Unsorted LS give the same columns as the bisection
+        unsorted = [41,1,20,5,39,19,40,6,21]
+        self.assertEqual(self.index.getColumns(unsorted),[self.index.getColumn(LS) for LS in unsorted])
+
+    def test_changes(self):
+        # The column of every LS can be given, only the actual changes are kept
+        index = PrescaleColumnIndex([(LS,1 if LS < 10 else 3) for LS in range(1,20)])
+        self.assertEqual(len(index),2)
+        self.assertEqual(index.getRanges(),[(1,9,1),(10,None,3)])
+        self.assertEqual(self.index.getRanges(),[(5,19,2),(20,39,1),(40,None,2)])
+
+    def test_same_LS(self):
+        # Two changes in the same LS, the last one wins
+        index = PrescaleColumnIndex()
+        index.addChange(1,0)
+        index.addChange(10,1)
+        index.addChange(10,2)
+        self.assertEqual(index.getRanges(),[(1,9,0),(10,None,2)])
+        with self.assertRaises(ValueError):
+            index.addChange(5,3)
+
+class TestIntervalSet(unittest.TestCase):
+    def test_ranges(self):
+        # Unsorted, overlapping and touching ranges are merged, [value] is a single value, reversed ranges are empty
+        s = IntervalSet([[10,12],[1,3],[4,5],[11,20],[30],[40,35]])
+        self.assertEqual(s.getRanges(),[(1,5),(10,20),(30,30)])
+        self.assertEqual(len(s),17)
+        self.assertEqual(list(s),list(range(1,6))+list(range(10,21))+[30])
+        self.assertEqual(IntervalSet.fromValues([3,1,2,7]),IntervalSet([[1,3],[7,7]]))
+
+    def test_contains(self):
+        s = IntervalSet([[1,5],[10,20]])
+        self.assertEqual([x in s for x in [0,1,5,6,9,10,20,21]],[False,True,True,False,False,True,True,False])
+
+    def test_contains_none(self):
+        # The psi of the LS whose prescale column isn't known is None, it is in no set of columns
+        s = IntervalSet.make([1,2])
+        self.assertNotIn(None,s)
+        self.assertNotIn("1",s)
+        self.assertNotIn(None,IntervalSet())
+
+    def test_getMask(self):
+        s = IntervalSet([[1,5],[10,20],[30,30]])
+        self.assertEqual(s.getMask([0,1,5,6,10,25,30,31]),[False,True,True,False,True,False,True,False])
+        values = list(range(0,35))
+        self.assertEqual(s.getMask(values),[x in s for x in values])
+        # Unsorted values fall back to the bisection
+        unsorted = [30,2,21,10,0,5,31,6,20]
+        self.assertEqual(s.getMask(unsorted),[x in s for x in unsorted])
+
+    def test_empty(self):
+        s = IntervalSet()
+        self.assertEqual(len(s),0)
+        self.assertFalse(s)
+        self.assertNotIn(1,s)
+        self.assertEqual(s.getMask([1,2,3]),[False,False,False])
+        self.assertEqual(s.getMask([]),[])
+        self.assertEqual(IntervalSet([[1,5]]).getMask([]),[])
+        self.assertEqual(IntervalSet.fromValues([]),s)
+
+    def test_make(self):
+        s = IntervalSet([[1,2]])
+        self.assertIs(IntervalSet.make(s),s)
+        self.assertIsNone(IntervalSet.make(None))
+        self.assertEqual(IntervalSet.make([2,1]),s)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+#####################################################################
+# File: test_OMSArchive.py
+#
+# Unit tests of OMSArchive.py: the responses recorded through an
+# OMSExecutor to a temporary archive are replayed without network access
+#
+# Usage: python3 -m unittest discover -s ratemon/tests
+#####################################################################
+
+import os
+import sys
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+import OMSArchive
+import OMSExecutor
+
+URL = "http://oms/agg/api/v1/hltpathrates?filter[run_number][EQ]=370000&filter[path_name][EQ]=HLT_A&page[offset]=0"
+OTHER_URL = "https://cmsoms.cern.ch/agg/api/v1/hltpathrates?page[offset]=0&filter[path_name][EQ]=HLT_A&filter[run_number][EQ]=370000"
+
+class FakeResponse:
+    def __init__(self,status_code,text):
+        self.status_code = status_code
+        self.text = text
+
+# Stands in for the HTTP session of the executor, answers each url with the next of its responses
+class FakeSession:
+    def __init__(self,responses):
+        self.responses = responses  # {url: [FakeResponse]}
+        self.calls = []
+
+    def get(self,url,**kwargs):
+        self.calls.append(url)
+        return self.responses[url].pop(0)
+
+# Stands in for the HTTP session while replaying, any request is an error
+class OfflineSession:
+    def get(self,url,**kwargs):
+        raise AssertionError("Request sent during a replay: %s" % url)
+
+def makeText(rate):
+    # type: (float) -> str
+    return json.dumps({"data": [{"attributes": {"first_lumisection_number": 1, "rate": rate}}]})
+
+class TestOMSArchive(unittest.TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree,self.archive_dir)
+        self.path = os.path.join(self.archive_dir,"run370000.oms.gz")
+
+    def makeExecutor(self,session,mode):
+        executor = OMSExecutor.OMSExecutor(1)
+        executor.session = session
+        executor.archive = OMSArchive.OMSArchive(self.path,mode)
+        self.addCleanup(executor.archive.close)
+        return executor
+
+    # Returns: The (status_code, text) of the responses recorded while getting the urls
+    def record(self,urls,responses):
+        executor = self.makeExecutor(FakeSession(responses),OMSArchive.RECORD)
+        recorded = [executor.get(url) for url in urls]
+        executor.archive.close()
+        self.assertEqual(executor.archive.n_recorded,len(urls))
+        return [(r.status_code,r.text) for r in recorded]
+
+    def test_round_trip(self):
+        recorded = self.record([URL],{URL: [FakeResponse(200,makeText(1.))]})
+        executor = self.makeExecutor(OfflineSession(),OMSArchive.REPLAY)
+        response = executor.get(URL)
+        self.assertEqual((response.status_code,response.text),recorded[0])
+        self.assertEqual(response.json(),json.loads(makeText(1.)))
+        self.assertEqual(response.content,recorded[0][1].encode())
+        # The same query through another OMS url, with the parameters in another order
+        self.assertEqual(executor.get(OTHER_URL).text,recorded[0][1])
+
+    def test_order(self):
+        # The responses to the same query are replayed in the order they were recorded, the last one is repeated
+        responses = [FakeResponse(200,makeText(1.)),FakeResponse(404,"not found"),FakeResponse(200,makeText(2.))]
+        recorded = self.record([URL,URL,URL],{URL: responses})
+        executor = self.makeExecutor(OfflineSession(),OMSArchive.REPLAY)
+        replayed = [executor.get(URL) for i in range(4)]
+        self.assertEqual([(r.status_code,r.text) for r in replayed],recorded+recorded[-1:])
+
+    def test_append(self):
+        # Another recording session is appended to the archive
+        self.record([URL],{URL: [FakeResponse(200,makeText(1.))]})
+        other = URL.replace("HLT_A","HLT_B")
+        self.record([other],{other: [FakeResponse(200,makeText(2.))]})
+        executor = self.makeExecutor(OfflineSession(),OMSArchive.REPLAY)
+        self.assertEqual(executor.get(URL).text,makeText(1.))
+        self.assertEqual(executor.get(other).text,makeText(2.))
+
+    def test_missing(self):
+        self.record([URL],{URL: [FakeResponse(200,makeText(1.))]})
+        archive = OMSArchive.OMSArchive(self.path,OMSArchive.REPLAY)
+        response = archive.replay(URL.replace("HLT_A","HLT_B"))
+        self.assertEqual(response.status_code,404)
+        self.assertNotIn("data",response.json())
+        self.assertEqual(len(archive.missing),1)
+
+    def test_truncated(self):
+        # An interrupted recording keeps the complete lines
+        self.record([URL],{URL: [FakeResponse(200,makeText(1.))]})
+        with gzip.open(self.path,"at") as f:
+            f.write('{"key": "hltpathrates?')
+        archive = OMSArchive.OMSArchive(self.path,OMSArchive.REPLAY)
+        self.assertEqual(archive.replay(URL).text,makeText(1.))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            OMSArchive.OMSArchive(self.path,"rewind")
+        with self.assertRaises(IOError):
+            OMSArchive.OMSArchive(self.path,OMSArchive.REPLAY)
+
+    def test_fromEnvironment(self):
+        patcher = mock.patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ["RATEMON_OMS_RECORD","RATEMON_OMS_REPLAY"]:
+            os.environ.pop(name,None)
+        self.assertIsNone(OMSArchive.fromEnvironment())
+        os.environ["RATEMON_OMS_RECORD"] = self.path
+        archive = OMSArchive.fromEnvironment()
+        archive.close()
+        self.assertFalse(archive.isReplaying())
+        os.environ["RATEMON_OMS_REPLAY"] = self.path
+        self.assertTrue(OMSArchive.fromEnvironment().isReplaying())
+
+if __name__ == "__main__":
+    unittest.main()
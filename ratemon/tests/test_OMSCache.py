@@ -0,0 +1,117 @@
+#####################################################################
+# File: test_OMSCache.py
+#
+# Unit tests of OMSCache.py, in a temporary cache directory
+#
+# Usage: python3 -m unittest discover -s ratemon/tests
+#####################################################################
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+from OMSCache import OMSCache, getResource, getRunNumber
+
+BASE_URL = "http://oms/agg/api/v1/hltpathrates"
+
+# Returns: The url of an hltpathrates query of a run
+def makeUrl(run,path="HLT_A"):
+    # type: (int,str) -> str
+    return "%s?filter[run_number][EQ]=%d&filter[path_name][EQ]=%s&page[offset]=0" % (BASE_URL,run,path)
+
+def makeResponse(n):
+    # type: (int) -> Dict[str,object]
+    return {"data": [{"attributes": {"first_lumisection_number": LS, "rate": float(n*LS)}} for LS in range(1,21)]}
+
+class TestOMSCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree,self.cache_dir)
+
+    def test_round_trip(self):
+        cache = OMSCache(self.cache_dir)
+        url = makeUrl(370000)
+        self.assertIsNone(cache.get(url))
+        cache.put(url,makeResponse(1),370000)
+        self.assertEqual(cache.get(url),makeResponse(1))
+        self.assertEqual((cache.hits,cache.misses),(1,1))
+        # Another cache object on the same directory finds the entry
+        self.assertEqual(OMSCache(self.cache_dir).get(url),makeResponse(1))
+        self.assertIsNone(cache.get(makeUrl(370000,"HLT_B")))
+
+    def test_key(self):
+        cache = OMSCache(self.cache_dir)
+        url = makeUrl(370000)
+        key = cache.makeKey(url)
+        self.assertEqual(len(key),64)   # sha256
+        self.assertTrue(cache.getPath(key).startswith(os.path.join(self.cache_dir,key[:2],key)))
+        # The order of the parameters doesn't matter
+        reordered = "%s?filter[path_name][EQ]=HLT_A&page[offset]=0&filter[run_number][EQ]=370000" % BASE_URL
+        self.assertEqual(cache.makeKey(reordered),key)
+        self.assertNotEqual(cache.makeKey(makeUrl(370001)),key)
+        self.assertEqual(getRunNumber(url),370000)
+        self.assertIsNone(getRunNumber(BASE_URL+"?filter[fill_number][EQ]=9000"))
+        self.assertEqual(getResource(url),"hltpathrates")
+
+    def test_ongoing_expires(self):
+        cache = OMSCache(self.cache_dir,ongoing_ttl=0.05)
+        url = makeUrl(370000)
+        cache.put(url,makeResponse(1),370000)
+        self.assertIsNotNone(cache.get(url))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get(url))
+        self.assertEqual(cache.listEntries(),[])     # The expired entry is removed
+
+    def test_ended_never_expires(self):
+        cache = OMSCache(self.cache_dir,ongoing_ttl=0.05)
+        cache.setRunEnded(370000)
+        cache.put(makeUrl(370000),makeResponse(1),370000)
+        cache.put(makeUrl(370001),makeResponse(2),370001)
+        time.sleep(0.1)
+        self.assertEqual(cache.get(makeUrl(370000)),makeResponse(1))
+        self.assertIsNone(cache.get(makeUrl(370001)))
+        # The ended runs are kept in the cache directory
+        reopened = OMSCache(self.cache_dir,ongoing_ttl=0.05)
+        self.assertTrue(reopened.isRunEnded(370000))
+        self.assertFalse(reopened.isRunEnded(370001))
+        self.assertEqual(reopened.get(makeUrl(370000)),makeResponse(1))
+
+    def test_entries_before_end_expire(self):
+        # An entry written while its run was going on still expires once the run has ended
+        cache = OMSCache(self.cache_dir,ongoing_ttl=0.05)
+        cache.put(makeUrl(370000),makeResponse(1),370000)
+        cache.setRunEnded(370000)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get(makeUrl(370000)))
+
+    def test_eviction(self):
+        cache = OMSCache(self.cache_dir)
+        urls = [makeUrl(370000,path) for path in ["HLT_A","HLT_B","HLT_C","HLT_D"]]
+        for url in urls[:3]:
+            cache.put(url,makeResponse(1),370000)
+        paths = [cache.getPath(cache.makeKey(url)) for url in urls]
+        for i, path in enumerate(paths[:3]):
+            os.utime(path,(1000.*(i+1),1000.*(i+1)))
+        # Reading HLT_A makes it the most recently used entry, HLT_B is now the least recently used one
+        self.assertIsNotNone(cache.get(urls[0]))
+        size = os.path.getsize(paths[0])
+        cache.max_bytes = int(3.5*size)
+        cache.put(urls[3],makeResponse(1),370000)
+        self.assertEqual([os.path.exists(path) for path in paths],[True,False,True,True])
+        self.assertLessEqual(cache.total_bytes,0.9*cache.max_bytes)
+
+    def test_purge(self):
+        cache = OMSCache(self.cache_dir)
+        cache.put(makeUrl(370000),makeResponse(1),370000)
+        cache.put(makeUrl(370001),makeResponse(1),370001)
+        self.assertEqual(cache.purge(runNumber=370000),1)
+        self.assertIsNone(cache.get(makeUrl(370000)))
+        self.assertIsNotNone(cache.get(makeUrl(370001)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+#####################################################################
+# File: test_OMSExecutor.py
+#
+# Unit tests of the retries, latency budgets and hedging of the OMS
+# requests in OMSExecutor.py, with fake requests instead of OMS
+#
+# Usage: python3 -m unittest discover -s ratemon/tests
+#####################################################################
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+import requests
+
+import OMSExecutor
+import OMSLatency
+
+RESOURCE = "hltpathrates"
+
+class FakeResponse:
+    def __init__(self,status_code=200,text=""):
+        self.status_code = status_code
+        self.text = text
+
+# A request which fails (raises, or returns a 50x) the first n_failures times it is sent
+class FakeSend:
+    def __init__(self,n_failures,failure=requests.exceptions.ConnectionError):
+        self.n_failures = n_failures
+        self.failure = failure
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self,timeout):
+        with self.lock:
+            self.calls += 1
+            calls = self.calls
+        if calls > self.n_failures:
+            return FakeResponse()
+        if isinstance(self.failure,int):
+            return FakeResponse(self.failure)
+        raise self.failure("failure %d" % calls)
+
+class TestRetries(unittest.TestCase):
+    def setUp(self):
+        self.backoff_base = OMSExecutor.BACKOFF_BASE
+        OMSExecutor.BACKOFF_BASE = 0.001    # Don't wait for the backoff
+        self.executor = OMSExecutor.OMSExecutor(2)
+        self.executor.configureLatency(budget=10.,max_retries=2)
+
+    def tearDown(self):
+        OMSExecutor.BACKOFF_BASE = self.backoff_base
+
+    def getEndpoint(self):
+        return self.executor.latency.getEndpoint(RESOURCE)
+
+    def test_success(self):
+        send = FakeSend(0)
+        self.assertEqual(self.executor.sendWithRetries(RESOURCE,send).status_code,200)
+        self.assertEqual(send.calls,1)
+        self.assertEqual(self.getEndpoint().n_requests,1)
+
+    def test_retry(self):
+        send = FakeSend(2)
+        self.assertEqual(self.executor.sendWithRetries(RESOURCE,send).status_code,200)
+        self.assertEqual(send.calls,3)
+        self.assertEqual(self.getEndpoint().n_retries,2)
+        self.assertEqual(self.getEndpoint().n_errors,2)
+
+    def test_timeout_retry(self):
+        send = FakeSend(1,requests.exceptions.ReadTimeout)
+        self.assertEqual(self.executor.sendWithRetries(RESOURCE,send).status_code,200)
+        self.assertEqual(send.calls,2)
+        self.assertEqual(self.getEndpoint().n_timeouts,1)
+
+    def test_max_retries(self):
+        send = FakeSend(10)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.executor.sendWithRetries(RESOURCE,send)
+        self.assertEqual(send.calls,3)
+
+    def test_retry_status(self):
+        # A 503 is retried, and returned as it is once there are no retries left
+        send = FakeSend(1,503)
+        self.assertEqual(self.executor.sendWithRetries(RESOURCE,send).status_code,200)
+        send = FakeSend(10,503)
+        self.assertEqual(self.executor.sendWithRetries(RESOURCE,send).status_code,503)
+        self.assertEqual(send.calls,3)
+        # Other errors aren't retried
+        send = FakeSend(10,404)
+        self.assertEqual(self.executor.sendWithRetries(RESOURCE,send).status_code,404)
+        self.assertEqual(send.calls,1)
+
+    def test_budget(self):
+        # The backoff before the retry would end after the budget of the endpoint, the call gives up
+        OMSExecutor.BACKOFF_BASE = 1.
+        self.executor.configureLatency(budgets={RESOURCE: 0.2},max_retries=5)
+        send = FakeSend(10,requests.exceptions.ReadTimeout)
+        start = time.time()
+        with self.assertRaises(OMSExecutor.OMSBudgetExceeded):
+            self.executor.sendWithRetries(RESOURCE,send)
+        self.assertEqual(send.calls,1)
+        self.assertLess(time.time() - start,0.2)
+        self.assertEqual(self.executor.getBudget("lumisections"),10.)
+
+    def test_budget_timeout(self):
+        # Each request only gets the time left in the budget
+        timeouts = []
+        def send(timeout):
+            timeouts.append(timeout)
+            return FakeResponse()
+        self.executor.configureLatency(timeout=30.,budgets={RESOURCE: 2.})
+        self.executor.sendWithRetries(RESOURCE,send)
+        self.assertLessEqual(timeouts[0][1],2.)
+
+class TestHedging(unittest.TestCase):
+    def setUp(self):
+        self.executor = OMSExecutor.OMSExecutor(2)
+        self.executor.configureLatency(hedge=True)
+        # The p95 latency of the endpoint is 50 ms
+        for i in range(OMSLatency.MIN_SAMPLES):
+            self.executor.latency.record(RESOURCE,0.05)
+
+    # Returns: A request whose first sending takes first_delay seconds, and the second one second_delay seconds
+    def makeSend(self,first_delay,second_delay):
+        calls = []
+        lock = threading.Lock()
+        def send(timeout):
+            with lock:
+                calls.append(timeout)
+                n = len(calls)
+            time.sleep(first_delay if n == 1 else second_delay)
+            return FakeResponse(text="request %d" % n)
+        return send, calls
+
+    def test_first_wins(self):
+        send, calls = self.makeSend(1.,0.)
+        start = time.time()
+        response = self.executor.sendHedged(RESOURCE,send,(5.,30.))
+        self.assertEqual(response.text,"request 2")
+        self.assertEqual(len(calls),2)
+        self.assertLess(time.time() - start,0.9)
+        self.assertEqual(self.executor.latency.getEndpoint(RESOURCE).n_hedged,1)
+
+    def test_fast_request(self):
+        # A request faster than the p95 latency isn't hedged
+        send, calls = self.makeSend(0.,0.)
+        self.assertEqual(self.executor.sendHedged(RESOURCE,send,(5.,30.)).text,"request 1")
+        self.assertEqual(len(calls),1)
+
+    def test_no_hedge(self):
+        self.executor.configureLatency(hedge=False)
+        send, calls = self.makeSend(0.2,0.)
+        self.assertEqual(self.executor.sendHedged(RESOURCE,send,(5.,30.)).text,"request 1")
+        self.assertEqual(len(calls),1)
+
+    def test_unknown_latency(self):
+        # Too few requests to know the p95 latency of the endpoint
+        send, calls = self.makeSend(0.2,0.)
+        self.assertEqual(self.executor.sendHedged("lumisections",send,(5.,30.)).text,"request 1")
+        self.assertEqual(len(calls),1)
+
+    def test_failed_first(self):
+        # The hedged request still wins if the first one fails
+        calls = []
+        def send(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                time.sleep(0.1)
+                raise requests.exceptions.ConnectionError("failure")
+            time.sleep(0.2)
+            return FakeResponse(text="request 2")
+        self.assertEqual(self.executor.sendHedged(RESOURCE,send,(5.,30.)).text,"request 2")
+
+if __name__ == "__main__":
+    unittest.main()
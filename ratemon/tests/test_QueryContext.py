@@ -0,0 +1,137 @@
+#####################################################################
+# File: test_QueryContext.py
+#
+# Unit tests of the per-cycle deduplication of the OMS queries in
+# QueryContext.py, with fake fetchers instead of OMS
+#
+# Usage: python3 -m unittest discover -s ratemon/tests
+#####################################################################
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+from QueryContext import QueryContext
+
+URL = "http://oms/agg/api/v1/hltpathrates?filter[run_number][EQ]=370000"
+
+# A fetcher which counts its calls, and fails (raises, or returns an OMS error) the first n_failures times
+class FakeFetcher:
+    def __init__(self,n_failures=0,failure=None):
+        self.n_failures = n_failures
+        self.failure = failure
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls > self.n_failures:
+            return {"data": [{"attributes": {"rate": float(self.calls)}}]}
+        if self.failure is None:
+            return {"errors": [{"status": "500"}]}
+        raise self.failure("failure %d" % self.calls)
+
+class TestQueryContext(unittest.TestCase):
+    def test_dedup(self):
+        context = QueryContext("cycle")
+        fetcher = FakeFetcher()
+        first = context.fetch(URL,fetcher)
+        self.assertIs(context.fetch(URL,fetcher),first)
+        self.assertEqual(fetcher.calls,1)
+        self.assertEqual((context.n_queries,context.n_sent,context.getHits()),(2,1,1))
+        self.assertEqual(context.getHitRate(),0.5)
+        # Another url is sent
+        context.fetch(URL+"&page[offset]=100",fetcher)
+        self.assertEqual(fetcher.calls,2)
+
+    def test_new_context(self):
+        # Nothing is kept from one cycle to the next
+        fetcher = FakeFetcher()
+        QueryContext().fetch(URL,fetcher)
+        QueryContext().fetch(URL,fetcher)
+        self.assertEqual(fetcher.calls,2)
+
+    def test_in_flight(self):
+        # An identical query made while the first one is in flight waits for its response
+        context = QueryContext()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        def fetcher():
+            calls.append(1)
+            started.set()
+            release.wait(5.)
+            return {"data": []}
+        results = []
+        first = threading.Thread(target=lambda: results.append(context.fetch(URL,fetcher)))
+        first.start()
+        started.wait(5.)
+        second = threading.Thread(target=lambda: results.append(context.fetch(URL,fetcher)))
+        second.start()
+        while context.n_queries < 2:
+            pass
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(len(calls),1)
+        self.assertIs(results[0],results[1])
+        self.assertEqual(context.n_in_flight,1)
+
+    def test_failure(self):
+        # A failed query is counted and isn't remembered, the next request sends it again
+        context = QueryContext("cycle")
+        fetcher = FakeFetcher(1,RuntimeError)
+        with self.assertRaises(RuntimeError):
+            context.fetch(URL,fetcher)
+        self.assertEqual(context.n_failed,1)
+        self.assertEqual(context.fetch(URL,fetcher)["data"][0]["attributes"]["rate"],2.)
+        self.assertEqual((fetcher.calls,context.n_sent,context.n_failed),(2,2,1))
+        self.assertIn("1 failed",context.getSummary())
+
+    def test_failure_in_flight(self):
+        # The requests waiting for a query which fails get its exception
+        context = QueryContext()
+        started = threading.Event()
+        release = threading.Event()
+        def fetcher():
+            started.set()
+            release.wait(5.)
+            raise RuntimeError("failure")
+        errors = []
+        def fetch():
+            try:
+                context.fetch(URL,fetcher)
+            except RuntimeError as e:
+                errors.append(e)
+        first = threading.Thread(target=fetch)
+        first.start()
+        started.wait(5.)
+        second = threading.Thread(target=fetch)
+        second.start()
+        while context.n_queries < 2:
+            pass
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(len(errors),2)
+        self.assertEqual(context.n_failed,1)
+
+    def test_error_response(self):
+        # An error from OMS is returned but not kept for the rest of the cycle
+        context = QueryContext()
+        fetcher = FakeFetcher(1)
+        self.assertNotIn("data",context.fetch(URL,fetcher))
+        self.assertIn("data",context.fetch(URL,fetcher))
+        self.assertEqual(fetcher.calls,2)
+        self.assertEqual(context.n_failed,0)
+
+    def test_summary(self):
+        context = QueryContext()
+        self.assertEqual(context.getHitRate(),0.)
+        self.assertTrue(context.getSummary().startswith("Query context: 0 OMS queries"))
+        self.assertNotIn("failed",context.getSummary())
+
+if __name__ == "__main__":
+    unittest.main()
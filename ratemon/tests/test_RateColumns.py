@@ -0,0 +1,95 @@
+#####################################################################
+# File: test_RateColumns.py
+#
+# Unit tests of RateColumns.py
+#
+# Usage: python3 -m unittest discover -s ratemon/tests
+#####################################################################
+
+import copy
+import os
+import sys
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+from RateColumns import DeadTimeCorrection, RateColumns, unprescale
+
+# Use: Corrects the rates for dead time, as DataParser.correctForDeadtime did for each trigger
+def correctForDeadtime(Rates,dead_time,max_deadtime):
+    # type: (Dict[str,object],Dict[int,float],float) -> None
+    for LS in dead_time:
+        for trigger in Rates:
+            if LS in Rates[trigger]:
+                Rates[trigger][LS][0] *= (1. + dead_time[LS]/100.)
+                if dead_time[LS] > max_deadtime:
+                    del Rates[trigger][LS]
+
+class TestRateColumns(unittest.TestCase):
+    def test_dict(self):
+        rates = {3: [30.,2], 1: [10.,1], 2: [20.,None]}
+        columns = RateColumns.fromDict(rates)
+        self.assertEqual(columns.ls,[1,2,3])
+        self.assertEqual(columns.rate,[10.,20.,30.])
+        self.assertEqual(columns.prescale,[1,None,2])
+        self.assertEqual(len(columns),3)
+        self.assertEqual(columns.toDict(),rates)
+
+    def test_empty(self):
+        self.assertEqual(len(RateColumns()),0)
+        self.assertEqual(RateColumns().toDict(),{})
+        self.assertEqual(len(RateColumns.fromDict({})),0)
+
+class TestUnprescale(unittest.TestCase):
+    def test_unprescale(self):
+        columns = unprescale([1,2,3,4],[1.,2.,3.,4.],{1: 0, 2: 1, 3: 2, 4: 1},[10,20,30],0)
+        self.assertEqual(columns.ls,[1,2,3,4])
+        self.assertEqual(columns.prescale,[10,20,30,20])
+        self.assertEqual(columns.rate,[10.,40.,90.,80.])
+
+    def test_unknown_column(self):
+        # LS without a column (or with None) use column 0, the columns after the last prescale use the default
+        columns = unprescale([1,2,3,4],[1.,1.,1.,1.],{2: None, 3: 5, 4: 1},[10,20],7)
+        self.assertEqual(columns.prescale,[10,10,7,20])
+        self.assertEqual(columns.rate,[10.,10.,7.,20.])
+
+    def test_no_prescales(self):
+        columns = unprescale([1,2],[1.,2.],{1: 0, 2: 1},[],0)
+        self.assertEqual(columns.prescale,[0,0])
+        self.assertEqual(columns.rate,[0.,0.])
+
+    def test_empty(self):
+        columns = unprescale([],[],{1: 0},[10],1)
+        self.assertEqual((columns.ls,columns.rate,columns.prescale),([],[],[]))
+
+class TestDeadTimeCorrection(unittest.TestCase):
+    def test_matches_correctForDeadtime(self):
+        dead_time = {1: 0., 2: 5., 3: 20., 5: 10., 6: 50.}
+        Rates = {
+            "HLT_A": {1: [10.,1], 2: [10.,2], 3: [10.,1], 4: [10.,1], 5: [10.,1]},
+            "HLT_B": {2: [4.,1], 6: [4.,1], 7: [4.,None]},
+            "HLT_C": {},
+        }
+        for max_deadtime in [10.,100.]:
+            expected = copy.deepcopy(Rates)
+            correctForDeadtime(expected,dead_time,max_deadtime)
+            correction = DeadTimeCorrection(dead_time,max_deadtime)
+            for trigger,rates in Rates.items():
+                self.assertEqual(correction.apply(RateColumns.fromDict(rates)).toDict(),expected[trigger])
+
+    def test_getFactor(self):
+        correction = DeadTimeCorrection({1: 10., 2: 0.})
+        self.assertAlmostEqual(correction.getFactor(1),1.1)
+        self.assertEqual(correction.getFactor(2),1.)
+        self.assertEqual(correction.getFactor(3),1.)    # No dead time info
+
+    def test_keep_all(self):
+        # Without max_deadtime no LS is dropped, and the input isn't modified
+        columns = RateColumns([1,2],[10.,10.],[1,1])
+        corrected = DeadTimeCorrection({1: 50., 2: 100.}).apply(columns)
+        self.assertEqual(corrected.ls,[1,2])
+        self.assertEqual(corrected.rate,[15.,20.])
+        self.assertEqual(columns.rate,[10.,10.])
+
+if __name__ == "__main__":
+    unittest.main()
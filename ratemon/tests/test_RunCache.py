@@ -0,0 +1,139 @@
+#####################################################################
+# File: test_RunCache.py
+#
+# Unit tests of RunCache.py, in a temporary cache directory
+#
+# Usage: python3 -m unittest discover -s ratemon/tests
+#####################################################################
+
+import math
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+from LumiSections import IntervalSet, LumiInfo
+from RunCache import CachedRun, RunCache, makeKey
+from RunStore import RunIndex, RunStore
+
+RUN = 370000
+LUMI_INFO = [   # (LS,ilum,psi,phys,cms_ready,pileup)
+    (1,1000.,0,1,1,20.),
+    (2,None,0,1,1,None),    # No lumi, not in the index
+    (3,2000.,1,1,0,40.),
+    (4,3000.,2,0,1,None),
+]
+OPTIONS = {"normalizeRates": True, "correctForDT": True, "triggers": ["HLT_A","HLT_B"]}
+
+# Returns: A parsed run as DataParser makes it, with its records made by a RunStore
+def makeRun():
+    # type: () -> CachedRun
+    index = RunIndex(RUN,LUMI_INFO)
+    store = RunStore()
+    store.addObject("HLT_A",index,[0,1,2],{"rate": [1.,None,3.], "prescale": [1,2,None], "runcount": 0})
+    store.addObject("HLT_B",index,[1,2],{"rate": [5.,6.], "runcount": 0})
+    parsed = CachedRun(RUN)
+    parsed.bunches = 2400
+    parsed.lumi_info = LumiInfo(LUMI_INFO)
+    parsed.type_map = {"HLT_A": "trigger", "HLT_B": "trigger"}
+    parsed.dropped_ls = [2]
+    parsed.records = dict((name,runs[RUN]) for name,runs in store.objects.items())
+    return parsed
+
+# Returns: The values of a column, with the NaN as None so that they can be compared
+def getValues(column):
+    # type: (array.array) -> List[float]
+    return [None if math.isnan(x) else x for x in column]
+
+class TestRunCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree,self.cache_dir)
+        self.cache = RunCache(self.cache_dir)
+        self.key = makeKey(OPTIONS)
+
+    def test_round_trip(self):
+        parsed = makeRun()
+        self.cache.put(self.key,OPTIONS,parsed)
+        self.assertEqual(self.cache.listRuns(self.key),[RUN])
+        cached = self.cache.get(self.key,RUN,3)
+        self.assertEqual((self.cache.hits,self.cache.misses),(1,0))
+
+        self.assertEqual(cached.run,RUN)
+        self.assertEqual(cached.bunches,2400)
+        self.assertEqual(cached.type_map,parsed.type_map)
+        self.assertEqual(cached.dropped_ls,[2])
+        self.assertIsInstance(cached.lumi_info,LumiInfo)
+        self.assertEqual(list(cached.lumi_info),LUMI_INFO)
+
+        self.assertEqual(sorted(cached.records),["HLT_A","HLT_B"])
+        for name,record in parsed.records.items():
+            self.assertEqual(sorted(cached.records[name]),sorted(record))
+            for field,column in record.items():
+                if column is None:
+                    self.assertIsNone(cached.records[name][field])
+                elif field != "runcount":
+                    self.assertEqual(getValues(cached.records[name][field]),getValues(column))
+
+    def test_nan(self):
+        # The NaN of the missing values are kept
+        self.cache.put(self.key,OPTIONS,makeRun())
+        record = self.cache.get(self.key,RUN,0).records["HLT_A"]
+        self.assertEqual(getValues(record["rate"]),[1.,None,3.])
+        self.assertEqual(getValues(record["prescale"]),[1.,2.,None])
+        self.assertEqual(getValues(record["PU"]),[20.,40.,None])
+
+    def test_shared_columns(self):
+        # The columns of the index are stored once, and shared again once read back
+        parsed = makeRun()
+        parsed.records["HLT_C"] = dict(parsed.records["HLT_A"])
+        self.cache.put(self.key,OPTIONS,parsed)
+        cached = self.cache.get(self.key,RUN,0)
+        for field in ["LS","ilumi","rate","runcount"]:
+            self.assertIs(cached.records["HLT_C"][field],cached.records["HLT_A"][field])
+
+    def test_runcount(self):
+        # The runcount isn't stored, it is set when the run is read back
+        self.cache.put(self.key,OPTIONS,makeRun())
+        self.assertEqual(list(self.cache.get(self.key,RUN,4).records["HLT_A"]["runcount"]),[4,4,4])
+        self.assertEqual(list(self.cache.get(self.key,RUN,1).records["HLT_B"]["runcount"]),[1,1])
+
+    def test_key(self):
+        # The runs parsed with other options are another entry
+        self.cache.put(self.key,OPTIONS,makeRun())
+        other_key = makeKey(dict(OPTIONS,correctForDT=False))
+        self.assertNotEqual(other_key,self.key)
+        self.assertEqual(makeKey(dict(reversed(list(OPTIONS.items())))),self.key)
+        self.assertIsNone(self.cache.get(other_key,RUN,0))
+        self.assertIsNone(self.cache.get(self.key,RUN+1,0))
+        self.assertEqual((self.cache.hits,self.cache.misses),(0,2))
+        self.assertEqual(self.cache.listKeys(),{self.key: OPTIONS})
+
+    def test_ls_veto(self):
+        # A run is only read back with the LS veto it was stored with
+        self.cache.put(self.key,OPTIONS,makeRun(),IntervalSet([[2,2]]))
+        self.assertIsNone(self.cache.get(self.key,RUN,0))
+        self.assertIsNone(self.cache.get(self.key,RUN,0,IntervalSet([[2,3]])))
+        self.assertIsNotNone(self.cache.get(self.key,RUN,0,IntervalSet.make([2])))
+        # An empty veto is the same as no veto
+        self.cache.put(self.key,OPTIONS,makeRun(),IntervalSet())
+        self.assertIsNotNone(self.cache.get(self.key,RUN,0))
+
+    def test_corrupted(self):
+        self.cache.put(self.key,OPTIONS,makeRun())
+        with open(self.cache.getPath(self.key,RUN),"wb") as f:
+            f.write(b"not a run")
+        self.assertIsNone(self.cache.get(self.key,RUN,0))
+
+    def test_purge(self):
+        self.cache.put(self.key,OPTIONS,makeRun())
+        self.assertEqual(self.cache.purge(RUN+1),0)
+        self.assertEqual(self.cache.purge(),1)
+        self.assertEqual(self.cache.listKeys(),{})
+        self.assertIsNone(self.cache.get(self.key,RUN,0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#####################################################################
+# File: test_RunStore.py
+#
+# Unit tests of RunStore.py
+#
+# Usage: python3 -m unittest discover -s ratemon/tests
+#####################################################################
+
+import array
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+
+from LumiSections import IntervalSet, LumiInfo
+from RunStore import RunIndex, RunStore, TYPECODE, toColumn
+
+RUN = 370000
+LUMI_INFO = [   # (LS,ilum,psi,phys,cms_ready,pileup)
+    (1,1000.,0,1,1,20.),
+    (2,None,0,1,1,None),    # No lumi, not in the index
+    (3,2000.,1,1,0,40.),
+    (4,3000.,2,0,1,60.),
+    (5,4000.,1,1,1,None),
+]
+
+class TestToColumn(unittest.TestCase):
+    def test_toColumn(self):
+        column = toColumn([1.,None,2])
+        self.assertEqual(column.typecode,TYPECODE)
+        self.assertEqual(column[0],1.)
+        self.assertTrue(math.isnan(column[1]))
+        self.assertEqual(column[2],2.)
+
+    def test_no_value(self):
+        self.assertIsNone(toColumn([None,None]))
+        self.assertEqual(len(toColumn([])),0)
+
+class TestRunIndex(unittest.TestCase):
+    def test_index(self):
+        index = RunIndex(RUN,LUMI_INFO)
+        self.assertEqual(index.ls_list,[1,3,4,5])
+        self.assertEqual(len(index),4)
+        self.assertEqual(list(index.columns["ilumi"]),[1000.,2000.,3000.,4000.])
+        self.assertEqual(list(index.columns["status"]),[1,0,1,1])
+        self.assertEqual(list(index.columns["phys"]),[1,1,0,1])
+        self.assertTrue(math.isnan(index.columns["PU"][3]))
+
+    def test_lumi_info(self):
+        # The same index from the typed LumiInfo
+        index = RunIndex(RUN,LumiInfo(LUMI_INFO))
+        self.assertEqual(index.ls_list,[1,3,4,5])
+        self.assertEqual(list(index.columns["ilumi"]),list(RunIndex(RUN,LUMI_INFO).columns["ilumi"]))
+
+    def test_psi_filter(self):
+        self.assertEqual(RunIndex(RUN,LUMI_INFO,IntervalSet([[1,1]])).ls_list,[3,5])
+        self.assertEqual(RunIndex(RUN,LUMI_INFO,[0,2]).ls_list,[1,4])
+        self.assertEqual(len(RunIndex(RUN,LUMI_INFO,IntervalSet())),0)
+
+    def test_psi_filter_unknown_column(self):
+        # The LS without a prescale column are dropped by the filter, and kept without it
+        lumi_info = LumiInfo([(1,1.,None,1,1,20.),(2,1.,1,1,1,20.)])
+        self.assertEqual(RunIndex(RUN,lumi_info,IntervalSet.make([1,2])).ls_list,[2])
+        self.assertEqual(RunIndex(RUN,lumi_info).ls_list,[1,2])
+
+class TestRecords(unittest.TestCase):
+    def setUp(self):
+        self.index = RunIndex(RUN,LUMI_INFO)
+
+    def addObject(self,positions,columns):
+        store = RunStore()
+        store.addObject("HLT_A",self.index,positions,columns)
+        return store.objects["HLT_A"][RUN]
+
+    def test_all_LS(self):
+        # An object with every LS of the index shares its arrays
+        record = self.addObject([0,1,2,3],{"rate": [1.,2.,3.,4.], "prescale": [1,None,1,1], "runcount": 2})
+        self.assertIs(record["LS"],self.index.ls)
+        self.assertIs(record["ilumi"],self.index.columns["ilumi"])
+        self.assertIs(record["runcount"],self.index.getConstant(2))
+        self.assertEqual(list(record["rate"]),[1.,2.,3.,4.])
+        self.assertTrue(math.isnan(record["prescale"][1]))
+        self.assertNotIn("cross_section",record)
+
+    def test_some_LS(self):
+        record = self.addObject([1,3],{"rate": [2.,4.], "runcount": 1})
+        self.assertEqual(list(record["LS"]),[3,5])
+        self.assertEqual(list(record["ilumi"]),[2000.,4000.])
+        self.assertEqual(list(record["runcount"]),[1,1])
+        self.assertIsNot(record["ilumi"],self.index.columns["ilumi"])
+
+    def test_store(self):
+        store = RunStore()
+        store.addObject("HLT_A",self.index,[0,1,2,3],{"rate": [1.,2.,3.,4.], "prescale": [1,None,1,1], "runcount": 1})
+        store.addObject("HLT_B",self.index,[1,3],{"rate": [5.,6.]})
+        self.assertTrue(store.hasObject("HLT_A"))
+        self.assertFalse(store.hasObject("HLT_C"))
+
+        self.assertIs(store.getView("ilumi")["HLT_A"][RUN],self.index.columns["ilumi"])
+        self.assertEqual(store.getView("cross_section")["HLT_A"][RUN],0)    # MISSING
+        self.assertIsNone(store.getView("bandwidth")["HLT_A"][RUN])
+
+        self.assertEqual(store.getDictView("rate"),{"HLT_A": {RUN: {1: 1., 3: 2., 4: 3., 5: 4.}}, "HLT_B": {RUN: {3: 5., 5: 6.}}})
+        self.assertEqual(store.getDictView("prescale")["HLT_A"][RUN],{1: 1., 3: None, 4: 1., 5: 1.})
+        self.assertEqual(store.getDictView("bandwidth")["HLT_B"][RUN],{3: None, 5: None})
+        self.assertEqual(store.getDictView("runcount")["HLT_B"][RUN],0)
+
+        # The shared arrays of the index are counted once
+        # HLT_A: 8 columns of 4 LS (LS, PU, ilumi, status, phys from the index), HLT_B: 6 columns of 2 LS
+        self.assertEqual(store.getSize(),(8*4 + 6*2)*array.array(TYPECODE).itemsize)
+
+        # Adding an object again replaces its data for the run
+        store.addObject("HLT_B",self.index,[0],{"rate": [7.]})
+        self.assertEqual(store.getDictView("rate")["HLT_B"][RUN],{1: 7.})
+
+if __name__ == "__main__":
+    unittest.main()
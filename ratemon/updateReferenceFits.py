@@ -6,6 +6,7 @@ from referenceRuns import referenceRuns
 controller = MonitorController()
 
 controller.ops_dict["updateOnlineFits"] = True
+controller.ops_dict["useRunCache"] = True   # The reference runs are the same from one update to the next, read them back from the run cache
 
 for run_type in referenceRuns.keys(): # ["collisions", "collisionsHI"]
     if run_type == "cosmics": continue # cosmics naturally do not have PU-dependence, so are calculated differently as averages in updateReferenceFits_cosmics.py